@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Scoreboard latency benchmark against simulated LED signs.
+
+Measures the time from a slot change to the matching register write on every sign, and the
+number of Modbus transactions per update, for:
+
+  sequential  the old loop: every group of every sign rewritten one sign after another, as
+              separate font, color and value writes with a 0.2 s pause after each group
+  workers     one LEDHostWorker per sign, writing only changed registers
+
+An update that does not reach every sign within ``--deadline`` seconds is reported as lost
+and left out of the latency figures.
+
+    python benchmark_scoreboard.py --signs 3 --updates 50 --latency 0.02
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import time
+
+from cLEDWorker import LEDHostWorker
+from cModbusLED import ModbusClient, ModbusLED
+from led_sign_simulator import start_signs
+
+
+def random_change(values, max_slots=120):
+    """Change what one group shows, like a car entering or leaving a zone."""
+    group = random.choice(list(values))
+    current = values[group] if values[group] != 'Full' else 5
+    step = 1 if current <= 5 else -1 if current >= max_slots else random.choice((-1, 1))
+    new = current + step
+    values[group] = 'Full' if new <= 5 else new
+    return group
+
+
+def wait_for_write(signs, addresses, since, timeout=2.0):
+    """Wait until every sign has a write to one of ``addresses`` after ``since``; returns the latest write time."""
+    deadline = time.perf_counter() + timeout
+    latest = since
+    for sign in signs:
+        block = sign.registers
+        with block.write_event:
+            while max(block.write_times.get(address, 0.0) for address in addresses) <= since:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                block.write_event.wait(remaining)
+            latest = max([latest] + [block.write_times.get(address, 0.0) for address in addresses])
+    return latest
+
+
+def transactions(signs):
+    return sum(sign.registers.reads + sign.registers.writes + sign.registers.failures for sign in signs)
+
+
+def legacy_write(led, group, value):
+    """One group written the way ModbusLED.write did before coalescing: font, color, then value."""
+    font_addr, color_addr = led.group_addr[group][3], led.group_addr[group][4]
+    led.client.client.write_registers(font_addr, 1, unit=1)
+    led.client.client.write_registers(color_addr, 0 if value == 'Full' else 1, unit=1)
+    if value == 'Full':
+        led.client.write_register_group(led.group_addr[group][0], 'uFll')
+    else:
+        text = str(value).zfill(led.group_addr[group][2])
+        led.client.write_register_group(led.group_addr[group][0], text[1] + text[0] + '\x00' + text[2])
+
+
+def bench_sequential(signs, values, updates, deadline):
+    leds = []
+    for sign in signs:
+        client = ModbusClient(host=sign.host, port=sign.port)
+        client.connect()
+        leds.append(ModbusLED(client))
+
+    latencies, lost = [], 0
+    start_transactions = transactions(signs)
+    for _ in range(updates):
+        group = random_change(values)
+        t0 = time.perf_counter()
+        for key, value in values.items():
+            for led in leds:
+                try:
+                    legacy_write(led, key, value)
+                except Exception as e:
+                    logging.error(f"Error writing to LED display: {e}")
+                time.sleep(0.2)
+        done = wait_for_write(signs, leds[0].value_addresses(group), t0, deadline)
+        if done is None:
+            lost += 1
+        else:
+            latencies.append(done - t0)
+
+    for led in leds:
+        led.client.close()
+    return latencies, lost, (transactions(signs) - start_transactions) / updates
+
+
+def bench_workers(signs, values, updates, deadline):
+    workers = [LEDHostWorker(sign.host, port=sign.port).start() for sign in signs]
+    for worker in workers:
+        worker.update(dict(values))
+    time.sleep(1.0)  # Connect, sync and write the initial values
+
+    latencies, lost = [], 0
+    start_transactions = transactions(signs)
+    for _ in range(updates):
+        group = random_change(values)
+        t0 = time.perf_counter()
+        for worker in workers:
+            worker.update(dict(values))
+        done = wait_for_write(signs, workers[0].led.value_addresses(group), t0, deadline)
+        if done is None:
+            lost += 1
+        else:
+            latencies.append(done - t0)
+
+    for worker in workers:
+        worker.stop()
+    return latencies, lost, (transactions(signs) - start_transactions) / updates
+
+
+def report(name, latencies, lost, per_update):
+    if not latencies:
+        print(f"{name:<11} all {lost} updates lost")
+        return
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{name:<11} median {1000 * statistics.median(latencies):7.1f} ms   "
+          f"p95 {1000 * p95:7.1f} ms   transactions/update {per_update:5.1f}   lost {lost}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scoreboard updates against simulated signs.")
+    parser.add_argument('--signs', type=int, default=3, help="Number of simulated signs")
+    parser.add_argument('--updates', type=int, default=50, help="Number of slot changes to measure")
+    parser.add_argument('--latency', type=float, default=0.02, help="Seconds each sign adds to a request")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument('--deadline', type=float, default=2.0, help="Seconds after which an update counts as lost")
+    parser.add_argument('--base-port', type=int, default=15020, help="Port of the first simulated sign")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("pymodbus").setLevel(logging.CRITICAL)
+    random.seed(1)
+
+    signs = start_signs(args.signs, args.base_port, args.latency, args.failure_rate)
+    values = {'A': 50, 'B': 80, 'Lab': 30}
+    try:
+        print(f"{args.signs} signs, {args.latency * 1000:.0f} ms latency, {args.failure_rate:.0%} failures, {args.updates} updates")
+        report("sequential", *bench_sequential(signs, dict(values), args.updates, args.deadline))
+        report("workers", *bench_workers(signs, dict(values), args.updates, args.deadline))
+    finally:
+        for sign in signs:
+            sign.stop()
@@ -1,21 +1,57 @@
 import requests
 import json, time
+from cEventOutbox import EventOutbox, OutboxFlusher
 
 class APIClient:
-    def __init__(self, base_url):
+    # HTTP status codes meaning the server has no batch endpoint
+    BATCH_UNSUPPORTED = (404, 405, 501)
+
+    def __init__(self, base_url, outbox_path=None, timeout=5, batch_size=50, linger=0.5, on_delivered=None):
+        """
+        :param base_url: str, server URL (e.g. "http://127.0.0.1:5000")
+        :param outbox_path: str, optional SQLite outbox file; when given, events are queued locally
+        :param timeout: float, HTTP timeout in seconds
+        :param batch_size: int, maximum number of events sent in one request
+        :param linger: float, seconds to wait for more events before sending a partial batch
+        :param on_delivered: optional callable(events) run after events reached the server
+        """
         self.base_url = base_url
+        self.on_delivered = on_delivered
+        self.timeout = timeout
+        self.batch_supported = True
+        self.outbox = None
+        self.flusher = None
 
-    def post_event(self, gate, event, camera):
-        url = f"{self.base_url}/event"
+        # Events are written to a local outbox first and delivered by a background flusher
+        if outbox_path:
+            self.outbox = EventOutbox(outbox_path)
+            self.flusher = OutboxFlusher(self.outbox, self.send_events, batch_size=batch_size, linger=linger).start()
+
+    def enqueue_event(self, gate, event, camera, detail=None, image=None):
+        """
+        Store an event in the local outbox for delivery, falling back to a direct post without one.
+        :param image: str, optional URL of the snapshot saved for this event
+        :return: str idempotency key when queued, otherwise the server response
+        """
         payload = {
             "gate": gate,
             "event": event,
             "camera": camera
         }
+        if detail is not None:
+            payload["detail"] = detail
+        if image is not None:
+            payload["image"] = image
+        if self.outbox is None:
+            return self.send_events([payload]) == 1 or None
+        return self.outbox.put(payload)
+
+    def post_payload(self, payload):
+        url = f"{self.base_url}/event"
         headers = {'Content-Type': 'application/json'}
         # print(url, payload)
         try:
-            response = requests.post(url, data=json.dumps(payload), headers=headers)
+            response = requests.post(url, data=json.dumps(payload), headers=headers, timeout=self.timeout)
             response.raise_for_status()  # Raise an exception for 4xx/5xx responses
             
             # If the response is in JSON format, return it
@@ -25,6 +61,81 @@ class APIClient:
             print(f"Request failed: {e}")
             return None
 
+    def post_events(self, events):
+        """
+        Send a list of events in one request to the batch endpoint.
+        :return: dict server response, None on failure; sets batch_supported to False
+                 when the server does not provide the endpoint
+        """
+        url = f"{self.base_url}/events"
+        headers = {'Content-Type': 'application/json'}
+        try:
+            response = requests.post(url, data=json.dumps({"events": events}), headers=headers, timeout=self.timeout)
+            if response.status_code in self.BATCH_UNSUPPORTED:
+                print(f"Batch endpoint not available ({response.status_code}), sending events one by one.")
+                self.batch_supported = False
+                return None
+            response.raise_for_status()
+            return response.json()
+
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed: {e}")
+            return None
+
+    def to_single_events(self, payload):
+        """Split an event into the payloads accepted by servers without batch support."""
+        payload = dict(payload)
+        image = payload.pop("image", None)
+        singles = [payload]
+        if image is not None:
+            save_image = {"gate": payload["gate"], "event": "save_image", "camera": image}
+            if "event_id" in payload:
+                save_image["event_id"] = payload["event_id"] + "-image"
+            singles.append(save_image)
+        return singles
+
+    def send_events(self, events):
+        """
+        Deliver a batch of events in order, in one request when the server supports it.
+        :return: int, number of events delivered before the first failure
+        """
+        if not events:
+            return 0
+        delivered = 0
+        if self.batch_supported:
+            if self.post_events(events) is not None:
+                delivered = len(events)
+            elif self.batch_supported:
+                return 0
+
+        # Compatibility path: one request per event (and one for its image)
+        if not self.batch_supported:
+            for payload in events:
+                if any(self.post_payload(single) is None for single in self.to_single_events(payload)):
+                    break
+                delivered += 1
+
+        if delivered and self.on_delivered is not None:
+            try:
+                self.on_delivered(events[:delivered])
+            except Exception as e:
+                print(f"Delivery callback failed: {e}")
+        return delivered
+
+    def close(self):
+        if self.flusher:
+            self.flusher.stop()
+        if self.outbox:
+            self.outbox.close()
+
+    def post_event(self, gate, event, camera):
+        payload = {
+            "gate": gate,
+            "event": event,
+            "camera": camera
+        }
+        return self.post_payload(payload)
+
     def get_event(self, gate, event, camera):
         url = f"{self.base_url}/event"
         payload = {
@@ -0,0 +1,137 @@
+import json
+import os
+import subprocess
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def gpu_memory_gb():
+    """Free memory of every NVIDIA GPU in GB, from nvidia-smi (empty without a GPU).
+
+    nvidia-smi is used instead of torch so the parent process does not initialize CUDA
+    before the workers start.
+    """
+    try:
+        output = subprocess.run(["nvidia-smi", "--query-gpu=memory.free", "--format=csv,noheader,nounits"],
+                                capture_output=True, text=True, timeout=10, check=True).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+    return [float(line) / 1024 for line in output.split() if line.strip()]
+
+
+def default_workers(memory_per_worker_gb=None, gpu_memory_per_worker_gb=None):
+    """
+    Number of worker processes: one per core, limited by available memory when psutil is
+    installed and by free GPU memory when a GPU is present.
+    """
+    workers = os.cpu_count() or 1
+    if memory_per_worker_gb and psutil is not None:
+        available_gb = psutil.virtual_memory().available / 1024 ** 3
+        workers = min(workers, int(available_gb // memory_per_worker_gb))
+    if gpu_memory_per_worker_gb:
+        gpus = gpu_memory_gb()
+        if gpus:
+            workers = min(workers, sum(int(free // gpu_memory_per_worker_gb) for free in gpus))
+    return max(1, workers)
+
+
+def run_task(job, input_path, output_path, marker_path, kwargs):
+    """Run one job in a worker process and write its done marker. Returns (seconds, error)."""
+    start = time.time()
+    try:
+        result = job(input_path, output_path, **kwargs)
+    except Exception:
+        return time.time() - start, traceback.format_exc()
+    seconds = time.time() - start
+    if result is False:
+        return seconds, "job reported failure"
+    marker = {"input": input_path, "input_size": os.path.getsize(input_path), "output": output_path,
+              "seconds": round(seconds, 1), "finished": time.strftime("%Y-%m-%d %H:%M:%S")}
+    tmp_path = marker_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(marker, f)
+    os.replace(tmp_path, marker_path)
+    return seconds, None
+
+
+class BatchRunner:
+    """Runs a per-file job over many files in a process pool and can resume an interrupted run.
+
+    A task is complete when its done marker (``{output}.done``) exists and names an input of
+    the same size; the marker is written only after the job returned, so a file cut off by a
+    crash or Ctrl+C is redone on the next run. A job is a module-level function
+    ``job(input_path, output_path, **kwargs)``; returning False marks the file as failed.
+    """
+
+    def __init__(self, job, workers=None, memory_per_worker_gb=None, gpu_memory_per_worker_gb=None):
+        """
+        :param job: picklable callable(input_path, output_path, **kwargs)
+        :param workers: int, worker processes (default: cores, limited by the memory settings)
+        :param memory_per_worker_gb: float, memory one job needs, used to size the default pool
+        :param gpu_memory_per_worker_gb: float, GPU memory one job needs (its model), used to size the default pool
+        """
+        self.job = job
+        self.workers = workers or default_workers(memory_per_worker_gb, gpu_memory_per_worker_gb)
+
+    @staticmethod
+    def marker_path(output_path):
+        return output_path + ".done"
+
+    def is_done(self, input_path, output_path):
+        marker_path = self.marker_path(output_path)
+        if not os.path.exists(marker_path):
+            return False
+        try:
+            with open(marker_path, "r", encoding="utf-8") as f:
+                marker = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return marker.get("input_size") == os.path.getsize(input_path)
+
+    def run(self, tasks, report_path=None):
+        """
+        Process all tasks that are not done yet.
+        :param tasks: iterable of (input_path, output_path, kwargs)
+        :param report_path: str, optional JSON file for the summary
+        :return: dict summary with done, skipped and failed tasks
+        """
+        tasks = list(tasks)
+        pending = [task for task in tasks if not self.is_done(task[0], task[1])]
+        summary = {"total": len(tasks), "skipped": len(tasks) - len(pending), "done": 0, "failed": [],
+                   "workers": self.workers, "seconds": 0.0, "job_seconds": 0.0}
+        print(f"{len(tasks)} files, {summary['skipped']} already done, {len(pending)} to process with {self.workers} workers")
+
+        start = time.time()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(run_task, self.job, input_path, output_path, self.marker_path(output_path), kwargs): input_path
+                for input_path, output_path, kwargs in pending
+            }
+            for i, future in enumerate(as_completed(futures), 1):
+                input_path = futures[future]
+                try:
+                    seconds, error = future.result()
+                except Exception as e:  # The worker process died
+                    seconds, error = 0.0, repr(e)
+                if error:
+                    summary["failed"].append({"input": input_path, "error": error})
+                    print(f"[{i}/{len(pending)}] FAILED {input_path}\n{error}")
+                else:
+                    summary["done"] += 1
+                    summary["job_seconds"] += seconds
+                    print(f"[{i}/{len(pending)}] {input_path} ({seconds:.1f} s)")
+
+        summary["seconds"] = round(time.time() - start, 1)
+        summary["job_seconds"] = round(summary["job_seconds"], 1)
+        print(f"Finished in {summary['seconds']} s: {summary['done']} done, {summary['skipped']} skipped, "
+              f"{len(summary['failed'])} failed")
+        if report_path:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+        return summary
@@ -0,0 +1,26 @@
+import os
+import sqlite3
+
+
+def open_database(db_path, schema=()):
+    """
+    Open a SQLite database shared by several threads and processes.
+
+    The connection is in autocommit mode (transactions are opened explicitly with BEGIN) and
+    may be used from any thread; callers serialize access with their own lock. WAL mode lets
+    readers run while another process writes, and writers wait up to 30 s for the lock
+    instead of failing.
+    :param db_path: str, database file (its directory is created if missing)
+    :param schema: iterable of CREATE TABLE / CREATE INDEX statements, run on every open
+    :return: sqlite3.Connection
+    """
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    for statement in schema:
+        conn.execute(statement)
+    return conn
@@ -1,13 +1,19 @@
 import requests
 import json
+import threading
+from cAPIClient import APIClient
 
 class DeviceStatusUpdater:
-    def __init__(self, server_url):
+    def __init__(self, server_url, outbox=None):
         """
         Initialize the DeviceStatusUpdater with the server URL.
         :param server_url: str, the base URL of the server (e.g., "http://your-server:5000")
+        :param outbox: EventOutbox, optional durable outbox; when given, status updates are queued there
+                       and delivered by its flusher instead of being posted directly
         """
         self.server_url = server_url.rstrip('/') + "/event"
+        self.outbox = outbox
+        self.api = APIClient(server_url.rstrip('/'))
 
     def send_status(self, camera, detail):
         """
@@ -23,15 +29,99 @@ class DeviceStatusUpdater:
             "detail": detail
         }
         
+        if self.outbox is not None:
+            return {"queued": self.outbox.put(payload)}
+
         headers = {"Content-Type": "application/json"}
         
         try:
-            response = requests.post(self.server_url, headers=headers, data=json.dumps(payload))
+            response = requests.post(self.server_url, headers=headers, data=json.dumps(payload), timeout=5)
             response.raise_for_status()  # Raise an error for HTTP error responses
             return response.json()
         except requests.exceptions.RequestException as e:
             return {"error": str(e)}
 
+    def send_statuses(self, statuses):
+        """
+        Send the status of several devices in one batch request.
+        :param statuses: dict, device identifier -> status value
+        :return: bool, True when all statuses were delivered (or queued)
+        """
+        payloads = [{"gate": "all", "event": "update_device_status", "camera": camera, "detail": detail}
+                    for camera, detail in statuses.items()]
+        if self.outbox is not None:
+            for payload in payloads:
+                self.outbox.put(payload)
+            return True
+        return self.api.send_events(payloads) == len(payloads)
+
+
+class DeviceStatusReporter:
+    """Debounced device status reporting shared by the scoreboard and the cameras.
+
+    Callers report the current status as often as they like; only state transitions and a
+    periodic heartbeat reach the server, and every send carries the states of all devices
+    in one batch request. Sending happens on a background thread.
+    """
+
+    def __init__(self, updater, heartbeat_interval=60.0, debounce=0.5):
+        """
+        :param updater: DeviceStatusUpdater used to deliver the statuses
+        :param heartbeat_interval: float, seconds between full status reports without changes
+        :param debounce: float, seconds to wait after a transition so simultaneous changes share a request
+        """
+        self.updater = updater
+        self.heartbeat_interval = heartbeat_interval
+        self.debounce = debounce
+        self.states = {}
+        self.changed = False
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def report(self, device, status):
+        """Record the current status of a device; only a change triggers a send."""
+        with self.lock:
+            if self.states.get(device) == status:
+                return
+            self.states[device] = status
+            self.changed = True
+        self.wake.set()
+
+    def flush(self):
+        with self.lock:
+            statuses = dict(self.states)
+            self.changed = False
+        if not statuses:
+            return
+        if not self.updater.send_statuses(statuses):
+            print(f"Failed to report device status: {statuses}")
+            with self.lock:
+                self.changed = True
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.wake.wait(self.heartbeat_interval)
+            self.wake.clear()
+            if self.stop_event.is_set():
+                break
+            # Let changes that arrive together go out in one request
+            self.stop_event.wait(self.debounce)
+            self.flush()
+            with self.lock:
+                retry = self.changed
+            if retry:
+                self.stop_event.wait(self.heartbeat_interval / 4)
+                self.wake.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+        self.thread.join(timeout=5.0)
+
+
 # Example usage:
 if __name__ == "__main__":
     server_url = "http://localhost:5000"  # Replace with actual server URL
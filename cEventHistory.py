@@ -0,0 +1,259 @@
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from cDatabase import open_database
+
+
+class EventHistory:
+    """Append-only store of count events, indexed by time, zone, camera and direction.
+
+    Replaces the prepend-and-rewrite ``history.txt``: each event is one INSERT into a SQLite
+    database in WAL mode, so the cost no longer grows with the size of the history, and all
+    camera processes can write to the same file concurrently (writers wait on the lock
+    instead of overwriting each other).
+
+    The old ``history.txt`` is imported once, by the first process that opens an empty
+    database. For readers of the old file, one designated process (``legacy_export``) keeps
+    ``history.txt`` as a compatibility export of the latest ``legacy_lines`` events (same
+    newest-first line format). A background thread rewrites it after new events, so bursts of
+    events cost one bounded rewrite and the counting loop never waits for it.
+    """
+
+    COLUMNS = ("id", "ts", "zone", "camera", "direction", "name", "image")
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS events ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " ts REAL NOT NULL,"
+        " zone TEXT NOT NULL,"
+        " camera TEXT,"
+        " direction TEXT NOT NULL,"
+        " name TEXT,"
+        " image TEXT)",
+        "CREATE INDEX IF NOT EXISTS events_ts ON events (ts)",
+        "CREATE INDEX IF NOT EXISTS events_zone_ts ON events (zone, ts)",
+        "CREATE INDEX IF NOT EXISTS events_camera_ts ON events (camera, ts)",
+        "CREATE INDEX IF NOT EXISTS events_direction_ts ON events (direction, ts)",
+    )
+
+    def __init__(self, db_path="D:\\CarPark\\history\\history.db", legacy_path="D:\\CarPark\\history\\history.txt",
+                 legacy_export=False, legacy_lines=1000, legacy_interval=5.0):
+        """
+        :param db_path: str, path of the SQLite file shared by all camera processes
+        :param legacy_path: str, legacy history.txt, imported into an empty database; None to ignore it
+        :param legacy_export: bool, keep legacy_path updated from the database; enable it in one process only
+        :param legacy_lines: int, number of latest events written to the export
+        :param legacy_interval: float, seconds between checks for events appended by other processes
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = open_database(db_path, self.SCHEMA)
+
+        self.legacy_path = legacy_path
+        self.legacy_lines = legacy_lines
+        self.legacy_interval = legacy_interval
+        if legacy_path and os.path.exists(legacy_path) and self.is_empty():
+            try:
+                imported = self.import_legacy(legacy_path, only_if_empty=True)
+                if imported:
+                    print(f"Imported {imported} events from {legacy_path}")
+            except Exception as e:
+                print(f"Failed to import {legacy_path}: {e}")
+
+        self.export_pending = threading.Event()
+        self.closing = False
+        self.export_thread = None
+        if legacy_path and legacy_export:
+            self.export_thread = threading.Thread(target=self.run_legacy_export, daemon=True)
+            self.export_thread.start()
+
+    def append(self, zone, direction, camera=None, name=None, image=None, ts=None):
+        """
+        Record one event.
+        :param zone: str, zone name (e.g. "a", "b", "lab")
+        :param direction: str, "in" or "out"
+        :param camera: str, camera name
+        :param name: str, snapshot name (e.g. "20241204_101500_zone_b_in")
+        :param image: str, path of the snapshot image
+        :param ts: float, event time as a UNIX timestamp (default: now)
+        :return: int, id of the new row
+        """
+        if ts is None:
+            ts = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO events (ts, zone, camera, direction, name, image) VALUES (?, ?, ?, ?, ?, ?)",
+                (ts, zone, camera, direction, name, image),
+            )
+        self.export_pending.set()
+        return cursor.lastrowid
+
+    def build_filter(self, start=None, end=None, zone=None, camera=None, direction=None):
+        clauses, params = [], []
+        for column, value in (("zone", zone), ("camera", camera), ("direction", direction)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(self.to_timestamp(start))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(self.to_timestamp(end))
+        return clauses, params
+
+    def query(self, start=None, end=None, zone=None, camera=None, direction=None, limit=None, newest_first=True):
+        """
+        Return events matching all given filters as a list of dicts.
+        :param start: datetime or UNIX timestamp, inclusive lower bound
+        :param end: datetime or UNIX timestamp, exclusive upper bound
+        """
+        clauses, params = self.build_filter(start, end, zone, camera, direction)
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts DESC, id DESC" if newest_first else " ORDER BY ts, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def iter_latest(self, zone=None, camera=None, direction=None, chunk_size=100):
+        """Iterate over matching events from newest to oldest, reading the index in chunks."""
+        clauses, params = self.build_filter(zone=zone, camera=camera, direction=direction)
+        cursor_ts, cursor_id = None, None
+        while True:
+            page_clauses, page_params = list(clauses), list(params)
+            if cursor_ts is not None:
+                page_clauses.append("(ts < ? OR (ts = ? AND id < ?))")
+                page_params += [cursor_ts, cursor_ts, cursor_id]
+            sql = f"SELECT {', '.join(self.COLUMNS)} FROM events"
+            if page_clauses:
+                sql += " WHERE " + " AND ".join(page_clauses)
+            sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+            with self.lock:
+                rows = self.conn.execute(sql, page_params + [chunk_size]).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(self.COLUMNS, row))
+            cursor_id, cursor_ts = rows[-1][0], rows[-1][1]
+
+    def latest(self, n=20, zone=None, camera=None, direction=None):
+        """Return the ``n`` most recent matching events, newest first."""
+        return self.query(zone=zone, camera=camera, direction=direction, limit=n)
+
+    def is_empty(self):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM events LIMIT 1").fetchone() is None
+
+    def import_legacy(self, file_path="D:\\CarPark\\history\\history.txt", only_if_empty=False):
+        """
+        Import a legacy newest-first history.txt (one "YYYYmmdd_HHMMSS_zone_{zone}_{event}" per line).
+        :param only_if_empty: bool, import only into an empty database (checked in the import
+                              transaction, so of several processes starting together one imports)
+        :return: int, number of imported events
+        """
+        pattern = re.compile(r"^(\d{8}_\d{6})_zone_(.+)_([a-z]+)$")
+        rows = []
+        with open(file_path, 'r') as file:
+            for line in file:
+                match = pattern.match(line.strip())
+                if not match:
+                    continue
+                ts = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+                rows.append((ts, match.group(2), None, match.group(3), line.strip(), None))
+
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if only_if_empty and self.conn.execute("SELECT 1 FROM events LIMIT 1").fetchone():
+                    self.conn.execute("ROLLBACK")
+                    return 0
+                self.conn.executemany(
+                    "INSERT INTO events (ts, zone, camera, direction, name, image) VALUES (?, ?, ?, ?, ?, ?)",
+                    reversed(rows),
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def export_legacy(self, file_path, limit=1000):
+        """
+        Write the latest ``limit`` events to ``file_path`` in the legacy history.txt format, newest first.
+        The file is replaced atomically, so readers never see a partial export.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT ts, zone, direction, name FROM events ORDER BY ts DESC, id DESC LIMIT ?", (int(limit),)
+            ).fetchall()
+        lines = []
+        for ts, zone, direction, name in rows:
+            if not name:
+                name = "{}_zone_{}_{}".format(datetime.fromtimestamp(ts).strftime("%Y%m%d_%H%M%S"), zone, direction)
+            lines.append(name + '\n')
+
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix="history.", suffix=".tmp", dir=directory or None)
+        try:
+            with os.fdopen(fd, 'w') as file:
+                file.writelines(lines)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def newest_id(self):
+        with self.lock:
+            return self.conn.execute("SELECT MAX(id) FROM events").fetchone()[0]
+
+    def run_legacy_export(self):
+        """Background thread: rewrite history.txt after new events, from any process, until close()."""
+        exported = None
+        while True:
+            # Woken by our own appends; the timeout picks up events of the other camera processes
+            self.export_pending.wait(self.legacy_interval)
+            self.export_pending.clear()
+            closing = self.closing  # Read before exporting, so a close() during the export gets one more pass
+            try:
+                newest = self.newest_id()
+                if newest != exported:
+                    self.export_legacy(self.legacy_path, self.legacy_lines)
+                    exported = newest
+            except Exception as e:
+                print(f"Failed to export {self.legacy_path}: {e}")
+            if closing:
+                return
+
+    @staticmethod
+    def to_timestamp(value):
+        if isinstance(value, datetime):
+            return value.timestamp()
+        return float(value)
+
+    def close(self):
+        if self.export_thread is not None:
+            # One last export with everything appended so far
+            self.closing = True
+            self.export_pending.set()
+            self.export_thread.join()
+        with self.lock:
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    history = EventHistory()
+    for event in history.latest(20):
+        print(datetime.fromtimestamp(event["ts"]).strftime("%Y-%m-%d %H:%M:%S"), event["zone"], event["direction"], event["camera"])
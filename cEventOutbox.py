@@ -0,0 +1,183 @@
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from cDatabase import open_database
+
+
+class EventOutbox:
+    """Durable, append-only local queue of events waiting to be delivered to the server.
+
+    Events are written to a SQLite database in WAL mode, so a write is a single cheap
+    append that survives a crash or a server outage. Each event gets an idempotency key
+    (``event_id``) that is sent along with it, which lets the server drop duplicates
+    when a batch is redelivered after a partial failure (at-least-once delivery).
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS outbox ("
+        " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " event_id TEXT NOT NULL UNIQUE,"
+        " created REAL NOT NULL,"
+        " attempts INTEGER NOT NULL DEFAULT 0,"
+        " payload TEXT NOT NULL)",
+    )
+
+    def __init__(self, db_path):
+        """
+        :param db_path: str, path of the SQLite file (created if missing)
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = open_database(db_path, self.SCHEMA)
+        self.new_event = threading.Event()
+
+    def put(self, payload):
+        """
+        Append an event to the outbox.
+        :param payload: dict, event body as it will be posted to the server
+        :return: str, the idempotency key assigned to the event
+        """
+        payload = dict(payload)
+        payload.setdefault("event_id", uuid.uuid4().hex)
+        payload.setdefault("timestamp", datetime.now().isoformat(timespec="milliseconds"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO outbox (event_id, created, payload) VALUES (?, ?, ?)",
+                (payload["event_id"], time.time(), json.dumps(payload)),
+            )
+        self.new_event.set()
+        return payload["event_id"]
+
+    def peek(self, limit=50):
+        """Return up to ``limit`` of the oldest pending events as a list of (seq, payload)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT seq, payload FROM outbox ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+        return [(seq, json.loads(payload)) for seq, payload in rows]
+
+    def ack(self, seqs):
+        """Remove delivered events from the outbox."""
+        if not seqs:
+            return
+        with self.lock:
+            self.conn.executemany("DELETE FROM outbox WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def mark_failed(self, seqs):
+        """Record a failed delivery attempt for the given events."""
+        if not seqs:
+            return
+        with self.lock:
+            self.conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def oldest_age(self):
+        """Return the age in seconds of the oldest pending event, or None when the outbox is empty."""
+        with self.lock:
+            row = self.conn.execute("SELECT MIN(created) FROM outbox").fetchone()
+        if row[0] is None:
+            return None
+        return time.time() - row[0]
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class OutboxFlusher:
+    """Background thread that drains an EventOutbox in batches.
+
+    ``send_batch`` receives a list of event payloads and returns how many of them, counted
+    from the start of the list, were delivered. Delivered events are acknowledged and removed;
+    the rest stay in the outbox and are retried with exponential backoff, so the backlog is
+    replayed in order once the server is reachable again.
+    """
+
+    def __init__(self, outbox, send_batch, batch_size=50, linger=0.0, idle_interval=1.0, min_backoff=1.0, max_backoff=60.0):
+        """
+        :param batch_size: int, maximum number of events handed to ``send_batch`` at once
+        :param linger: float, coalescing window; a partial batch is held until its oldest event
+                       is this many seconds old, so bursts go out in one request
+        """
+        self.outbox = outbox
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.linger = linger
+        self.idle_interval = idle_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.backoff = 0.0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        self.outbox.new_event.set()
+        self.thread.join(timeout)
+
+    def flush_once(self):
+        """Try to deliver one batch. Returns the number of delivered events, or -1 on failure."""
+        batch = self.outbox.peek(self.batch_size)
+        if not batch:
+            return 0
+
+        seqs = [seq for seq, _ in batch]
+        try:
+            delivered = self.send_batch([payload for _, payload in batch])
+        except Exception as e:
+            print(f"Outbox flush failed: {e}")
+            delivered = 0
+
+        self.outbox.ack(seqs[:delivered])
+        if delivered < len(seqs):
+            self.outbox.mark_failed(seqs[delivered:delivered + 1])
+            return -1
+        return delivered
+
+    def wait_for_batch(self):
+        """Hold a partial batch until it is full or the linger window has expired. Returns False when the outbox is empty."""
+        while self.linger > 0 and not self.stop_event.is_set():
+            age = self.outbox.oldest_age()
+            if age is None:
+                return False
+            if age >= self.linger or len(self.outbox) >= self.batch_size:
+                return True
+            self.outbox.new_event.clear()
+            self.outbox.new_event.wait(self.linger - age)
+        return True
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if self.backoff == 0.0 and not self.wait_for_batch():
+                # Idle; an event put now must still wait out the linger window, so check again first
+                self.outbox.new_event.wait(self.idle_interval)
+                self.outbox.new_event.clear()
+                continue
+            delivered = self.flush_once()
+            if delivered < 0:
+                self.backoff = min(self.max_backoff, max(self.min_backoff, self.backoff * 2))
+                self.stop_event.wait(self.backoff)
+            elif delivered == 0:
+                self.backoff = 0.0
+                self.outbox.new_event.wait(self.idle_interval)
+                self.outbox.new_event.clear()
+            else:
+                self.backoff = 0.0
+
+
+if __name__ == "__main__":
+    outbox = EventOutbox("outbox_example.db")
+    outbox.put({"gate": "a", "event": "in", "camera": "camera1"})
+    print("Pending events:", len(outbox))
+    for seq, payload in outbox.peek():
+        print(seq, payload)
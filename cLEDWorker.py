@@ -0,0 +1,231 @@
+import logging
+import threading
+import time
+
+from cModbusLED import ModbusClient, ModbusLED
+
+_logger = logging.getLogger(__name__)
+
+
+class ConnectionManager:
+    """Connection state of one Modbus host with exponential backoff and a circuit breaker.
+
+    After each failed attempt the next one is delayed twice as long (up to ``max_backoff``).
+    After ``breaker_threshold`` consecutive failures the circuit opens and the host is left
+    alone for ``breaker_cooldown`` seconds before a single trial connection is made.
+    """
+
+    def __init__(self, client, base_backoff=1.0, max_backoff=60.0, breaker_threshold=5, breaker_cooldown=300.0):
+        self.client = client
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self.state = "disconnected"  # disconnected, online, backoff, open
+        self.failures = 0
+        self.reconnects = 0
+        self.next_attempt = 0.0
+        self.last_success = None
+        self.last_error = None
+
+    def is_online(self):
+        return self.state == "online" and self.client.client.connected
+
+    def ready(self):
+        """True when a connection attempt is allowed now."""
+        return time.time() >= self.next_attempt
+
+    def delay(self):
+        """Seconds until the next connection attempt is allowed."""
+        return max(0.0, self.next_attempt - time.time())
+
+    def connect(self):
+        """Try to connect once if the backoff allows it. Returns True when the host is online."""
+        if self.is_online():
+            return True
+        if not self.ready():
+            return False
+        try:
+            connected = self.client.connect()
+        except Exception as e:
+            connected = False
+            self.last_error = str(e)
+        if connected:
+            if self.failures or self.last_success is not None:
+                self.reconnects += 1
+            self.state = "online"
+            self.failures = 0
+            self.next_attempt = 0.0
+            self.mark_success()
+            return True
+        self.mark_failure(self.last_error or "connect failed")
+        return False
+
+    def mark_success(self):
+        self.last_success = time.time()
+
+    def mark_failure(self, error):
+        """Record a failed connect or request and schedule the next attempt."""
+        self.last_error = str(error)
+        self.failures += 1
+        self.client.close()
+        if self.failures >= self.breaker_threshold:
+            self.state = "open"
+            delay = self.breaker_cooldown
+        else:
+            self.state = "backoff"
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (self.failures - 1))
+        self.next_attempt = time.time() + delay
+
+    def health(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "reconnects": self.reconnects,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+            "retry_in": round(self.delay(), 1),
+        }
+
+
+class LEDHostWorker:
+    """Owns the Modbus connection to one LED sign and applies updates on its own thread.
+
+    The main loop only hands over the latest values with ``update``; a slow or dead sign
+    delays nothing but its own worker. Pending values are coalesced (latest wins), so a
+    worker that falls behind skips straight to the newest numbers.
+    """
+
+    def __init__(self, host, port=502, timeout=2, idle_interval=5.0, **backoff):
+        """
+        :param host: str, IP address of the sign
+        :param port: int, Modbus TCP port
+        :param timeout: float, Modbus request timeout for this sign in seconds
+        :param idle_interval: float, how often an idle worker checks its connection
+        :param backoff: options passed to ConnectionManager (base_backoff, max_backoff, ...)
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.idle_interval = idle_interval
+        self.client = ModbusClient(host=host, port=port, timeout=timeout)
+        self.led = ModbusLED(self.client)
+        self.connection = ConnectionManager(self.client, **backoff)
+
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.desired = {}  # Latest value per group, rewritten on a full refresh or after a reconnect
+        self.pending_brightness = None
+        self.force_refresh = False
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"led-{host}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        self.wake.set()
+        self.thread.join(timeout)
+        self.client.close()
+
+    def update(self, values):
+        """Queue group values, e.g. {'A': 12, 'B': 'Full'}, for the sign. Never blocks."""
+        with self.lock:
+            self.pending.update(values)
+            self.desired.update(values)
+        self.wake.set()
+
+    def set_brightness(self, brightness):
+        with self.lock:
+            self.pending_brightness = brightness
+        self.wake.set()
+
+    def refresh(self):
+        """Rewrite every group with its latest value on the next cycle, even if the values did not change."""
+        with self.lock:
+            self.force_refresh = True
+        self.wake.set()
+
+    @property
+    def connected(self):
+        return self.connection.is_online()
+
+    def health(self):
+        return dict(host=self.host, **self.connection.health())
+
+    def ensure_connected(self):
+        if self.connection.is_online():
+            return True
+        if not self.connection.connect():
+            _logger.warning(f"LED {self.host} unavailable ({self.connection.state}), retry in {self.connection.delay():.1f}s")
+            return False
+        _logger.info(f"Connected to LED {self.host}")
+        # Learn the current register map so writes can be merged across unchanged registers
+        self.led.invalidate()
+        if not self.led.sync():
+            self.connection.mark_failure("register sync failed")
+            return False
+        # A sign that was power-cycled comes back blank: show the latest values again
+        self.requeue(dict(self.desired), None)
+        return True
+
+    def take_pending(self):
+        with self.lock:
+            values, self.pending = self.pending, {}
+            brightness, self.pending_brightness = self.pending_brightness, None
+            if self.force_refresh:
+                self.led.invalidate()
+                values = dict(self.desired)
+                self.force_refresh = False
+        return values, brightness
+
+    def requeue(self, values, brightness):
+        """Put unsent work back without overwriting anything newer."""
+        with self.lock:
+            for group, value in values.items():
+                self.pending.setdefault(group, value)
+            if self.pending_brightness is None:
+                self.pending_brightness = brightness
+
+    def apply(self, values):
+        """Write all queued values in as few Modbus requests as possible. Raises on a failed write."""
+        if not values:
+            return
+        transactions = self.led.transactions
+        if not self.led.write_many(values):
+            # Leave ``values`` intact: run() requeues them and backs off
+            raise ConnectionError(f"register write rejected by {self.host}")
+        if self.led.transactions != transactions:
+            _logger.info(f"Updated {values} on {self.host}")
+        values.clear()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            timeout = self.idle_interval
+            if not self.connection.is_online():
+                timeout = min(timeout, max(self.connection.delay(), 0.05))
+            self.wake.wait(timeout)
+            self.wake.clear()
+            if self.stop_event.is_set():
+                break
+            if not self.connection.ready() and not self.connection.is_online():
+                continue
+            if not self.ensure_connected():
+                continue
+
+            values, brightness = self.take_pending()
+            try:
+                if brightness is not None:
+                    self.led.set_brightness(brightness)
+                    _logger.info(f"Set brightness {brightness} for LED at {self.host}")
+                    brightness = None
+                self.apply(values)
+                self.connection.mark_success()
+            except Exception as e:
+                _logger.error(f"Error writing to LED display {self.host}: {e}")
+                self.requeue(values, brightness)
+                self.connection.mark_failure(e)
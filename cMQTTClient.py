@@ -1,75 +1,222 @@
 import paho.mqtt.client as mqtt
+import threading
 import time
+from collections import deque
+
+# Retained topic carrying the latest available slots per zone (JSON, same shape as
+# ParkingLotClient.get_available_slots)
+SLOTS_TOPIC = "PARKING/slots"
 
 class MQTTClient:
-    def __init__(self, broker_address, port=1883, username=None, password=None):
+    """MQTT client whose publish() never blocks the caller.
+
+    Messages go into a bounded in-memory queue that a sender thread hands to paho while the
+    broker is connected. When the queue is full the oldest normal message is dropped; messages
+    published with ``priority=True`` are only dropped when the queue holds nothing else.
+    Telemetry published with ``coalesce=True`` keeps only the newest message per topic and is
+    sent at most once per ``coalesce_interval`` seconds. Reconnecting is left to paho's network
+    loop, which retries with exponential backoff.
+    """
+
+    def __init__(self, broker_address, port=1883, username=None, password=None,
+                 max_queue=1000, coalesce_interval=1.0, min_reconnect_delay=1, max_reconnect_delay=60):
         self.broker_address = broker_address
         self.port = int(port)
         self.username = username
         self.password = password
+        self.max_queue = max_queue
+        self.coalesce_interval = coalesce_interval
         self.client = mqtt.Client()
+        self.client.reconnect_delay_set(min_delay=min_reconnect_delay, max_delay=max_reconnect_delay)
 
         # Set username and password if provided
         if username and password:
             self.client.username_pw_set(username, password)
-        
+
         # Bind event callbacks
         self.client.on_connect = self.on_connect
         self.client.on_disconnect = self.on_disconnect
-        
+
         # Connection status
         self.connected = False
+        self.ever_connected = False
+        # Subscriptions are restored after every reconnect
+        self.subscriptions = {}
+
+        # Outgoing messages: (topic, payload, qos, retain, priority)
+        self.queue = deque()
+        self.latest = {}  # Coalesced telemetry: topic -> message
+        self.last_coalesced = {}  # topic -> time the last coalesced message was sent
+        self.condition = threading.Condition()
+        self.stats = {"queued": 0, "sent": 0, "dropped": 0, "failed": 0, "reconnects": 0}
+        self.running = False
+        self.sender_thread = None
 
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             print("Connected successfully")
-            self.connected = True
+            if self.ever_connected:
+                self.stats["reconnects"] += 1
+            self.ever_connected = True
+            for topic, qos in self.subscriptions.items():
+                self.client.subscribe(topic, qos)
+            with self.condition:
+                self.connected = True
+                self.condition.notify()
         else:
             print("Connection failed with code", rc)
             self.connected = False
 
     def on_disconnect(self, client, userdata, rc):
+        # paho's network loop reconnects on its own, with backoff
         print("Disconnected with code", rc)
         self.connected = False
-        # Attempt to reconnect after disconnection
-        self.reconnect()
 
     def connect(self):
+        """Start connecting in the background; returns immediately."""
+        self.running = True
+        if self.sender_thread is None:
+            self.sender_thread = threading.Thread(target=self.run_sender, name="mqtt-sender", daemon=True)
+            self.sender_thread.start()
         try:
-            self.client.connect(self.broker_address, self.port)
+            self.client.connect_async(self.broker_address, self.port)
             self.client.loop_start()
         except Exception as e:
             print(f"Failed to connect to {self.broker_address}: {e}")
             self.connected = False
 
-    def reconnect(self):
-        print("Attempting to reconnect...")
-        while not self.connected:
-            try:
-                self.client.reconnect()
-                time.sleep(1)  # Wait before retrying
-            except Exception as e:
-                print(f"Reconnect attempt failed: {e}")
-                time.sleep(5)  # Longer wait after a failed reconnect
-
-    def publish(self, topic, message, qos=0):
-        # Check connection status and attempt reconnection if not connected
-        if not self.connected:
-            print("Not connected to MQTT broker, trying to reconnect...")
-            self.reconnect()
-        
-        # Try publishing the message
+    def subscribe(self, topic, callback, qos=1):
+        """
+        Subscribe to a topic.
+        :param callback: callable(topic, payload) called on paho's network thread for each message
+        """
+        self.subscriptions[topic] = qos
+        self.client.message_callback_add(topic, lambda client, userdata, msg: callback(msg.topic, msg.payload))
+        if self.connected:
+            self.client.subscribe(topic, qos)
+
+    def publish(self, topic, message, qos=0, retain=False, priority=False, coalesce=False):
+        """
+        Queue a message for publishing. Never blocks.
+        :param priority: bool, keep this message over normal ones when the queue overflows
+        :param coalesce: bool, telemetry mode: only the newest message per topic is kept and
+                         sent at most once per coalesce_interval
+        :return: bool, False when the message was dropped
+        """
+        with self.condition:
+            self.stats["queued"] += 1
+            if coalesce:
+                if topic in self.latest:
+                    self.stats["dropped"] += 1
+                self.latest[topic] = (topic, message, qos, retain, priority)
+                self.condition.notify()
+                return True
+
+            if len(self.queue) >= self.max_queue and not self.make_room(priority):
+                self.stats["dropped"] += 1
+                return False
+            self.queue.append((topic, message, qos, retain, priority))
+            self.condition.notify()
+            return True
+
+    def make_room(self, priority):
+        """Drop the oldest normal message (or the oldest message, for a priority one)."""
+        for i, item in enumerate(self.queue):
+            if not item[4]:
+                del self.queue[i]
+                self.stats["dropped"] += 1
+                return True
+        if priority:
+            self.queue.popleft()
+            self.stats["dropped"] += 1
+            return True
+        return False
+
+    def next_message(self):
+        """Wait until a message can be sent; called with the condition held."""
+        while self.running:
+            if self.connected:
+                if self.queue:
+                    return self.queue.popleft()
+                now = time.time()
+                due = [topic for topic in self.latest
+                       if now - self.last_coalesced.get(topic, 0.0) >= self.coalesce_interval]
+                if due:
+                    self.last_coalesced[due[0]] = now
+                    return self.latest.pop(due[0])
+                if self.latest:
+                    wait = min(self.coalesce_interval - (now - self.last_coalesced[t]) for t in self.latest)
+                    self.condition.wait(max(wait, 0.01))
+                    continue
+            self.condition.wait(1.0)
+        return None
+
+    def send(self, message):
+        """
+        Hand one message to paho.
+        :return: bool, True when the message failed for lack of a connection and should be retried
+        """
+        topic, payload, qos, retain, priority = message
         try:
-            result = self.client.publish(topic, message, qos=qos)
-            if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                print(f"Message published to topic {topic}")
-            else:
-                print(f"Failed to publish message to topic {topic} (return code: {result.rc})")
+            result = self.client.publish(topic, payload, qos=qos, retain=retain)
+        except OSError as e:
+            print(f"Error publishing message to topic {topic}: {e}")
+            self.stats["failed"] += 1
+            return True
         except Exception as e:
-            print(f"Error publishing message: {e}")
-            self.connected = False  # Mark disconnected on failure and try to reconnect
-            self.reconnect()
+            # E.g. TypeError for a dict payload or ValueError for a wildcard topic: a retry fails the same way
+            print(f"Dropping message for topic {topic}: {e}")
+            self.stats["failed"] += 1
+            self.stats["dropped"] += 1
+            return False
+        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+            self.stats["sent"] += 1
+            return False
+        self.stats["failed"] += 1
+        if result.rc in (mqtt.MQTT_ERR_NO_CONN, mqtt.MQTT_ERR_CONN_LOST):
+            return True
+        print(f"Dropping message for topic {topic} (return code: {result.rc})")
+        self.stats["dropped"] += 1
+        return False
+
+    def run_sender(self):
+        while self.running:
+            with self.condition:
+                message = self.next_message()
+            if message is None:
+                break
+            if not self.send(message):
+                continue
+            # Keep the message for after the reconnect
+            with self.condition:
+                if len(self.queue) < self.max_queue:
+                    self.queue.appendleft(message)
+                else:
+                    self.stats["dropped"] += 1
+                self.connected = self.client.is_connected()
+                self.condition.wait(0.5)
+
+    def metrics(self):
+        """Publisher counters: queued, sent, dropped, failed, reconnects, plus current backlog."""
+        with self.condition:
+            return dict(self.stats, pending=len(self.queue) + len(self.latest), connected=self.connected)
 
     def disconnect(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
         self.client.loop_stop()
         self.client.disconnect()
+
+
+if __name__ == "__main__":
+    # Try against a local broker, e.g. `mosquitto -v`
+    client = MQTTClient("localhost", max_queue=100)
+    client.connect()
+    for i in range(500):
+        client.publish("SYS/test", f"telemetry {i}", coalesce=True)
+        client.publish("TEST/events", f"event {i}")
+        time.sleep(0.01)
+    time.sleep(2.0)
+    print(client.metrics())
+    client.disconnect()
@@ -9,21 +9,48 @@ if 'ultralytics' in sys.modules:
 sys.path.insert(0, r"D:\\ultralytics")
 
 import cv2
+import numpy as np
 import torch
 from ultralytics import YOLO
 import signal
 import sys
 import os
+import json
+import time
+import threading
+from datetime import datetime
+from queue import Queue, Empty
 from common_functions import *
+from cRollingStats import RollingStats
+from cSlotOccupancy import SlotOccupancy
+
+# Retained topic with the smoothed MG occupancy published by live mode
+OCCUPANCY_TOPIC = "PARKING/mg/occupancy"
 
 class cManagementCounter:
-    def __init__(self, input_video_path, output_video_path, debug_video_path, model_path="yolov10s.pt", view_img=False):
+    def __init__(self, input_video_path, output_video_path=None, debug_video_path=None, model_path="yolov10s.pt", view_img=False,
+                 video_width=None, video_fps=None, slots_path=None, min_confidence=0.25):
+        """
+        :param input_video_path: str, video file or RTSP URL
+        :param output_video_path: str, annotated video, or None to skip it
+        :param debug_video_path: str, masked detector view, or None to skip it
+        :param video_width: int, width the output videos are downsampled to (default: full size)
+        :param video_fps: float, frame rate of the output videos (default: the source's)
+        :param slots_path: str, optional JSON file with parking-slot polygons (see SlotOccupancy);
+                           when given, the count is the number of occupied slots
+        :param min_confidence: float, detections below this confidence are ignored
+        """
         self.input_video_path = input_video_path
         self.output_video_path = output_video_path
         self.debug_video_path = debug_video_path
         self.view_img = view_img
+        self.video_width = video_width
+        self.min_confidence = min_confidence
+        self.occupancy = None  # Smoothed car count after the last processed frame
         self.model = YOLO(model_path)
-        self.count_history = []
+        # Car counts smoothed over 10 s, 1 min and 5 min of video time
+        self.count_stats = RollingStats(windows=(10.0, 60.0, 300.0))
+        self.average_window = 60.0
         self.mask = []
 
         # if not os.path.exists(self.source):
@@ -59,11 +86,21 @@ class cManagementCounter:
              (self.frame_width, self.frame_height),
              (self.frame_width, int(self.frame_height*0.55))],
                      ]
+        # Rasterized once: one masked copy per frame instead of a fillPoly pass per polygon,
+        # and the detector only sees the bounding rectangle of the unmasked area
+        self.keep_mask, self.roi = build_keep_mask((self.frame_height, self.frame_width), self.masks)
+        self.slot_map = None
+        if slots_path:
+            self.slot_map = SlotOccupancy.from_file(slots_path, (self.frame_width, self.frame_height))
 
         # Define the codec and create VideoWriter object
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        self.out = cv2.VideoWriter(self.output_video_path, fourcc, self.fps, (self.frame_width, self.frame_height))
-        self.out_debug = cv2.VideoWriter(self.debug_video_path, fourcc, self.fps, (self.frame_width, self.frame_height))
+        self.fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        self.video_size = (self.frame_width, self.frame_height)
+        if video_width:
+            self.video_size = calculate_new_size(width=video_width, original_width=self.frame_width, original_height=self.frame_height)
+        self.video_fps = video_fps or self.fps
+        self.out = cv2.VideoWriter(self.output_video_path, self.fourcc, self.video_fps, self.video_size) if self.output_video_path else None
+        self.out_debug = cv2.VideoWriter(self.debug_video_path, self.fourcc, self.video_fps, self.video_size) if self.debug_video_path else None
 
         # Register the signal handler for graceful exit
         signal.signal(signal.SIGINT, self.signal_handler)
@@ -73,84 +110,235 @@ class cManagementCounter:
         self.release_resources()
         sys.exit(0)
 
-    def process_frame(self, frame, debug_frame):
-        # Perform object detection on the frame
-        results = self.model(debug_frame)
+    def process_frame(self, frame, debug_frame, ts=None, result=None):
+        """
+        Count the cars in one frame and draw them.
+        :param result: detection result for this frame from a batched model call, or None to run the model here
+        """
+        # Perform object detection on the unmasked region of the frame
+        x0, y0, w, h = self.roi
+        if result is None:
+            result = self.model(debug_frame[y0:y0 + h, x0:x0 + w])[0]
         desired_classes = [2, 7]  # YOLO class IDs for 'car' and 'truck'
-        count = 0
 
-        # Draw filtered detections on the frame
-        for detection in results[0].boxes:
-            class_id = int(detection.cls)
-            confidence = detection.conf
-            x1, y1, x2, y2 = map(int, detection.xyxy[0])
-
-            # Filter for cars and trucks and region filtering
-            if class_id in desired_classes and ((x1 > 150 and x2 < self.frame_width / 2 and y1 > 20 and y2 < self.frame_height * 7.0 / 10.0) or 
-                                                (x1 > self.frame_width / 2 and x2 < self.frame_width-100 and y1 > 20 and y2 < self.frame_height * 6.0 / 10.0)):
-                # Draw bounding box
-                cv2.rectangle(debug_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-
-                # Add label and confidence score
-                label = str(self.model.names[class_id]) + " : " + str(confidence)
-                cv2.putText(debug_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-                count += 1
-
-        # Maintain count history for averaging
-        self.count_history.append(count)
-        if len(self.count_history) > 1800:
-            self.count_history.pop(0)
-        count_avg = sum(self.count_history) / len(self.count_history)
-        count_avg_int = int(round(count_avg))
+        # Copy the detections to the host once: columns x1, y1, x2, y2, [track id,] conf, cls
+        data = result.boxes.data.cpu().numpy()
+        xyxy = data[:, :4].astype(int) + (x0, y0, x0, y0)
+        conf = data[:, -2]
+        cls = data[:, -1].astype(int)
+
+        # Filter for cars and trucks and confidence; without a slot map also by region
+        keep = np.isin(cls, desired_classes) & (conf >= self.min_confidence)
+        if self.slot_map is None:
+            x1, y1, x2, y2 = xyxy.T
+            left = (x1 > 150) & (x2 < self.frame_width / 2) & (y1 > 20) & (y2 < self.frame_height * 7.0 / 10.0)
+            right = (x1 > self.frame_width / 2) & (x2 < self.frame_width - 100) & (y1 > 20) & (y2 < self.frame_height * 6.0 / 10.0)
+            keep &= left | right
+        xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+
+        if self.slot_map is not None:
+            self.slot_map.update(xyxy)
+            count = self.slot_map.occupied_count()
+        else:
+            count = len(xyxy)
+
+        # Average over the last minute (previously the last 1800 frames)
+        self.count_stats.add(count, ts)
+        count_avg_int = int(round(self.count_stats.mean(self.average_window)))
+        self.occupancy = count_avg_int
+
+        # Draw only on the frames that are written or shown
+        targets = []
+        if self.out is not None or self.view_img:
+            targets.append(frame)
+        if self.out_debug is not None:
+            targets.append(debug_frame)
+        labels = [f"{self.model.names[c]} : {p:.2f}" for c, p in zip(cls, conf)] if targets else []
+        for img in targets:
+            self.draw_detections(img, xyxy, labels, count_avg_int)
+
+        return frame, debug_frame
+
+    def draw_detections(self, img, xyxy, labels, count):
+        for (x1, y1, x2, y2), label in zip(xyxy.tolist(), labels):
+            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(img, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        if self.slot_map is not None:
+            self.slot_map.draw(img)
 
         # Display average count on frame
-        cv2.putText(debug_frame, f"Car: {count_avg_int}", (int(self.frame_width / 2 - 200), int(self.frame_height / 2 - 25)), 
+        cv2.putText(img, f"Car: {count}", (int(self.frame_width / 2 - 200), int(self.frame_height / 2 - 25)),
                     cv2.FONT_HERSHEY_SIMPLEX, 5, (0, 255, 0), 3)
-        cv2.putText(frame, f"Car: {count_avg_int}", (int(self.frame_width / 2 - 200), int(self.frame_height / 2 - 25)), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 5, (0, 255, 0), 3)
-        
-        return frame, debug_frame
 
-    def process_video(self):
-        while self.cap.isOpened():
+    def read_frames(self, frames, stop, max_frames=None):
+        """Reader thread: decode ahead into ``frames`` as (frame, ts); None marks the end."""
+        count = 0
+        while self.cap.isOpened() and not stop.is_set() and (max_frames is None or count < max_frames):
             ret, frame = self.cap.read()
             if not ret:
                 break
-            debug_frame = frame.copy()
+            frames.put((frame, self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0))
+            count += 1
+        frames.put(None)
 
-            for mask in self.masks:
-                # Apply the mask and fill the selected area in black
-                debug_frame = fill_area_with_mask(debug_frame, mask)
+    def process_video(self, batch_size=1, max_frames=None):
+        """
+        Count cars in the whole video. A reader thread decodes ahead while the detector runs on
+        batches of ``batch_size`` frames; results are counted and written in frame order.
+        :param max_frames: int, stop after this many frames
+        :return: float, processed frames per second
+        """
+        frames = Queue(maxsize=2 * batch_size)
+        stop = threading.Event()
+        reader = threading.Thread(target=self.read_frames, args=(frames, stop, max_frames), daemon=True)
+        reader.start()
 
-            # Process the frame for object detection and counting
-            processed_frame, debug_frame = self.process_frame(frame, debug_frame)
+        x0, y0, w, h = self.roi
+        processed = 0
+        start = time.time()
+        finished = False
+        while not finished and not stop.is_set():
+            batch = []
+            while len(batch) < batch_size:
+                item = frames.get()
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
 
-            # Write the processed frame to the output video
-            self.out.write(processed_frame)
-            self.out_debug.write(debug_frame)
+            # Copy the frames with the masked areas filled in black, in one pass each
+            debug_frames = [cv2.bitwise_and(frame, frame, mask=self.keep_mask) for frame, _ in batch]
+            results = self.model([debug_frame[y0:y0 + h, x0:x0 + w] for debug_frame in debug_frames], verbose=False)
+
+            for (frame, ts), debug_frame, result in zip(batch, debug_frames, results):
+                # Process the frame for counting, timed by the video position
+                processed_frame, debug_frame = self.process_frame(frame, debug_frame, ts, result)
+
+                # Write the processed frame to the output video
+                self.write_videos(processed_frame, debug_frame)
+
+                if self.view_img:
+                    # Optional: Display the frame (uncomment if running locally)
+                    resized_img = image_resize(processed_frame, width=640)
+                    cv2.imshow("YOLOv8 Detection", resized_img)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        stop.set()
+                        break
+            processed += len(batch)
+
+        # Let the reader finish before the capture is released
+        stop.set()
+        while reader.is_alive():
+            try:
+                frames.get(timeout=0.1)
+            except Empty:
+                pass
+
+        elapsed = time.time() - start
+        fps = processed / elapsed if elapsed > 0 else 0.0
+        print(f"{processed} frames in {elapsed:.1f} s: {fps:.1f} FPS (batch size {batch_size})")
+        return fps
+
+    def write_videos(self, processed_frame, debug_frame):
+        for writer, img in ((self.out, processed_frame), (self.out_debug, debug_frame)):
+            if writer is not None:
+                writer.write(image_resize(img, width=self.video_width) if self.video_width else img)
+
+    def rollover_debug_video(self, path):
+        """Finish the current debug video and continue in ``path``."""
+        if self.out_debug is not None:
+            self.out_debug.release()
+        self.debug_video_path = path
+        self.out_debug = cv2.VideoWriter(path, self.fourcc, self.video_fps, self.video_size)
+
+    def run_live(self, sample_interval=5.0, mqtt_client=None, slot_client=None, stop_event=None, debug_video_pattern=None):
+        """
+        Track MG occupancy on a live stream with one detection every ``sample_interval`` seconds.
+
+        Frames in between are only grabbed (not decoded) to keep the stream current. The
+        published value is the median of the samples in the last ``average_window`` seconds
+        and is sent only when it changes.
+        :param mqtt_client: optional MQTTClient; occupancy goes to OCCUPANCY_TOPIC (retained)
+        :param slot_client: optional APIClient of the slot service; occupancy is set on zone "mg"
+        :param stop_event: optional threading.Event that ends the loop
+        :param debug_video_pattern: optional strftime pattern of the debug video path; a new file is
+                                    started whenever the formatted path changes (e.g. daily)
+        """
+        published = None
+        next_sample = 0.0
+        while stop_event is None or not stop_event.is_set():
+            if not self.cap.grab():
+                print("Stream read failed, reconnecting in 5 seconds.")
+                self.cap.release()
+                time.sleep(5.0)
+                self.cap = cv2.VideoCapture(self.input_video_path)
+                continue
+            now = time.time()
+            if now < next_sample:
+                continue
+            next_sample = now + sample_interval
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                continue
+            if debug_video_pattern:
+                path = datetime.fromtimestamp(now).strftime(debug_video_pattern)
+                if path != self.debug_video_path:
+                    self.rollover_debug_video(path)
+
+            debug_frame = cv2.bitwise_and(frame, frame, mask=self.keep_mask)
+            processed_frame, debug_frame = self.process_frame(frame, debug_frame, now)
+            self.write_videos(processed_frame, debug_frame)
+
+            occupancy = self.count_stats.median(self.average_window)
+            if occupancy != published:
+                published = occupancy
+                print(f"[MG] occupancy: {occupancy}")
+                if mqtt_client is not None:
+                    message = {"camera": "cam_mg", "occupied": occupancy, "ts": round(now, 3)}
+                    if self.slot_map is not None:
+                        message["slots"] = self.slot_map.states()
+                    mqtt_client.publish(OCCUPANCY_TOPIC, json.dumps(message), qos=1, retain=True, priority=True)
+                if slot_client is not None:
+                    slot_client.enqueue_event('mg', 'set', 'cam_mg', detail=occupancy)
 
             if self.view_img:
-                # Optional: Display the frame (uncomment if running locally)
-                resized_img = image_resize(processed_frame, width=640)
-                cv2.imshow("YOLOv8 Detection", resized_img)
+                cv2.imshow("MG occupancy", image_resize(processed_frame, width=640))
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
 
     def release_resources(self):
         # Release all resources
         self.cap.release()
-        self.out.release()
-        cv2.destroyAllWindows()
+        for writer in (self.out, self.out_debug):
+            if writer is not None:
+                writer.release()
+        if self.view_img:
+            cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    # Path to your video file and output file
-    input_video_path = "D:\\CarPark\\MG\\Camera4_VR-20241025-111430.mp4"  # change this to your input video path
-    output_video_path = "output_video.mp4"
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Count cars in an MG recording.")
+    parser.add_argument('input', nargs='?', default="D:\\CarPark\\MG\\Camera4_VR-20241025-111430.mp4", help="Input video")
+    parser.add_argument('--output', default="output_video.mp4", help="Annotated output video")
+    parser.add_argument('--model', default="yolov10s.pt", help="Detection model")
+    parser.add_argument('--batch-size', type=int, default=8, help="Frames per detector call")
+    parser.add_argument('--compare', type=int, metavar='FRAMES',
+                        help="Measure single-frame and batched throughput on the first FRAMES frames, without writing videos")
+    args = parser.parse_args()
 
-    # Create an instance of YOLOCarCounter and process the video
-    car_counter = cManagementCounter(input_video_path, output_video_path)
-    car_counter.process_video()
+    if args.compare:
+        car_counter = cManagementCounter(args.input, model_path=args.model)
+        car_counter.process_video(batch_size=args.batch_size, max_frames=args.batch_size)  # Warm up the model
+        car_counter.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        single_fps = car_counter.process_video(batch_size=1, max_frames=args.compare)
+        car_counter.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        batched_fps = car_counter.process_video(batch_size=args.batch_size, max_frames=args.compare)
+        print(f"Batch size {args.batch_size}: {batched_fps / single_fps:.2f}x the single-frame throughput")
+    else:
+        # Create an instance of YOLOCarCounter and process the video
+        car_counter = cManagementCounter(args.input, args.output, model_path=args.model)
+        car_counter.process_video(batch_size=args.batch_size)
     car_counter.release_resources()
@@ -5,6 +5,7 @@ import logging
 from pymodbus.client import ModbusTcpClient
 from pymodbus import ModbusException
 import random
+import struct
 import time
 
 # Setup logging
@@ -40,11 +41,13 @@ class ModbusClient:
    
 
     def connect(self):
-        """Connect to the Modbus server."""
+        """Connect to the Modbus server. Returns True on success."""
         if self.client.connect():
             _logger.info(f"Connected to Modbus server host : {self.host}")
+            return True
         else:
-            _logger.error("Failed to connect to Modbus server")
+            _logger.error(f"Failed to connect to Modbus server host : {self.host}")
+            return False
 
     def close(self):
         """Close the connection to the Modbus server."""
@@ -76,45 +79,105 @@ class ModbusClient:
             response = self.client.write_registers(start, values, unit=1)
             if response.isError():
                 _logger.error(f"Failed to write to registers {start} to {start+len(values)-1}")
+                return False
             # else:
             #     _logger.info(f"Successfully wrote to registers {start} to {start+len(values)-1}")
+            return True
         except ModbusException as exc:
             _logger.error(f"Modbus exception occurred while writing: {exc}")
             raise exc
 
     def registers_to_text(self, registers):
         """Convert a list of register values to ASCII text."""
-        text = ""
-        for reg in registers:
-            hex_value = f"{reg:04X}"
-            try:
-                char_pair = bytes.fromhex(hex_value).decode('ascii')
-                text += char_pair
-            except ValueError:
-                text += "?"
-                print(f"Warning: Could not decode hex value {hex_value}")
-        return text
+        return registers_to_text(registers)
 
     def text_to_registers(self, text):
-        registers = []
-        for i in range(0, len(text), 2):
-            char_pair = text[i:i+2].ljust(2, '\x00')
-            registers.append(int.from_bytes(char_pair.encode('ascii'), byteorder='big'))
-        return registers
+        return text_to_registers(text)
+
+    def read_registers(self, start, count):
+        """Read a block of holding registers. Returns the register list, or None on error."""
+        rr = self.client.read_holding_registers(start, count, unit=1)
+        if rr.isError():
+            _logger.error(f"Failed to read registers {start} to {start+count-1}: {rr}")
+            return None
+        return rr.registers
+
+    def write_registers(self, start, values):
+        """Write a block of holding registers. Returns True on success."""
+        response = self.client.write_registers(start, list(values), unit=1)
+        if response.isError():
+            _logger.error(f"Failed to write to registers {start} to {start+len(values)-1}")
+            return False
+        return True
+
+
+def registers_to_text(registers):
+    """Convert a list of register values to ASCII text, two characters per register (big-endian)."""
+    data = struct.pack(f">{len(registers)}H", *registers)
+    text = data.decode('ascii', errors='replace')
+    if '\ufffd' in text:
+        print(f"Warning: Could not decode registers {registers}")
+        text = text.replace('\ufffd', '?')
+    return text
+
+
+def text_to_registers(text):
+    """Convert ASCII text to register values, two characters per register (big-endian)."""
+    data = text.encode('ascii')
+    if len(data) % 2:
+        data += b'\x00'
+    return list(struct.unpack(f">{len(data) // 2}H", data))
+
+
+def plan_blocks(addresses, max_gap=0, max_count=120):
+    """
+    Merge register addresses into the fewest (start, count) blocks.
+
+    Addresses closer than ``max_gap`` unused registers apart end up in the same block, and no
+    block is longer than ``max_count`` registers (the Modbus limit for one request is 123/125).
+    """
+    blocks = []
+    for addr in sorted(set(addresses)):
+        if blocks:
+            start, count = blocks[-1]
+            end = start + count
+            if addr - end <= max_gap and addr - start < max_count:
+                blocks[-1] = (start, addr - start + 1)
+                continue
+        blocks.append((addr, 1))
+    return blocks
 
 
 class ModbusLED:
-    """Class for Modbus LED operations, reading/writing groups as JSON data."""
+    """Class for Modbus LED operations, reading/writing groups as JSON data.
+
+    The sign's register layout is kept in ``group_addr``. Writes go through a shadow copy of the
+    registers: only registers whose value changed are sent, and changed registers that sit next to
+    each other (or are separated only by registers whose value is known) are merged into one
+    ``write_registers`` request. Reads fetch all groups with as few block reads as possible.
+    """
     
-    def __init__(self, client):
-        """Initialize ModbusLED with an instance of ModbusClient."""
+    def __init__(self, client, max_write_gap=2, max_read_gap=20):
+        """
+        Initialize ModbusLED with an instance of ModbusClient.
+        :param max_write_gap: int, largest run of unchanged but known registers bridged in one write
+        :param max_read_gap: int, largest run of unused registers read through to merge two reads
+        """
         self.client = client
+        # (DigitAddr, Label, DigitNum, FontAddr, ColorAddr)
         self.group_addr = {
             'A': (60, '', 3, 213, 214),
             'B': (70, '', 3, 216, 217),
             'Lab': (80, '', 3, 219, 220)
         }
         self.brightness_addr = 40
+        self.max_write_gap = max_write_gap
+        self.max_read_gap = max_read_gap
+        # Write-behind cache of the sign's registers: address -> last value read or written
+        self.shadow = {}
+        # Groups whose registers must be rewritten regardless of the shadow (e.g. after a reconnect)
+        self.stale = set(self.group_addr)
+        self.transactions = 0
     
     def set_brightness(self, brightness):
         if not (0 <= brightness <= 9): #Description, DataType=Integer: 0=1, 1=2, 2=3
@@ -122,17 +185,39 @@ class ModbusLED:
             return
         
         self.client.client.write_registers(self.brightness_addr, brightness, unit=1)
+        self.transactions += 1
         _logger.info(f"Brightness set to {brightness}")
 
+    def value_addresses(self, group):
+        return range(self.group_addr[group][0], self.group_addr[group][0] + 2)
+
+    def read_blocks(self, addresses):
+        """Read the given addresses with coalesced block reads into the shadow. Returns False on error."""
+        for start, count in plan_blocks(addresses, self.max_read_gap):
+            registers = self.client.read_registers(start, count)
+            self.transactions += 1
+            if registers is None:
+                return False
+            self.shadow.update(zip(range(start, start + count), registers))
+        return True
+
+    def sync(self):
+        """Read the whole register map (values, font sizes and colors) into the shadow."""
+        addresses = []
+        for group, addr in self.group_addr.items():
+            addresses += list(self.value_addresses(group)) + [addr[3], addr[4]]
+        return self.read_blocks(addresses)
+
     def read(self):
         """Read values for groups A, B, Lab, and Mg, returning data as JSON."""
+        addresses = [a for group in self.group_addr for a in self.value_addresses(group)]
         data = {}
-        for key in self.group_addr:
-            register_addr = self.group_addr[key][0]
-            data[key] = self.client.read_register_group(register_addr, 2)
+        if self.read_blocks(addresses):
+            for key in self.group_addr:
+                data[key] = registers_to_text([self.shadow[a] for a in self.value_addresses(key)])
 
-        for key in data:
-            if data[key] and len(data[key]) == 4:
+        for key in self.group_addr:
+            if data.get(key) and len(data[key]) == 4:
                 data[key] = data[key][1] + data[key][0] + data[key][3] + data[key][2]
                 data[key] = data[key].replace('\x00', '')
             else:
@@ -154,31 +239,91 @@ class ModbusLED:
         """Check if the Modbus client socket is active."""
         return self.client.client.connected
         
-    def write(self, group, value):
-        """Write a decimal value to a specified group register."""
+    def invalidate(self, group=None):
+        """Forget what was written to one group (or all), so the next write goes to the sign."""
+        if group is None:
+            self.stale = set(self.group_addr)
+        else:
+            self.stale.add(group)
+            addr = self.group_addr[group]
+            for a in list(self.value_addresses(group)) + [addr[3], addr[4]]:
+                self.shadow.pop(a, None)
 
+    def encode(self, group, value):
+        """Return the registers {address: value} that display ``value`` in ``group``."""
         digit = self.group_addr[group][2]
-        register_addr = self.group_addr[group][0]
-        register_label = self.group_addr[group][1]
 
         font_size = 1 
         color = 1
         if value == 'Full':
             font_size = 1
             color = 0
+            msg = 'uFll'
+        else:
+            text = str(value).zfill(digit)
+            msg = text[1] + text[0] + '\x00' + text[2]
 
-        response = self.client.client.write_registers(self.group_addr[group][3], font_size, unit=1)
-        if response.isError():
-            # _logger.error(f"Failed to write to registers {start} to {start+len(values)-1}")
-            _logger.error(f"Failed to write to registers.")
-        response = self.client.client.write_registers(self.group_addr[group][4], color, unit=1)
-        if response.isError():
-            # _logger.error(f"Failed to write to registers {start} to {start+len(values)-1}")
-            _logger.error(f"Failed to write to registers.")
+        registers = dict(zip(self.value_addresses(group), text_to_registers(msg)))
+        registers[self.group_addr[group][3]] = font_size
+        registers[self.group_addr[group][4]] = color
+        return registers
 
-        if value == 'Full':
-            self.client.write_register_group(register_addr, 'uFll')
-        else:
-            value = str(value).zfill(digit)
-            msg = value[1] + value[0] + '\x00' + value[2]
-            self.client.write_register_group(register_addr, msg)
\ No newline at end of file
+    def plan_writes(self, registers):
+        """
+        Group changed registers into (start, values) writes, bridging gaps whose values are known.
+        """
+        writes = []
+        for start, count in plan_blocks(registers, self.max_write_gap):
+            addresses = range(start, start + count)
+            if all(a in registers or a in self.shadow for a in addresses):
+                writes.append((start, [registers.get(a, self.shadow.get(a)) for a in addresses]))
+                continue
+            # A gap with unknown contents must not be overwritten: split around it
+            for sub_start, sub_count in plan_blocks([a for a in addresses if a in registers]):
+                writes.append((sub_start, [registers[a] for a in range(sub_start, sub_start + sub_count)]))
+        return writes
+
+    def write_many(self, values, force=False):
+        """
+        Write several groups at once, e.g. {'A': 12, 'B': 'Full'}.
+
+        Only registers that differ from the shadow are sent, unless ``force`` is set or the group
+        was invalidated, and they are merged into as few requests as possible.
+        :return: bool, False when a write failed (the failed registers are dropped from the shadow,
+                 so they are sent again next time); True otherwise, also when nothing had to be sent
+        """
+        registers = {}
+        group_registers = {}
+        for group, value in values.items():
+            encoded = self.encode(group, value)
+            group_registers[group] = encoded
+            group_force = force or group in self.stale
+            for addr, register in encoded.items():
+                if group_force or self.shadow.get(addr) != register:
+                    registers[addr] = register
+        if not registers:
+            return True
+
+        failed = set()
+        for start, block in self.plan_writes(registers):
+            self.transactions += 1
+            if self.client.write_registers(start, block):
+                self.shadow.update(zip(range(start, start + len(block)), block))
+            else:
+                failed.update(range(start, start + len(block)))
+                for addr in range(start, start + len(block)):
+                    self.shadow.pop(addr, None)
+        # A group is fresh once all of its registers made it to the sign
+        for group, encoded in group_registers.items():
+            if not failed.intersection(encoded):
+                self.stale.discard(group)
+        return not failed
+
+    def write(self, group, value, force=False):
+        """
+        Write a decimal value to a specified group register.
+
+        Only the parts that differ from the last successful write are sent, unless ``force`` is set.
+        :return: bool, False when the write failed
+        """
+        return self.write_many({group: value}, force=force)
@@ -1,8 +1,9 @@
 import requests
 
 class ParkingLotClient:
-    def __init__(self, base_url):
+    def __init__(self, base_url, timeout=5):
         self.base_url = base_url
+        self.timeout = timeout  # HTTP timeout in seconds
 
     def get_available_slots(self):
         url = f'{self.base_url}/event'
@@ -11,7 +12,7 @@ class ParkingLotClient:
             "event": "get",
             "camera": "camera1"
         }
-        response = requests.post(url, json=payload)
+        response = requests.post(url, json=payload, timeout=self.timeout)
         if response.status_code == 200:
             data = response.json()
             available_slots = {}
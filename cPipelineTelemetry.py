@@ -0,0 +1,56 @@
+import time
+
+
+class PipelineTelemetry:
+    """Pipeline counters of one camera, turned into a compact rate-limited telemetry record.
+
+    The reader and processing threads only bump counters; ``record`` reports the rates and
+    deltas since the previous record, at most once per ``interval`` seconds.
+    """
+
+    def __init__(self, camera_name, interval=5.0):
+        self.camera_name = camera_name
+        self.interval = interval
+        self.counters = {"captured": 0, "dropped": 0, "processed": 0, "inference_s": 0.0, "reconnects": 0}
+        self.last = (time.time(), dict(self.counters))
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def record(self, queue_depth, in_counts, out_counts, now=None):
+        """
+        Build the telemetry record for the time since the previous one.
+        :param queue_depth: int, frames waiting for the processor
+        :param in_counts: int, vehicles counted in so far
+        :param out_counts: int, vehicles counted out so far
+        :return: dict, or None while the interval has not elapsed
+        """
+        now = time.time() if now is None else now
+        last_time, last = self.last
+        elapsed = now - last_time
+        if elapsed < self.interval or elapsed <= 0:
+            return None
+        current = dict(self.counters)
+        processed = current["processed"] - last["processed"]
+        self.last = (now, current)
+        return {
+            "camera": self.camera_name,
+            "ts": round(now, 3),
+            "capture_fps": round((current["captured"] - last["captured"]) / elapsed, 2),
+            "processed_fps": round(processed / elapsed, 2),
+            "queue_depth": queue_depth,
+            "dropped": current["dropped"] - last["dropped"],
+            "inference_ms": round(1000.0 * (current["inference_s"] - last["inference_s"]) / processed, 1) if processed else None,
+            "in_counts": in_counts,
+            "out_counts": out_counts,
+            "reconnects": current["reconnects"],
+        }
+
+
+if __name__ == "__main__":
+    telemetry = PipelineTelemetry("camera1", interval=1.0)
+    for _ in range(30):
+        telemetry.count("captured")
+        telemetry.count("processed")
+        telemetry.count("inference_s", 0.02)
+    print(telemetry.record(queue_depth=2, in_counts=5, out_counts=3, now=time.time() + 1.0))
@@ -0,0 +1,108 @@
+import time
+from collections import deque
+
+
+class RollingWindow:
+    """Samples from the last ``seconds`` seconds with a running sum and a value histogram.
+
+    Adding a sample and expiring old ones is amortized O(1); the mean comes from the running
+    sum, the median and mode from the histogram, whose size is the number of distinct values
+    (a few dozen for vehicle counts), not the number of samples.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()  # (ts, value)
+        self.total = 0
+        self.histogram = {}  # value -> number of samples
+
+    def add(self, value, ts):
+        self.samples.append((ts, value))
+        self.total += value
+        self.histogram[value] = self.histogram.get(value, 0) + 1
+        self.expire(ts)
+
+    def expire(self, now):
+        cutoff = now - self.seconds
+        while self.samples and self.samples[0][0] <= cutoff:
+            _, value = self.samples.popleft()
+            self.total -= value
+            remaining = self.histogram[value] - 1
+            if remaining:
+                self.histogram[value] = remaining
+            else:
+                del self.histogram[value]
+
+    def __len__(self):
+        return len(self.samples)
+
+    def mean(self):
+        return self.total / len(self.samples) if self.samples else None
+
+    def median(self):
+        """Lower median of the samples in the window."""
+        if not self.samples:
+            return None
+        middle = (len(self.samples) - 1) // 2
+        seen = 0
+        for value in sorted(self.histogram):
+            seen += self.histogram[value]
+            if seen > middle:
+                return value
+
+    def mode(self):
+        """Most frequent value; the larger one on ties."""
+        if not self.samples:
+            return None
+        return max(self.histogram.items(), key=lambda item: (item[1], item[0]))[0]
+
+
+class RollingStats:
+    """Smoothed counts over several time windows at once, e.g. 10 s, 1 min and 5 min.
+
+    Windows are time-based, so the smoothing does not change with the frame rate. Pass the
+    sample time explicitly (e.g. the video position) when processing recordings.
+    """
+
+    def __init__(self, windows=(10.0, 60.0, 300.0)):
+        """
+        :param windows: window lengths in seconds
+        """
+        self.windows = {seconds: RollingWindow(seconds) for seconds in windows}
+
+    def add(self, value, ts=None):
+        """
+        Add one sample to every window.
+        :param value: int or float, e.g. the number of cars in a frame
+        :param ts: float, sample time in seconds (default: now)
+        """
+        if ts is None:
+            ts = time.time()
+        for window in self.windows.values():
+            window.add(value, ts)
+
+    def mean(self, seconds):
+        return self.windows[seconds].mean()
+
+    def median(self, seconds):
+        return self.windows[seconds].median()
+
+    def mode(self, seconds):
+        return self.windows[seconds].mode()
+
+    def summary(self):
+        """{window: {"n": ..., "mean": ..., "median": ..., "mode": ...}} for every window."""
+        return {
+            seconds: {"n": len(window), "mean": window.mean(), "median": window.median(), "mode": window.mode()}
+            for seconds, window in self.windows.items()
+        }
+
+
+if __name__ == "__main__":
+    import random
+
+    stats = RollingStats()
+    for i in range(30 * 600):  # 10 minutes at 30 fps
+        stats.add(random.choice((11, 12, 12, 13)), ts=i / 30.0)
+    for seconds, values in stats.summary().items():
+        print(f"{seconds:>5.0f}s  {values}")
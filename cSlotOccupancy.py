@@ -0,0 +1,136 @@
+import json
+import sys
+
+import cv2
+import numpy as np
+
+
+class SlotOccupancy:
+    """Occupied/free state of individual parking slots from detection boxes.
+
+    The slot polygons are rasterized once into a label image (0 = no slot, i + 1 = slot i) at
+    a reduced resolution. For each frame the footprints of all boxes (their lower part, where
+    the car touches the ground) are painted into a coverage image with a 2-D difference array,
+    and one ``bincount`` over the covered labels gives the covered area of every slot. The cost
+    per frame depends on the raster size, not on the number of slots or boxes.
+
+    A slot turns occupied after ``on_frames`` consecutive covered frames and free after
+    ``off_frames`` consecutive uncovered ones, so a missed detection does not flip it.
+
+    Slot file (JSON); points are pixels of a frame of ``frame_size``, or fractions of the
+    frame when every coordinate is <= 1:
+
+        {"frame_size": [1920, 1080],
+         "slots": [{"name": "MG-01", "points": [[100, 400], [180, 400], [190, 520], [95, 520]]}, ...]}
+    """
+
+    def __init__(self, slots, frame_size, scale=0.25, min_overlap=0.3, footprint=0.5, on_frames=3, off_frames=5):
+        """
+        :param slots: list of (name, points) with points in frame pixels
+        :param frame_size: (width, height) of the frames the boxes refer to
+        :param scale: float, resolution of the label raster relative to the frame
+        :param min_overlap: float, fraction of a slot that must be covered for it to count as occupied
+        :param footprint: float, lower fraction of each box used as the car's footprint
+        :param on_frames: int, consecutive covered frames before a slot turns occupied
+        :param off_frames: int, consecutive uncovered frames before a slot turns free
+        """
+        self.names = [name for name, _ in slots]
+        self.polygons = [np.array(points, np.int32).reshape((-1, 1, 2)) for _, points in slots]
+        self.scale = scale
+        self.min_overlap = min_overlap
+        self.footprint = footprint
+        self.on_frames = on_frames
+        self.off_frames = off_frames
+
+        width, height = frame_size
+        self.raster_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        self.labels = np.zeros((self.raster_size[1], self.raster_size[0]), dtype=np.int32)
+        for i, polygon in enumerate(self.polygons):
+            scaled = np.round(polygon * scale).astype(np.int32)
+            cv2.fillPoly(self.labels, [scaled], i + 1)
+        self.slot_area = np.bincount(self.labels.ravel(), minlength=len(self.names) + 1).astype(np.float64)
+        self.slot_area[self.slot_area == 0] = 1.0  # Slots hidden by later ones never count as covered
+
+        self.occupied = np.zeros(len(self.names), dtype=bool)
+        self.streak = np.zeros(len(self.names), dtype=np.int32)  # Frames the raw state disagreed with `occupied`
+
+    @classmethod
+    def from_file(cls, path, frame_size, **kwargs):
+        """Load slot polygons from a JSON file (see the class docstring) for frames of ``frame_size``."""
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        width, height = frame_size
+        slots = []
+        for slot in config["slots"]:
+            points = np.array(slot["points"], dtype=np.float64)
+            if points.max() <= 1.0:
+                points = points * (width, height)
+            elif "frame_size" in config:
+                points = points * (width / config["frame_size"][0], height / config["frame_size"][1])
+            slots.append((slot["name"], points))
+        return cls(slots, frame_size, **kwargs)
+
+    def coverage(self, boxes):
+        """Fraction of every slot covered by the footprints of ``boxes`` (N x 4 xyxy, frame pixels)."""
+        height, width = self.labels.shape
+        covered = np.zeros((height + 1, width + 1), dtype=np.int32)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if len(boxes):
+            x1, y1, x2, y2 = (boxes * self.scale).T
+            y1 = y2 - (y2 - y1) * self.footprint
+            x1, x2 = np.clip(np.floor(x1), 0, width).astype(int), np.clip(np.ceil(x2), 0, width).astype(int)
+            y1, y2 = np.clip(np.floor(y1), 0, height).astype(int), np.clip(np.ceil(y2), 0, height).astype(int)
+            # Difference array: +1 at the top-left corner of each box, -1 past its right/bottom
+            # edges; two cumulative sums give the number of boxes over every pixel
+            np.add.at(covered, (y1, x1), 1)
+            np.add.at(covered, (y1, x2), -1)
+            np.add.at(covered, (y2, x1), -1)
+            np.add.at(covered, (y2, x2), 1)
+            covered = covered.cumsum(axis=0).cumsum(axis=1)
+        hits = np.bincount(self.labels[covered[:height, :width] > 0], minlength=len(self.names) + 1)
+        return hits[1:] / self.slot_area[1:]
+
+    def update(self, boxes):
+        """
+        Update every slot from the boxes of one frame.
+        :param boxes: array-like N x 4 (x1, y1, x2, y2) in frame pixels
+        :return: numpy bool array, occupied state per slot (in the order of ``names``)
+        """
+        raw = self.coverage(boxes) >= self.min_overlap
+        changed = raw != self.occupied
+        self.streak = np.where(changed, self.streak + 1, 0)
+        needed = np.where(self.occupied, self.off_frames, self.on_frames)
+        flip = changed & (self.streak >= needed)
+        self.occupied ^= flip
+        self.streak[flip] = 0
+        return self.occupied
+
+    def states(self):
+        """{slot name: True when occupied}"""
+        return dict(zip(self.names, self.occupied.tolist()))
+
+    def occupied_count(self):
+        return int(self.occupied.sum())
+
+    def free_count(self):
+        return len(self.names) - self.occupied_count()
+
+    def draw(self, img, thickness=2):
+        """Outline the slots on ``img``: red when occupied, green when free."""
+        for polygon, occupied in zip(self.polygons, self.occupied):
+            cv2.polylines(img, [polygon], True, (0, 0, 255) if occupied else (0, 255, 0), thickness)
+        return img
+
+
+if __name__ == "__main__":
+    # Check a slot file against a video: python cSlotOccupancy.py mg_slots.json video.mp4
+    slot_path, video_path = sys.argv[1], sys.argv[2]
+    cap = cv2.VideoCapture(video_path)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret:
+        print(f"Could not read a frame from {video_path}")
+        sys.exit(1)
+    slot_map = SlotOccupancy.from_file(slot_path, (frame.shape[1], frame.shape[0]))
+    cv2.imwrite("slots_preview.jpg", slot_map.draw(frame))
+    print(f"{len(slot_map.names)} slots drawn to slots_preview.jpg")
@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from cDatabase import open_database
+from cMQTTClient import SLOTS_TOPIC
+
+
+class SlotService:
+    """Per-zone slot accounting held in memory and shared by all camera processes.
+
+    Every ``in``/``out`` event updates the zone's occupancy under one lock and is journaled
+    to SQLite (the journal row and the new zone state in one transaction), so the counts
+    survive a restart. Reads are served from memory, and subscribers are called with the new
+    availability after every change. Events carrying an ``event_id`` (the outbox idempotency
+    key) are applied only once, so redelivered events do not count twice.
+    """
+
+    DELTAS = {"in": 1, "out": -1}
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS zones ("
+        " zone TEXT PRIMARY KEY,"
+        " capacity INTEGER NOT NULL,"
+        " occupied INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS journal ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " ts REAL NOT NULL,"
+        " zone TEXT NOT NULL,"
+        " event TEXT NOT NULL,"
+        " camera TEXT,"
+        " event_id TEXT,"
+        " occupied INTEGER NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS journal_ts ON journal (ts)",
+    )
+
+    def __init__(self, capacities, db_path="D:\\CarPark\\slots\\slots.db", mqtt_client=None, dedupe_size=10000):
+        """
+        :param capacities: dict, number of slots per zone, e.g. {'a': 120, 'b': 80, 'lab': 60}
+        :param db_path: str, SQLite journal file
+        :param mqtt_client: optional MQTTClient; availability is published to SLOTS_TOPIC on change
+        :param dedupe_size: int, number of recent event ids remembered for duplicate detection
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.zones = {}  # zone -> [capacity, occupied]
+        self.seen = OrderedDict()  # Recent event ids
+        self.dedupe_size = dedupe_size
+        self.subscribers = []
+        self.version = 0
+
+        self.conn = open_database(db_path, self.SCHEMA)
+        self.restore(capacities)
+
+        if mqtt_client is not None:
+            self.subscribe(lambda slots: mqtt_client.publish(SLOTS_TOPIC, json.dumps(slots), qos=1, retain=True, priority=True))
+
+    def restore(self, capacities):
+        """Load the journaled state and apply the configured capacities."""
+        with self.lock:
+            for zone, capacity, occupied in self.conn.execute("SELECT zone, capacity, occupied FROM zones"):
+                self.zones[zone] = [capacity, occupied]
+            for zone, capacity in capacities.items():
+                occupied = min(self.zones.get(zone, [0, 0])[1], int(capacity))
+                self.zones[zone] = [int(capacity), occupied]
+                self.conn.execute("INSERT OR REPLACE INTO zones (zone, capacity, occupied) VALUES (?, ?, ?)",
+                                  (zone, int(capacity), occupied))
+            rows = self.conn.execute(
+                "SELECT event_id FROM journal WHERE event_id IS NOT NULL ORDER BY id DESC LIMIT ?", (self.dedupe_size,)
+            ).fetchall()
+            for (event_id,) in reversed(rows):
+                self.seen[event_id] = True
+
+    def subscribe(self, callback):
+        """
+        Register a change listener.
+        :param callback: callable(slots) with the same dict as available_slots(), called after each change
+        """
+        self.subscribers.append(callback)
+
+    def apply(self, gate, event, camera=None, event_id=None, ts=None):
+        """
+        Count one event.
+        :param gate: str, zone name
+        :param event: str, "in" or "out"; other events are ignored
+        :return: bool, True when the occupancy changed
+        """
+        delta = self.DELTAS.get(event)
+        if delta is None:
+            return False
+        if gate not in self.zones:
+            self.warn_unknown_zone(gate, event, camera)
+            return False
+        with self.lock:
+            if event_id is not None:
+                if event_id in self.seen:
+                    return False
+                self.remember(event_id)
+            capacity, occupied = self.zones[gate]
+            new = max(0, min(capacity, occupied + delta))
+            self.journal(gate, event, camera, event_id, new, ts)
+            if new == occupied:
+                return False
+            self.zones[gate][1] = new
+            self.version += 1
+            slots = self.available_slots_locked()
+        self.notify(slots)
+        return True
+
+    def set_occupied(self, zone, occupied, camera=None):
+        """Correct a zone's occupancy, e.g. after a manual count. Journaled as a "set" event."""
+        if occupied is None:
+            return False
+        if zone not in self.zones:
+            self.warn_unknown_zone(zone, "set", camera)
+            return False
+        with self.lock:
+            capacity = self.zones[zone][0]
+            occupied = max(0, min(capacity, int(occupied)))
+            self.journal(zone, "set", camera, None, occupied)
+            self.zones[zone][1] = occupied
+            self.version += 1
+            slots = self.available_slots_locked()
+        self.notify(slots)
+        return True
+
+    def warn_unknown_zone(self, zone, event, camera):
+        print(f"Slot service: ignored {event!r} from {camera} for unknown zone {zone!r}; "
+              f"configured zones: {', '.join(self.zones)} (see SLOT_CAPACITIES)")
+
+    def remember(self, event_id):
+        self.seen[event_id] = True
+        if len(self.seen) > self.dedupe_size:
+            self.seen.popitem(last=False)
+
+    def journal(self, zone, event, camera, event_id, occupied, ts=None):
+        """Write the journal row and the new zone state in one transaction; called with the lock held."""
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.execute(
+                "INSERT INTO journal (ts, zone, event, camera, event_id, occupied) VALUES (?, ?, ?, ?, ?, ?)",
+                (ts if ts is not None else time.time(), zone, event, camera, event_id, occupied),
+            )
+            self.conn.execute("UPDATE zones SET occupied = ? WHERE zone = ?", (occupied, zone))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def notify(self, slots):
+        for callback in list(self.subscribers):
+            try:
+                callback(slots)
+            except Exception as e:
+                print(f"Slot subscriber failed: {e}")
+
+    def available_slots_locked(self):
+        return {f"current_{zone}": capacity - occupied for zone, (capacity, occupied) in self.zones.items()}
+
+    def available_slots(self):
+        """Free slots per zone, same shape as ParkingLotClient.get_available_slots."""
+        with self.lock:
+            return self.available_slots_locked()
+
+    def data(self):
+        """Zone counters in the server's "data" format ({'current_a_left': ..., ...})."""
+        with self.lock:
+            data = {}
+            for zone, (capacity, occupied) in self.zones.items():
+                data[f"current_{zone}_left"] = capacity - occupied
+                data[f"current_{zone}_occupied"] = occupied
+                data[f"current_{zone}_capacity"] = capacity
+            return data
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class SlotRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end compatible with the server's ``/event`` and ``/events`` endpoints.
+
+    POST /event   {"gate": "a", "event": "in", "camera": "cam_mg"}  (event "get" only reads)
+    POST /events  {"events": [...]}
+    GET  /slots   available slots per zone
+    """
+
+    service = None  # Set by serve()
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/slots":
+            self.reply(200, self.service.available_slots())
+        else:
+            self.reply(404, {"status": "error", "message": "not found"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self.reply(400, {"status": "error", "message": f"invalid JSON: {e}"})
+            return
+
+        if path == "/event":
+            events = [body]
+        elif path == "/events":
+            events = body.get("events", [])
+        else:
+            self.reply(404, {"status": "error", "message": "not found"})
+            return
+
+        applied = 0
+        for payload in events:
+            if payload.get("event") == "set":
+                if self.service.set_occupied(payload.get("gate"), payload.get("detail"), payload.get("camera")):
+                    applied += 1
+            elif self.service.apply(payload.get("gate"), payload.get("event"), payload.get("camera"), payload.get("event_id")):
+                applied += 1
+        self.reply(200, {"status": "success", "applied": applied, "data": self.service.data()})
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Every camera posts here; keep the console for errors
+        pass
+
+
+def serve(service, host="127.0.0.1", port=5050):
+    """Create the HTTP server for ``service``; call serve_forever() on the result."""
+    handler = type("BoundSlotRequestHandler", (SlotRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def parse_capacities(text):
+    """Parse "a:120,b:80,lab:60" into {'a': 120, 'b': 80, 'lab': 60}."""
+    capacities = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        zone, _, capacity = item.partition(":")
+        capacities[zone.strip()] = int(capacity)
+    return capacities
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from cMQTTClient import MQTTClient
+    from cParkingLotClient import ParkingLotClient
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run the local slot accounting service.")
+    parser.add_argument('--host', default="127.0.0.1", help="Address to listen on")
+    parser.add_argument('--port', type=int, default=5050, help="Port to listen on")
+    parser.add_argument('--db', default="D:\\CarPark\\slots\\slots.db", help="SQLite journal file")
+    parser.add_argument('--capacities', default=os.getenv('SLOT_CAPACITIES', ""), help='Slots per zone, e.g. "a:120,b:80,lab:60"')
+    parser.add_argument('--seed-from', help="Server URL to take the current occupancy from (e.g. http://127.0.0.1:5000)")
+    args = parser.parse_args()
+
+    mqtt_client = None
+    if os.getenv('MQTT_HOST'):
+        mqtt_client = MQTTClient(broker_address=os.getenv('MQTT_HOST'), port=os.getenv('MQTT_PORT', 1883),
+                                 username=os.getenv('MQTT_USER'), password=os.getenv('MQTT_PASS'))
+        mqtt_client.connect()
+
+    service = SlotService(parse_capacities(args.capacities), db_path=args.db, mqtt_client=mqtt_client)
+    if args.seed_from:
+        for zone, left in (ParkingLotClient(args.seed_from).get_available_slots() or {}).items():
+            zone = zone.replace("current_", "")
+            if zone in service.zones:
+                service.set_occupied(zone, service.zones[zone][0] - left, camera="seed")
+
+    httpd = serve(service, args.host, args.port)
+    print(f"Slot service on http://{args.host}:{args.port}: {service.available_slots()}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nExiting loop.")
+    httpd.server_close()
+    service.close()
+    if mqtt_client is not None:
+        mqtt_client.disconnect()
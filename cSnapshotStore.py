@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from cDatabase import open_database
+from common_functions import image_resize
+
+
+class SnapshotStore:
+    """Event snapshots sharded by date and zone, with a compact SQLite index.
+
+    Images are stored as ``{root}/YYYY/MM/DD/zone_{zone}/{YYYYmmdd_HHMMSS}_zone_{zone}_{event}.jpg``
+    so no directory grows without bound, and every file is listed in the index
+    (path, time, zone, event, size, thumbnail). Dashboards and retention read the index
+    instead of scanning directories.
+    """
+
+    COLUMNS = ("id", "ts", "zone", "event", "path", "size", "thumb")
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS snapshots ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " ts REAL NOT NULL,"
+        " zone TEXT NOT NULL,"
+        " event TEXT NOT NULL,"
+        " path TEXT NOT NULL,"
+        " size INTEGER NOT NULL,"
+        " thumb TEXT)",
+        "CREATE INDEX IF NOT EXISTS snapshots_ts ON snapshots (ts)",
+        "CREATE INDEX IF NOT EXISTS snapshots_zone_ts ON snapshots (zone, ts)",
+    )
+
+    def __init__(self, root="D:\\CarPark\\history", thumbnail_width=160):
+        """
+        :param root: str, base directory of the store
+        :param thumbnail_width: int, width of generated thumbnails, or None to skip them
+        """
+        self.root = root
+        self.thumbnail_width = thumbnail_width
+        os.makedirs(root, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = open_database(os.path.join(root, "snapshots.db"), self.SCHEMA)
+
+    def path_for(self, zone, event, ts):
+        """Return (image path, thumbnail path) for a snapshot taken at UNIX time ``ts``."""
+        moment = datetime.fromtimestamp(ts)
+        shard = os.path.join(self.root, moment.strftime("%Y"), moment.strftime("%m"), moment.strftime("%d"), f"zone_{zone}")
+        name = "{}_zone_{}_{}.jpg".format(moment.strftime("%Y%m%d_%H%M%S"), zone, event)
+        return os.path.join(shard, name), os.path.join(shard, "thumbs", name)
+
+    def save(self, writer, img, zone, event, extra_paths=(), ts=None):
+        """
+        Store a snapshot through a SnapshotWriter and index it once it is on disk.
+        :param writer: SnapshotWriter used to encode and write the image
+        :param extra_paths: other destinations for the same encoded bytes (e.g. web server copies)
+        :return: str, path of the stored snapshot
+        """
+        if ts is None:
+            ts = time.time()
+        path, thumb = self.path_for(zone, event, ts)
+        if self.thumbnail_width:
+            writer.save(image_resize(img, width=self.thumbnail_width), [thumb])
+        else:
+            thumb = None
+
+        def index(paths, data):
+            self.add(path, ts, zone, event, len(data), thumb)
+
+        writer.save(img, list(extra_paths) + [path], callback=index)
+        return path
+
+    def add(self, path, ts, zone, event, size, thumb=None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO snapshots (ts, zone, event, path, size, thumb) VALUES (?, ?, ?, ?, ?, ?)",
+                (ts, zone, event, path, size, thumb),
+            )
+
+    def recent(self, n=20, zone=None, event=None):
+        """Return the ``n`` newest snapshots as dicts, optionally for one zone and/or event."""
+        clauses, params = [], []
+        if zone is not None:
+            clauses.append("zone = ?")
+            params.append(zone)
+        if event is not None:
+            clauses.append("event = ?")
+            params.append(event)
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM snapshots"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        with self.lock:
+            rows = self.conn.execute(sql, params + [int(n)]).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def total_size(self):
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM snapshots").fetchone()[0]
+
+    def enforce_retention(self, max_age_days=None, max_bytes=None, chunk_size=500):
+        """
+        Delete the oldest snapshots until none is older than ``max_age_days`` and the store
+        holds at most ``max_bytes``.
+        :return: int, number of deleted snapshots
+        """
+        deleted = 0
+        if max_age_days is not None:
+            cutoff = time.time() - max_age_days * 86400
+            while True:
+                with self.lock:
+                    rows = self.conn.execute(
+                        "SELECT id, path, thumb FROM snapshots WHERE ts < ? ORDER BY ts LIMIT ?", (cutoff, chunk_size)
+                    ).fetchall()
+                if not rows:
+                    break
+                deleted += self.remove(rows)
+
+        if max_bytes is not None:
+            excess = self.total_size() - max_bytes
+            while excess > 0:
+                with self.lock:
+                    rows = self.conn.execute(
+                        "SELECT id, path, thumb, size FROM snapshots ORDER BY ts LIMIT ?", (chunk_size,)
+                    ).fetchall()
+                if not rows:
+                    break
+                selected = []
+                for row in rows:
+                    if excess <= 0:
+                        break
+                    selected.append(row[:3])
+                    excess -= row[3]
+                deleted += self.remove(selected)
+        return deleted
+
+    def remove(self, rows):
+        """Delete snapshot files and their index rows; rows are (id, path, thumb)."""
+        for _, path, thumb in rows:
+            for file_path in (path, thumb):
+                if not file_path:
+                    continue
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Failed to delete snapshot {file_path}: {e}")
+        with self.lock:
+            self.conn.executemany("DELETE FROM snapshots WHERE id = ?", [(row[0],) for row in rows])
+        return len(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    store = SnapshotStore()
+    for snapshot in store.recent(10):
+        print(datetime.fromtimestamp(snapshot["ts"]), snapshot["zone"], snapshot["event"], snapshot["path"])
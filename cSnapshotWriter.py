@@ -0,0 +1,90 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from common_functions import image_resize
+
+
+def write_atomic(path, data, retries=3):
+    """
+    Write bytes to ``path`` through a temporary file and a rename, so readers (e.g. the
+    web server) never see a half-written image. Every call uses its own temporary file,
+    which is removed whenever the write does not complete.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory or None)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        for attempt in range(retries):
+            try:
+                os.replace(tmp_path, path)
+                return
+            except PermissionError:
+                # On Windows the target may be briefly locked while it is being served
+                if attempt == retries - 1:
+                    raise
+                time.sleep(0.05)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SnapshotWriter:
+    """Encodes a snapshot once and writes the bytes to every destination on a background thread.
+
+    A single writer thread runs the writes in submission order, so an older crop never
+    replaces a newer one of the same zone file.
+    """
+
+    def __init__(self, jpeg_quality=90, max_width=None):
+        """
+        :param jpeg_quality: int, JPEG quality (0-100)
+        :param max_width: int, optional width the snapshot is downscaled to before encoding
+        """
+        self.jpeg_quality = jpeg_quality
+        self.max_width = max_width
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+
+    def encode(self, img):
+        """Encode an image to JPEG bytes, downscaling it first when it is wider than max_width."""
+        if self.max_width and img.shape[1] > self.max_width:
+            img = image_resize(img, width=self.max_width)
+        success, buffer = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), int(self.jpeg_quality)])
+        if not success:
+            raise ValueError("Failed to encode snapshot")
+        return buffer.tobytes()
+
+    def save(self, img, paths, callback=None):
+        """
+        Encode ``img`` on the calling thread and write it to all ``paths`` in the background.
+
+        The image is encoded before returning, so the caller may keep drawing on the frame.
+        :param callback: optional callable(paths, data) run on the writer thread once all writes finished
+        :return: concurrent.futures.Future
+        """
+        data = self.encode(img)
+        return self.executor.submit(self.write_all, list(paths), data, callback)
+
+    def write_all(self, paths, data, callback=None):
+        for path in paths:
+            try:
+                write_atomic(path, data)
+            except OSError as e:
+                print(f"Failed to write snapshot {path}: {e}")
+        if callback is not None:
+            try:
+                callback(paths, data)
+            except Exception as e:
+                print(f"Snapshot callback failed: {e}")
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,186 @@
+import json
+import os
+import re
+
+import numpy as np
+
+
+class TrackArray(np.ndarray):
+    """NumPy array with the tensor methods the object counters call (``cpu()``, ``int()``)."""
+
+    def cpu(self):
+        return self
+
+    def int(self):
+        return self.astype(np.int64)
+
+
+class CachedBoxes:
+    """Stand-in for ultralytics ``Boxes`` built from cached rows of one frame."""
+
+    def __init__(self, xyxy, cls, conf, ids):
+        self.xyxy = xyxy.view(TrackArray)
+        self.cls = cls.astype(np.float32).view(TrackArray)
+        self.conf = conf.view(TrackArray)
+        # Like ultralytics: no ids at all when the tracker did not assign any
+        self.id = ids.astype(np.float32).view(TrackArray) if len(ids) and (ids >= 0).all() else None
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class CachedResult:
+    """Stand-in for one ultralytics ``Results`` object, as passed to ``start_counting``."""
+
+    obb = None
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+def segment_paths(path):
+    """Segment files of the track cache ``path`` ({stem}_part000.npz, ...), in order."""
+    stem, ext = os.path.splitext(path)
+    pattern = re.compile(re.escape(os.path.basename(stem)) + r"_part(\d+)" + re.escape(ext) + "$")
+    parts = []
+    for name in os.listdir(os.path.dirname(path) or "."):
+        match = pattern.match(name)
+        if match:
+            parts.append((int(match.group(1)), os.path.join(os.path.dirname(path), name)))
+    return [part_path for _, part_path in sorted(parts)]
+
+
+def read_meta(path):
+    with np.load(path) as data:
+        return json.loads(str(data["meta"]))
+
+
+def max_track_id(parts):
+    """Largest track id stored in the segment files ``parts``, -1 when there is none."""
+    largest = -1
+    for part_path in parts:
+        with np.load(part_path) as data:
+            if len(data["track_id"]):
+                largest = max(largest, int(data["track_id"].max()))
+    return largest
+
+
+class TrackCacheWriter:
+    """Collects the tracker output of every processed frame and saves it in compressed npz segments.
+
+    Columns (one row per box): frame, ts, track_id (-1 without an id), cls, conf, xyxy. The
+    metadata records what the counter needs to replay the frames: camera, class names, frame
+    size, counting line and track point algorithm.
+
+    Every ``segment_frames`` frames the rows collected so far are written to the next segment
+    (``{stem}_part000.npz``, ``{stem}_part001.npz``, ...), so memory stays bounded and a crash
+    loses at most one segment. With ``resume`` a writer opened on an existing cache continues
+    after its last segment and frame; otherwise the old segments are removed. The tracker of a
+    restarted process numbers its tracks from 1 again, so resumed track ids are shifted past the
+    largest id already stored: a replay never links two different vehicles into one track.
+    """
+
+    def __init__(self, path, segment_frames=2400, resume=True, **meta):
+        """
+        :param path: str, cache path (.npz); the segments are written next to it
+        :param segment_frames: int, frames per segment (2400 = 5 minutes at 8 FPS)
+        :param resume: bool, append to existing segments instead of starting over
+        :param meta: camera, names, frame_size, reg_pts, algorithm, source, ...
+        """
+        self.path = path
+        self.segment_frames = max(1, int(segment_frames))
+        self.meta = meta
+        self.chunks = []
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        parts = segment_paths(path)
+        if not resume:
+            for part_path in parts:
+                os.remove(part_path)
+            parts = []
+        self.part = 0
+        self.frames = 0  # Frames added so far, including those of earlier segments
+        self.max_track_id = -1  # Largest stored track id, including those of earlier segments
+        if parts:
+            last = read_meta(parts[-1])
+            self.part = int(re.search(r"_part(\d+)", os.path.basename(parts[-1])).group(1)) + 1
+            self.frames = last["first_frame"] + last["frames"]
+            self.max_track_id = last.get("max_track_id")
+            if self.max_track_id is None:  # Segments written before the id was recorded
+                self.max_track_id = max_track_id(parts)
+        # Added to every track id of this session
+        self.id_offset = self.max_track_id + 1
+        self.segment_start = self.frames
+
+    def add(self, tracks, ts):
+        """Store the boxes of one ``model.track`` result."""
+        boxes = tracks[0].boxes
+        data = boxes.data.cpu().numpy() if boxes is not None else np.zeros((0, 6), np.float32)
+        # Columns x1, y1, x2, y2, [track id,] conf, cls
+        ids = data[:, 4] if data.shape[1] == 7 else np.full(len(data), -1.0)
+        ids = np.where(ids >= 0, ids + self.id_offset, -1)
+        if len(ids):
+            self.max_track_id = max(self.max_track_id, int(ids.max()))
+        self.chunks.append((np.full(len(data), self.frames, np.int32), np.full(len(data), ts),
+                            ids.astype(np.int32), data[:, -1].astype(np.int16), data[:, -2].astype(np.float32),
+                            data[:, :4].astype(np.float32)))
+        self.frames += 1
+        if self.frames - self.segment_start >= self.segment_frames:
+            self.flush()
+
+    def flush(self):
+        """Write the frames added since the last segment to a new segment file."""
+        if self.frames == self.segment_start:
+            return
+        frame, ts, track_id, cls, conf, xyxy = (np.concatenate(parts) for parts in zip(*self.chunks))
+        stem, ext = os.path.splitext(self.path)
+        part_path = f"{stem}_part{self.part:03d}{ext}"
+        meta = dict(self.meta, first_frame=self.segment_start, frames=self.frames - self.segment_start,
+                    max_track_id=self.max_track_id)
+        tmp_path = part_path + ".tmp.npz"  # savez appends .npz to names without it
+        np.savez_compressed(tmp_path, frame=frame, ts=ts, track_id=track_id, cls=cls, conf=conf, xyxy=xyxy,
+                            meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, part_path)
+        self.chunks = []
+        self.part += 1
+        self.segment_start = self.frames
+
+    def close(self):
+        self.flush()
+
+
+class TrackCache:
+    """Reads the segments written by TrackCacheWriter and replays them frame by frame."""
+
+    def __init__(self, path):
+        """
+        :param path: str, cache path as given to the writer (a single .npz without segments also works)
+        """
+        parts = segment_paths(path) or [path]
+        columns = {name: [] for name in ("frame", "ts", "track_id", "cls", "conf", "xyxy")}
+        self.frames = 0
+        for part_path in parts:
+            with np.load(part_path) as data:
+                for name in columns:
+                    columns[name].append(data[name])
+                meta = json.loads(str(data["meta"]))
+            self.frames = max(self.frames, meta.get("first_frame", 0) + meta["frames"])
+        self.meta = meta
+        self.frame, self.ts, self.track_id, self.cls, self.conf, self.xyxy = (
+            np.concatenate(columns[name]) for name in ("frame", "ts", "track_id", "cls", "conf", "xyxy"))
+        self.segments = len(parts)
+        # JSON turns the integer class ids of the names dict into strings
+        self.names = {int(k): v for k, v in self.meta.get("names", {}).items()}
+
+    def __len__(self):
+        return self.frames
+
+    def results(self):
+        """Yield (frame index, ts, [CachedResult]) for every stored frame, including empty ones."""
+        bounds = np.searchsorted(self.frame, np.arange(len(self) + 1))
+        for i in range(len(self)):
+            rows = slice(bounds[i], bounds[i + 1])
+            ts = float(self.ts[bounds[i]]) if bounds[i] < bounds[i + 1] else None
+            boxes = CachedBoxes(self.xyxy[rows], self.cls[rows], self.conf[rows], self.track_id[rows])
+            yield i, ts, [CachedResult(boxes)]
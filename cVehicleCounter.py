@@ -1,4 +1,5 @@
 import sys, os
+import json
 from pathlib import Path
 import cv2
 import time
@@ -7,11 +8,17 @@ from datetime import datetime
 from collections import defaultdict
 from ultralytics import YOLO
 import threading
-from queue import Queue
+from queue import Queue, Full
 import torch
 
 from cParkingLotClient import ParkingLotClient
-from cDeviceStatusUpdater import DeviceStatusUpdater
+from cDeviceStatusUpdater import DeviceStatusUpdater, DeviceStatusReporter
+from cSnapshotWriter import SnapshotWriter
+from cEventHistory import EventHistory
+from cSnapshotStore import SnapshotStore
+from cMQTTClient import SLOTS_TOPIC
+from cTrackCache import TrackCacheWriter
+from cPipelineTelemetry import PipelineTelemetry
 # Set YOLO to quiet mode
 os.environ['YOLO_VERBOSE'] = 'False'
 
@@ -41,7 +48,17 @@ class VehicleCounter:
         exist_ok=False,
         line_thickness=2,
         track_thickness=1,
-        region_thickness=1
+        region_thickness=1,
+        snapshot_quality=90,
+        snapshot_max_width=None,
+        mqtt_client=None,
+        mqtt_publish_interval=5.0,
+        slot_service_url=None,
+        offline=False,
+        frame_stride=1,
+        track_cache_path=None,
+        dry_run=None,
+        history_export=False
     ):
         self.weights = weights
         self.source = source
@@ -53,6 +70,22 @@ class VehicleCounter:
         self.track_thickness = track_thickness
         self.region_thickness = region_thickness
         self.camera_name = camera_name
+        self.mqtt_client = mqtt_client
+        self.mqtt_publish_interval = mqtt_publish_interval
+        # Offline replay of a recording: every frame (or every frame_stride-th) is processed,
+        # the reader waits for the processor instead of dropping frames, and nothing is throttled
+        self.offline = offline
+        self.frame_stride = max(1, int(frame_stride))
+        # A dry run only counts: no events to the server or slot service, no snapshots and no
+        # history rows, so replays never touch the live outboxes and stores. Default: offline
+        self.dry_run = offline if dry_run is None else dry_run
+        # Optional per-frame track file (.npz) for re-counting with another line without
+        # re-running the model, see recount_tracks.py
+        self.track_cache_path = track_cache_path
+        self.track_cache = None
+        # Pipeline counters published as telemetry on SYS/{camera_name}
+        self.telemetry = PipelineTelemetry(camera_name, interval=mqtt_publish_interval)
+        self.slots_dirty = threading.Event()  # Set by publish_slots, before the outbox flusher starts
         self.track_history = defaultdict(list)
         self.img = None
         self.stop_event = threading.Event()
@@ -61,6 +94,14 @@ class VehicleCounter:
         self.last_check_time = None
         self.text_size_bg = 7
         self.text_size_front = 3
+        self.snapshot_writer = None
+        self.snapshot_store = None
+        self.history = None
+        if not self.dry_run:
+            self.snapshot_writer = SnapshotWriter(jpeg_quality=snapshot_quality, max_width=snapshot_max_width)
+            self.snapshot_store = SnapshotStore()
+            # Only the process started with history_export rewrites the legacy history.txt
+            self.history = EventHistory(legacy_export=history_export)
 
 
         # if 'lab-out' in self.camera_name:
@@ -84,26 +125,51 @@ class VehicleCounter:
         self.frame_width = int(self.videocapture.get(3))
         self.frame_height = int(self.videocapture.get(4))
         self.fps = 30 #int(self.videocapture.get(5))
+        if self.offline and self.videocapture.get(cv2.CAP_PROP_FPS) > 0:
+            self.fps = self.videocapture.get(cv2.CAP_PROP_FPS) / self.frame_stride
         self.fourcc = cv2.VideoWriter_fourcc(*"mp4v")
 
         # Define classes to track
         self.classes = [2, 5, 6, 7]  # Define your own classes here
 
         base_url = "http://127.0.0.1:5000"
-        self.apiClient = APIClient(base_url)  # Your Flask server URL
-        self.parking_lot_client = ParkingLotClient(base_url)
+        outbox_path = f"D:\\CarPark\\outbox\\{self.camera_name}.db"
+        # With a local slot service the counts are kept (and pushed to MQTT) there; the server
+        # still receives every event for its records
+        self.slot_client = None
+        self.apiClient = None
+        self.status_reporter = None
+        if not self.dry_run:
+            if slot_service_url:
+                self.slot_client = APIClient(slot_service_url, outbox_path=f"D:\\CarPark\\outbox\\{self.camera_name}_slots.db", linger=0.0)
+            self.apiClient = APIClient(base_url, outbox_path=outbox_path, on_delivered=None if slot_service_url else self.publish_slots)  # Your Flask server URL
+            self.status_reporter = DeviceStatusReporter(DeviceStatusUpdater(base_url, outbox=self.apiClient.outbox))
+        self.parking_lot_client = ParkingLotClient(slot_service_url or base_url)
 
         # Set desired width and height for output video
         self.new_width, self.new_height = self.calculate_new_size(width=1280, height=None)
         self.vdo_width, self.vdo_height = self.calculate_new_size(width=self.vdo_width, height=None)
 
-        self.init_video_writer()
+        # The annotated recording of the live stream; offline replays only produce their counts,
+        # so parallel workers never write into the live recordings folder
+        self.video_writer = None
+        if not self.offline:
+            self.init_video_writer()
         self.bLoop=True
+
+        # Slot availability is fetched and published on its own thread, so a slow server never
+        # holds up the outbox flusher that reports deliveries
+        self.slots_thread = None
+        if self.mqtt_client is not None and not slot_service_url:
+            self.slots_thread = threading.Thread(target=self.run_slot_publisher, daemon=True)
+            self.slots_thread.start()
         
          # Initialize the thread for monitoring camera status
-        self.monitor_thread = threading.Thread(target=self.run_monitor)
-        self.monitor_thread.daemon = True  # Daemon thread will exit when the main program exits
-        self.monitor_thread.start()
+        self.monitor_thread = None
+        if not self.offline:
+            self.monitor_thread = threading.Thread(target=self.run_monitor)
+            self.monitor_thread.daemon = True  # Daemon thread will exit when the main program exits
+            self.monitor_thread.start()
       
     def check_camera_status(self):
         # Try to open the video capture (RTSP stream or video source)
@@ -124,16 +190,17 @@ class VehicleCounter:
                 print(f"Camera {self.camera_name} is offline.")
                 status = "offline"
             
-            # Send the status to the server
-            updater = DeviceStatusUpdater("http://localhost:5000")  # Replace with your server URL
-            response = updater.send_status(self.camera_name, status)
+            # Report the status; the reporter sends changes and a periodic heartbeat
+            if self.status_reporter is not None:
+                self.status_reporter.report(self.camera_name, status)
             # print(f"Camera {self.camera_name} status update response: {response}")
             
             time.sleep(60)  # Check status every 10 seconds
 
     def stop_monitoring(self):
         self.stop_event.set()  # Stop the monitoring thread
-        self.monitor_thread.join()  # Wait for the thread to finish
+        if self.monitor_thread is not None:
+            self.monitor_thread.join()  # Wait for the thread to finish
 
     def init_video_writer(self):
         # Get the current date and time
@@ -180,6 +247,9 @@ class VehicleCounter:
         new_frame_time = 0
  
         """Thread function to collect images from the camera stream."""
+        if self.offline:
+            self.collect_images_offline()
+            return
         while self.bLoop:
             success, im0 = self.videocapture.read()
             if not success:
@@ -188,8 +258,10 @@ class VehicleCounter:
                 print("Re-initial for video process.")
                 self.videocapture.release()
                 self.videocapture = cv2.VideoCapture(self.source)
+                self.telemetry.count("reconnects")
                 print("Re-initial finished.")
                 continue
+            self.telemetry.count("captured")
             im0 = cv2.resize(im0, (self.new_width, self.new_height))
 
             # Calculate FPS
@@ -207,9 +279,41 @@ class VehicleCounter:
             else:
                 self.image_queue.get()  # Remove the oldest frame if queue is full
                 self.image_queue.put(im0)
+                self.telemetry.count("dropped")
             # time.sleep(0.075)
         self.videocapture.release()
 
+    def collect_images_offline(self):
+        """Read a recording into the queue without dropping frames; None marks the end of the file."""
+        frame_index = 0
+        while self.bLoop:
+            # Frames skipped by the stride are only grabbed, not decoded into images
+            if frame_index % self.frame_stride:
+                success = self.videocapture.grab()
+                frame_index += 1
+                if not success:
+                    break
+                continue
+            success, im0 = self.videocapture.read()
+            frame_index += 1
+            if not success:
+                break
+            self.telemetry.count("captured")
+            if not self.put_offline(cv2.resize(im0, (self.new_width, self.new_height))):
+                break
+        self.put_offline(None)
+        self.videocapture.release()
+
+    def put_offline(self, item):
+        """Wait for room in the queue, giving up when processing stopped (so the reader never hangs)."""
+        while self.bLoop:
+            try:
+                self.image_queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+
     def counter_init(self):
         """Thread function to process images and display results."""
         if self.camera_name == "cam_mg":
@@ -263,9 +367,23 @@ class VehicleCounter:
             #     view_out_counts=False,
             # )
 
+    def open_track_cache(self):
+        """Start a new track file; ``{date}`` in track_cache_path is replaced by the current date."""
+        if self.track_cache is not None:
+            self.track_cache.close()
+        if self.track_cache_path:
+            self.track_cache = TrackCacheWriter(
+                self.track_cache_path.format(date=datetime.now().strftime("%Y%m%d")),
+                resume=not self.offline,  # A replayed file starts over; a live day continues after a restart
+                camera=self.camera_name, source=str(self.source), names=self.model.model.names,
+                frame_size=[self.new_width, self.new_height], fps=self.fps, reg_pts=self.line_points,
+                algorithm=self.track_algorithm(),
+            )
+
     def process_images(self):
         """Thread function to process images and display results."""
         self.counter_init()
+        self.open_track_cache()
 
         # Initialize variables for FPS calculation
         prev_frame_time = 0
@@ -276,77 +394,88 @@ class VehicleCounter:
         target_fps = 8.0
         target_dt = 1.0/target_fps
 
-        while self.bLoop:
-            if not self.image_queue.empty():
-                im0 = self.image_queue.get()
-                msg, update = self.process(im0)
-                frame_count += 1
-
-                # Calculate FPS
-                new_frame_time = time.time()
-                dt = new_frame_time - prev_frame_time
-                if dt < target_dt and dt > 0.000:
-                    time.sleep(target_dt - dt)
-                    new_frame_time = time.time()
-                    dt = new_frame_time - prev_frame_time
-                fps = 1 / dt
-                prev_frame_time = new_frame_time
-
-                # Convert FPS to string and display it on the frame
-                # fps_text = "FPS: " + "{:.3f}".format(fps)
-                fps_text = "OUT FPS: " + "{:02.1f}".format(fps)
-                cv2.putText(im0, fps_text, (10, 65), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), self.text_size_bg, cv2.LINE_AA)  # Black outline
-                cv2.putText(im0, fps_text, (10, 65), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), self.text_size_front, cv2.LINE_AA)
-                frame_text = "FRAME_COUNT: " + "{}".format(frame_count)
-                # cv2.putText(im0, fps_text, (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-                cv2.putText(im0, frame_text, (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), self.text_size_bg, cv2.LINE_AA)  # Black outline
-                cv2.putText(im0, frame_text, (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), self.text_size_front, cv2.LINE_AA)  # White text
-
-                y_axis = 135
-                for u in update:
-                    txt = u
-                    cv2.putText(im0, txt, (10, y_axis), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), self.text_size_bg, cv2.LINE_AA)  # Black outline
-                    cv2.putText(im0, txt, (10, y_axis), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), self.text_size_front, cv2.LINE_AA)  # White text
-                    y_axis += 35
-
-                # Write frame to video
-                resized_img = image_resize(im0, width=self.vdo_width)
-
-                current_time = datetime.now()
-                if self.last_check_time is None or current_time.date() != self.last_check_time.date():
-                    if check_time(4, 0):
-                        self.video_writer.release()
-                        self.init_video_writer()
-                        frame_count = 0
-                        self.counter_init()
-                        self.last_check_time = current_time
-                self.video_writer.write(resized_img)
-
-                # Display video frame if enabled
-                if self.view_img:
-                    cv2.imshow(self.camera_name, resized_img)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        self.bLoop=False
+        try:
+            while self.bLoop:
+                if self.offline or not self.image_queue.empty():
+                    im0 = self.image_queue.get()
+                    if im0 is None:
+                        print(f"[{self.camera_name}]: end of video, {frame_count} frames processed.")
                         break
-            else:
-                if time.time()-tWarn > 1.0:
-                    print(f"[{self.camera_name}]: image_queue is empty. waiting for 1 second...")
-                    tWarn = time.time()
-                    time.sleep(0.01)
+                    msg, update = self.process(im0)
+                    frame_count += 1
+                    self.telemetry.count("processed")
+                    self.publish_telemetry()
 
-        self.cleanup()
+                    # Calculate FPS
+                    new_frame_time = time.time()
+                    dt = new_frame_time - prev_frame_time
+                    if dt < target_dt and dt > 0.000 and not self.offline:
+                        time.sleep(target_dt - dt)
+                        new_frame_time = time.time()
+                        dt = new_frame_time - prev_frame_time
+                    fps = 1 / dt if dt > 0 else 0.0
+                    prev_frame_time = new_frame_time
+
+                    # Convert FPS to string and display it on the frame
+                    # fps_text = "FPS: " + "{:.3f}".format(fps)
+                    fps_text = "OUT FPS: " + "{:02.1f}".format(fps)
+                    cv2.putText(im0, fps_text, (10, 65), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), self.text_size_bg, cv2.LINE_AA)  # Black outline
+                    cv2.putText(im0, fps_text, (10, 65), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), self.text_size_front, cv2.LINE_AA)
+                    frame_text = "FRAME_COUNT: " + "{}".format(frame_count)
+                    # cv2.putText(im0, fps_text, (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
+                    cv2.putText(im0, frame_text, (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), self.text_size_bg, cv2.LINE_AA)  # Black outline
+                    cv2.putText(im0, frame_text, (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), self.text_size_front, cv2.LINE_AA)  # White text
+
+                    y_axis = 135
+                    for u in update:
+                        txt = u
+                        cv2.putText(im0, txt, (10, y_axis), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), self.text_size_bg, cv2.LINE_AA)  # Black outline
+                        cv2.putText(im0, txt, (10, y_axis), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), self.text_size_front, cv2.LINE_AA)  # White text
+                        y_axis += 35
+
+                    # Write frame to video
+                    resized_img = image_resize(im0, width=self.vdo_width)
+
+                    current_time = datetime.now()
+                    if not self.offline and (self.last_check_time is None or current_time.date() != self.last_check_time.date()):
+                        if check_time(4, 0):
+                            self.video_writer.release()
+                            self.init_video_writer()
+                            frame_count = 0
+                            self.counter_init()
+                            self.open_track_cache()
+                            self.last_check_time = current_time
+                    if self.video_writer is not None:
+                        self.video_writer.write(resized_img)
+
+                    # Display video frame if enabled
+                    if self.view_img:
+                        cv2.imshow(self.camera_name, resized_img)
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            self.bLoop=False
+                            break
+                else:
+                    if time.time()-tWarn > 1.0:
+                        print(f"[{self.camera_name}]: image_queue is empty. waiting for 1 second...")
+                        tWarn = time.time()
+                        time.sleep(0.01)
+        finally:
+            # Also on errors: stops the reader and releases the writers
+            self.cleanup()
 
     def process(self, im0):
         # Track objects
+        t_inference = time.perf_counter()
         tracks = self.model.track(im0, persist=True, show=False, classes=self.classes, verbose=False, conf=0.01)
+        self.telemetry.count("inference_s", time.perf_counter() - t_inference)
         # tracks = self.model.track(im0, persist=True, show=False, classes=self.classes, verbose=False)
+        if self.track_cache is not None:
+            # Recordings are timed by their frame position, live streams by the wall clock
+            ts = self.track_cache.frames / self.fps if self.offline else time.time()
+            self.track_cache.add(tracks, ts)
         msg = {}
         update = []
-        algorithms = "centroid"
-        if self.camera_name == "cam_b-out" or self.camera_name == "cam_mg":
-            algorithms = "buttom-right"
-        # elif self.camera_name == "cam_b-in":
-        #     algorithms = "buttom-center"
+        algorithms = self.track_algorithm()
 
         crop_arr = {}
         # Count and display counts
@@ -372,13 +501,11 @@ class VehicleCounter:
             msg = {'line_1': (counts1, self.counter.in_counts, self.counter.out_counts)}
             if self.counter.out_counts_update:
                 event='in'
-                self.post_event('b', 'in')
-                self.post_save('b', 'save_image',"http://localhost/images/zone_b.jpg")
+                self.post_event('b', 'in', image="http://localhost/images/zone_b.jpg")
                 self.save_crop(im0, crop_arr, 'b', event)
             if self.counter.in_counts_update:
                 event='out'
-                self.post_event('b', 'out')
-                self.post_save('b', 'save_image',"http://localhost/images/zone_b.jpg")
+                self.post_event('b', 'out', image="http://localhost/images/zone_b.jpg")
                 self.save_crop(im0, crop_arr, 'b', event)
             # if self.counter2.out_counts_update:
             #     event='in'
@@ -419,8 +546,7 @@ class VehicleCounter:
 
             if self.counter.in_counts_update:
                 event='in'
-                self.post_event('lab', 'in')
-                self.post_save('lab', 'save_image',"http://localhost/images/zone_lab.jpg")
+                self.post_event('lab', 'in', image="http://localhost/images/zone_lab.jpg")
                 self.save_crop(im0, crop_arr, 'lab', event)
                 # save_img = im0
                 # if len(crop_arr) > 0:
@@ -428,8 +554,7 @@ class VehicleCounter:
                 # cv2.imwrite("C:\Apache24\htdocs\images\zone_lab.jpg", save_img)
             if self.counter.out_counts_update:
                 event='out'
-                self.post_event('lab', 'out')
-                self.post_save('lab', 'save_image',"http://localhost/images/zone_lab.jpg")
+                self.post_event('lab', 'out', image="http://localhost/images/zone_lab.jpg")
                 self.save_crop(im0, crop_arr, 'lab', event)
                 # save_img = im0
                 # if len(crop_arr) > 0:
@@ -482,81 +607,105 @@ class VehicleCounter:
                 if "cam_b-out" in self.camera_name or "cam_mg" in self.camera_name or "center" in self.camera_name:
                     event='out'
                 # print(["counter.in_counts_update", event, self.camera_name])
-                self.post_event(cam, event)
-                self.post_save(cam, 'save_image',"http://localhost/images/zone_" + str(cam) + ".jpg")
+                self.post_event(cam, event, image="http://localhost/images/zone_" + str(cam) + ".jpg")
                 self.save_crop(im0, crop_arr, cam, event)
             if self.counter.out_counts_update:
                 event='out'
                 if "cam_b-out" in self.camera_name or "cam_mg" in self.camera_name or "center" in self.camera_name:
                     event='in'
                 # print(["counter.out_counts_update", event, self.camera_name])
-                self.post_event(cam, event)
-                self.post_save(cam, 'save_image',"http://localhost/images/zone_" + str(cam) + ".jpg")
+                self.post_event(cam, event, image="http://localhost/images/zone_" + str(cam) + ".jpg")
                 self.save_crop(im0, crop_arr, cam, event)
         return msg, update
 
-    def append_to_file(self, text):
-        """
-        Appends the given text to the specified file. If the file does not exist, it will be created.
-
-        :param file_path: The path to the file where the text will be appended.
-        :param text: The text to append to the file.
-        """
-        file_path = "D:\CarPark\history\history.txt"
-        if not os.path.exists(file_path):
-            try:
-                with open(file_path, 'w') as file:
-                    file.write("")
-                print(f"File created: {file_path}")
-            except Exception as e:
-                print(f"An error occurred while creating the file: {e}")
-
-        try:
-            # Read the existing content of the file
-            with open(file_path, 'r') as file:
-                existing_content = file.read()
-
-            # Write the new text followed by the existing content
-            with open(file_path, 'w') as file:
-                file.write(text + '\n' + existing_content)
-
-            # print(f"Text successfully prepended to {file_path}")
-        except Exception as e:
-            print(f"An error occurred: {e}")
-
     def save_crop(self, img, obj, zone, event):
+        if self.dry_run:
+            return
         save_img = img
         if zone in obj:
             save_img = obj[zone]
         # if len(obj) > 0:
         #     save_img = obj[-1]
-        cv2.imwrite("C:\Apache24\htdocs\images\zone_{}.jpg".format(zone), save_img)
-        cv2.imwrite("C:\Apache24\htdocs\images\zone_{}_{}.jpg".format(zone, event), save_img)
-        datetime_now = str(datetime.now().strftime("%Y%m%d_%H%M%S"))
+        ts = time.time()
+        datetime_now = str(datetime.fromtimestamp(ts).strftime("%Y%m%d_%H%M%S"))
         fname = "{}_zone_{}_{}".format(datetime_now, zone, event)
-        cv2.imwrite("D:\CarPark\history\{}.jpg".format(fname), save_img)
-        self.append_to_file(fname)
-
+        # Encoded once here, written to the web copies and the date-sharded store by the snapshot I/O pool
+        history_path = self.snapshot_store.save(self.snapshot_writer, save_img, zone, event, extra_paths=[
+            "C:\Apache24\htdocs\images\zone_{}.jpg".format(zone),
+            "C:\Apache24\htdocs\images\zone_{}_{}.jpg".format(zone, event),
+        ], ts=ts)
+        self.history.append(zone, event, self.camera_name, name=fname, image=history_path, ts=ts)
+
+
+    def publish_telemetry(self):
+        """Publish a compact pipeline record to SYS/{camera_name}, at most once per mqtt_publish_interval."""
+        if self.mqtt_client is None:
+            return
+        record = self.telemetry.record(self.image_queue.qsize(), self.counter.in_counts, self.counter.out_counts)
+        if record is not None:
+            self.mqtt_client.publish(f"SYS/{self.camera_name}", json.dumps(record), coalesce=True)
+
+    def publish_slots(self, events):
+        """Outbox delivery callback: schedule a slot update after count events reached the server."""
+        if self.mqtt_client is not None and any(e.get("event") in ("in", "out") for e in events):
+            self.slots_dirty.set()
+
+    def run_slot_publisher(self):
+        """Push the slot availability to the retained MQTT topic whenever publish_slots asked for it."""
+        while self.bLoop:
+            if not self.slots_dirty.wait(1.0):
+                continue
+            self.slots_dirty.clear()  # Deliveries during the request trigger one more update
+            try:
+                available_slots = self.parking_lot_client.get_available_slots()
+            except Exception as e:
+                print(f"Failed to get available slots: {e}")
+                continue
+            if available_slots:
+                self.mqtt_client.publish(SLOTS_TOPIC, json.dumps(available_slots), qos=1, retain=True, priority=True)
 
-    def post_save(self, zone, event, camera):
-        response = self.apiClient.post_event(zone, event, camera)
-        if not response:
-            print("Failed to process event.")
+    def print_available_slots(self):
+        try:
+            print(self.parking_lot_client.get_available_slots())
+        except Exception as e:
+            print(f"Failed to get available slots: {e}")
 
-    def post_event(self, zone, event):
+    def post_event(self, zone, event, image=None):
         timestamp_str = datetime.now().strftime("%H:%M:%S")
-        print(self.parking_lot_client.get_available_slots())
+        if self.dry_run:
+            print([timestamp_str, zone, event, self.camera_name, "dry run"])
+            return
+        self.print_available_slots()
         print([timestamp_str, zone, event, self.camera_name])
-        response = self.apiClient.post_event(zone, event, self.camera_name)
+        # Written to the local outbox first, so the event survives a server outage;
+        # the snapshot URL travels with the event instead of a separate save_image post
+        response = self.apiClient.enqueue_event(zone, event, self.camera_name, image=image)
         if not response:
             print("Failed to process event.")
-        print(self.parking_lot_client.get_available_slots())
+        if self.slot_client is not None and not self.slot_client.enqueue_event(zone, event, self.camera_name):
+            print("Failed to queue event for the slot service.")
+        self.print_available_slots()
+
+    def track_algorithm(self):
+        """Point of each box that is tested against the counting line."""
+        if self.camera_name == "cam_b-out" or self.camera_name == "cam_mg":
+            return "buttom-right"
+        # elif self.camera_name == "cam_b-in":
+        #     return "buttom-center"
+        return "centroid"
 
     def cleanup(self):
         """Release resources."""
         self.bLoop=False
-        self.video_writer.release()
-        self.videocapture.release()
+        if self.track_cache is not None:
+            self.track_cache.close()
+        for resource in (self.apiClient, self.slot_client, self.snapshot_writer, self.history, self.snapshot_store):
+            if resource is not None:
+                resource.close()
+        if self.video_writer is not None:
+            self.video_writer.release()
+        if not self.offline:
+            self.videocapture.release()  # The offline reader releases it itself when it stops
         cv2.destroyAllWindows()
 
     def run(self, stop_event):
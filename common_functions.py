@@ -81,6 +81,25 @@ def fill_area_with_mask(image, points):
     
     return image
 
+def build_keep_mask(shape, polygons):
+    """
+    Rasterize exclusion polygons once into a single mask of the area to keep.
+
+    :param shape: (height, width) of the frames the mask is applied to
+    :param polygons: list of polygons, each a list of (x, y) points, that are blacked out
+    :return: (mask, roi) where mask is uint8 (255 = keep, 0 = excluded) and roi is the
+             (x, y, w, h) bounding rectangle of the kept area
+    """
+    mask = np.full(shape[:2], 255, dtype=np.uint8)
+    for points in polygons:
+        if len(points) >= 3:
+            # One call per polygon: a single fillPoly call leaves overlapping parts unfilled
+            cv2.fillPoly(mask, [np.array(points, np.int32).reshape((-1, 1, 2))], 0)
+    roi = cv2.boundingRect(mask)
+    if roi[2] == 0 or roi[3] == 0:
+        roi = (0, 0, shape[1], shape[0])
+    return mask, roi
+
 def calculate_total_distance(points):
     # Initialize total distance
     total_distance = 0.0
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from cLEDWorker import ConnectionManager, LEDHostWorker
+from cModbusLED import ModbusLED
+
+# The older test_*.py scripts drive a live server or LED sign by hand; pytest runs only the unit tests.
+collect_ignore = ["test_api.py", "test_get_available_slots.py", "test_scoreboard.py"]
+
+
+class FakeModbusClient:
+    """ModbusClient stand-in holding the sign's registers in a dict and recording every block write.
+
+    Writes starting at an address in ``fail_at`` are rejected, and so are the next ``fail_writes``
+    writes; with ``connect_error`` set, connect() raises it.
+    """
+
+    def __init__(self):
+        self.client = SimpleNamespace(connected=False)
+        self.registers = {}
+        self.writes = []  # (start, values)
+        self.fail_at = set()
+        self.fail_writes = 0
+        self.connect_error = None
+
+    def connect(self):
+        if self.connect_error:
+            raise OSError(self.connect_error)
+        self.client.connected = True
+        return True
+
+    def close(self):
+        self.client.connected = False
+
+    def read_registers(self, start, count):
+        return [self.registers.get(a, 0) for a in range(start, start + count)]
+
+    def write_registers(self, start, block):
+        self.writes.append((start, list(block)))
+        if start in self.fail_at or self.fail_writes:
+            self.fail_writes = max(0, self.fail_writes - 1)
+            return False
+        self.registers.update(zip(range(start, start + len(block)), block))
+        return True
+
+
+@pytest.fixture
+def modbus_client():
+    return FakeModbusClient()
+
+
+@pytest.fixture
+def led(modbus_client):
+    return ModbusLED(modbus_client)
+
+
+@pytest.fixture
+def led_worker(modbus_client):
+    """LEDHostWorker driving the fake client instead of a Modbus TCP connection."""
+    worker = LEDHostWorker("127.0.0.1", idle_interval=0.05)
+    worker.client = modbus_client
+    worker.led = ModbusLED(modbus_client)
+    worker.connection = ConnectionManager(modbus_client)
+    yield worker
+    if worker.thread.is_alive():
+        worker.stop()
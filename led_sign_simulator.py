@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Local Modbus TCP server that emulates the parking LED signs.
+
+Each simulated sign serves the same holding registers as the real controller (value blocks
+60/70/80, font size 213/216/219, color 214/217/220, brightness 40), can add a fixed latency to
+every request and can fail a fraction of requests, so ParkingLotLEDApp and ModbusLED can be
+exercised without hardware.
+
+    python led_sign_simulator.py --signs 3 --base-port 15020 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from pymodbus.datastore import ModbusSequentialDataBlock, ModbusSlaveContext, ModbusServerContext
+from pymodbus.server import ModbusTcpServer
+
+from cModbusLED import registers_to_text
+
+_logger = logging.getLogger(__name__)
+
+
+class SignRegisterBlock(ModbusSequentialDataBlock):
+    """Holding registers of one sign, with request latency, failure injection and counters."""
+
+    def __init__(self, size=300, latency=0.0, failure_rate=0.0):
+        super().__init__(0, [0] * size)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.reads = 0
+        self.writes = 0
+        self.failures = 0
+        self.write_times = {}  # address -> time of the last write
+        self.write_event = threading.Condition()
+
+    def validate(self, address, count=1):
+        # An invalid request is answered with a Modbus exception, like a sign that rejects it
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.failures += 1
+            return False
+        return super().validate(address, count)
+
+    def getValues(self, address, count=1):
+        if self.latency:
+            time.sleep(self.latency)
+        self.reads += 1
+        return super().getValues(address, count)
+
+    def setValues(self, address, values):
+        if self.latency:
+            time.sleep(self.latency)
+        super().setValues(address, values)
+        count = len(values) if isinstance(values, list) else 1
+        now = time.perf_counter()
+        with self.write_event:
+            self.writes += 1
+            for offset in range(count):
+                self.write_times[address + offset] = now
+            self.write_event.notify_all()
+
+    def display(self, group_addr):
+        """Decode what the sign currently shows for each group, like ModbusLED.read."""
+        shown = {}
+        for group, addr in group_addr.items():
+            text = registers_to_text(super().getValues(addr[0], 2))
+            shown[group] = (text[1] + text[0] + text[3] + text[2]).replace('\x00', '')
+        return shown
+
+
+class LEDSignSimulator:
+    """One simulated sign: a pymodbus TCP server running on its own thread and event loop."""
+
+    def __init__(self, host="127.0.0.1", port=15020, latency=0.0, failure_rate=0.0):
+        self.host = host
+        self.port = port
+        self.registers = SignRegisterBlock(latency=latency, failure_rate=failure_rate)
+        slave = ModbusSlaveContext(hr=self.registers, zero_mode=True)
+        self.context = ModbusServerContext(slaves=slave, single=True)
+        self.server = None
+        self.loop = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"sign-{port}", daemon=True)
+
+    @property
+    def address(self):
+        """Host entry for ParkingLotLEDApp, e.g. "127.0.0.1:15020"."""
+        return f"{self.host}:{self.port}"
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = ModbusTcpServer(self.context, address=(self.host, self.port))
+        await self.server.listen()
+        self.ready.set()
+        await self.server.serving
+
+    def start(self, timeout=5.0):
+        self.thread.start()
+        if not self.ready.wait(timeout):
+            raise RuntimeError(f"Simulated sign on port {self.port} did not start")
+        return self
+
+    def stop(self):
+        if self.loop is not None and self.server is not None:
+            asyncio.run_coroutine_threadsafe(self.server.shutdown(), self.loop).result(timeout=5.0)
+        self.thread.join(timeout=5.0)
+
+
+def start_signs(count, base_port=15020, latency=0.0, failure_rate=0.0):
+    """Start ``count`` simulated signs on consecutive ports."""
+    return [LEDSignSimulator(port=base_port + i, latency=latency, failure_rate=failure_rate).start()
+            for i in range(count)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run simulated LED signs.")
+    parser.add_argument('--signs', type=int, default=3, help="Number of signs to simulate")
+    parser.add_argument('--base-port', type=int, default=15020, help="Port of the first sign")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of requests that fail")
+    args = parser.parse_args()
+
+    signs = start_signs(args.signs, args.base_port, args.latency, args.failure_rate)
+    print("Simulated signs:", ", ".join(sign.address for sign in signs))
+    group_addr = {'A': (60, '', 3, 213, 214), 'B': (70, '', 3, 216, 217), 'Lab': (80, '', 3, 219, 220)}
+    try:
+        while True:
+            time.sleep(5.0)
+            for sign in signs:
+                print(sign.address, sign.registers.display(group_addr),
+                      f"reads={sign.registers.reads} writes={sign.registers.writes}")
+    except KeyboardInterrupt:
+        print("\nExiting loop.")
+    for sign in signs:
+        sign.stop()
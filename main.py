@@ -10,7 +10,10 @@ MQTT_PASS = os.getenv('MQTT_PASS')
 
 print([MQTT_HOST, MQTT_PORT, MQTT_USER, MQTT_PASS])
 
+import argparse
 import time
+import json
+from cBatchRunner import BatchRunner
 from cMQTTClient import *
 from cVehicleCounter import *
 from cManagementCounter import *
@@ -36,49 +39,93 @@ def ensure_path_exists(path):
     except OSError as e:
         print(f"Error creating path: {e}")
 
-mqtt_client = None
-
-# # Example usage
-# mqtt_client = MQTTClient(broker_address=MQTT_HOST, port=MQTT_PORT, username=MQTT_USER, password=MQTT_PASS)
-# mqtt_client.connect()
-# time.sleep(1.0)
-
-# while not mqtt_client.connected:
-#     mqtt_client.reconnect()
-
-view_img=True
-# processList = ["D:\\CarPark\\MG", "D:\\CarPark\\LAB-OUT", "D:\\CarPark\\ZONE A", "D:\\CarPark\\ZONE B-IN", "D:\\CarPark\\ZONE B-OUT"]
-# processList = ["D:\\CarPark\\LAB-OUT", "D:\\CarPark\\ZONE A", "D:\\CarPark\\ZONE B-IN", "D:\\CarPark\\ZONE B-OUT"]
-processList = ["D:\\CarPark\\MG"]
-
-for folder in processList:
-    vdoList = get_video_files(directory=folder)
-    camName = "cam_" + folder.split('\\')[2].replace('ZONE ', "").lower()
-    resultFolder = folder.split('\\')[:-1]
-    resultFolder[0] += '\\'
-    resultFolder.append(camName)
-    resultFolder = os.path.join(*resultFolder)
-    ensure_path_exists(resultFolder)
-
-    for fName in vdoList:
-        # print(fName)
-        # if "Camera2_VR-20241025-111430" in fName:
-            if "mg" in camName:
-                save_dir = Path(f"D:\\CarPark\\{camName}")
-                save_dir.mkdir(parents=True, exist_ok=True)
-
-                # Path to your video file and output file
-                input_video_path = fName  # change this to your input video path
-                output_video_path = str(save_dir / f"{Path(fName).stem}.mp4")
-                debug_video_path = str(save_dir / f"debug_{Path(fName).stem}.mp4")
-
-                print([input_video_path, output_video_path])
-
-                # Create an instance of YOLOCarCounter and process the video
-                car_counter = cManagementCounter(input_video_path, output_video_path, debug_video_path, model_path="yolov10x.pt", view_img=view_img)
-                car_counter.process_video()
-                car_counter.release_resources()
-            else:
-                counter = VehicleCounter(camera_name=camName, source=fName, view_img=view_img, save_img=True)
-                counter.run(mqtt_client)
-
+# Jobs run by the batch runner in worker processes; they must stay importable module-level functions
+def count_mg_video(input_video_path, output_video_path, debug_video_path=None, view_img=False, batch_size=8):
+    # Create an instance of YOLOCarCounter and process the video
+    car_counter = cManagementCounter(input_video_path, output_video_path, debug_video_path, model_path="yolov10x.pt", view_img=view_img)
+    car_counter.process_video(batch_size=batch_size)
+    car_counter.release_resources()
+
+def count_video(input_video_path, output_path, camera_name, view_img=False, frame_stride=1, save_tracks=False):
+    """Replay one recording through VehicleCounter and save its final counts as JSON.
+
+    With save_tracks the tracks are also kept in {stem}_tracks_partNNN.npz next to the counts, for
+    trying other counting lines with recount_tracks.py.
+    """
+    track_cache_path = output_path.replace("_counts.json", "_tracks.npz") if save_tracks else None
+    # Offline runs are dry runs: nothing goes to the live outbox, slot service, history or snapshot folders
+    counter = VehicleCounter(camera_name=camera_name, source=input_video_path, view_img=view_img, save_img=False,
+                             offline=True, frame_stride=frame_stride, track_cache_path=track_cache_path)
+    counter.run(None)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"camera": camera_name, "source": input_video_path,
+                   "in_counts": counter.counter.in_counts, "out_counts": counter.counter.out_counts}, f)
+
+if __name__ == "__main__":
+    mqtt_client = None
+
+    # # Example usage
+    # mqtt_client = MQTTClient(broker_address=MQTT_HOST, port=MQTT_PORT, username=MQTT_USER, password=MQTT_PASS)
+    # mqtt_client.connect()
+    # time.sleep(1.0)
+
+    # while not mqtt_client.connected:
+    #     mqtt_client.reconnect()
+
+    parser = argparse.ArgumentParser(description="Count vehicles in recorded videos.")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: sized from CPU, RAM and GPU memory)")
+    parser.add_argument('--view-img', action='store_true', help="Show every video while processing (use with --workers 1)")
+    args = parser.parse_args()
+
+    view_img=args.view_img
+    # Recordings are replayed without drops or FPS throttling; a stride of 3 on 25 FPS footage
+    # roughly matches the ~8 FPS the live pipeline processes
+    frame_stride=1
+    # Frames per detector call for MG recordings (tracking cameras always run one frame at a time)
+    batch_size=8
+    # Keep the per-frame tracks so a camera's line can be re-tuned with recount_tracks.py
+    save_tracks=True
+    # Files are processed in parallel; None uses one process per core, limited by memory_per_worker_gb
+    # (with psutil installed) and by gpu_memory_per_worker_gb per free GPU memory, since every
+    # worker loads its own model. Files finished by an earlier run are skipped.
+    workers=args.workers
+    memory_per_worker_gb=4
+    gpu_memory_per_worker_gb=3
+    # processList = ["D:\\CarPark\\MG", "D:\\CarPark\\LAB-OUT", "D:\\CarPark\\ZONE A", "D:\\CarPark\\ZONE B-IN", "D:\\CarPark\\ZONE B-OUT"]
+    # processList = ["D:\\CarPark\\LAB-OUT", "D:\\CarPark\\ZONE A", "D:\\CarPark\\ZONE B-IN", "D:\\CarPark\\ZONE B-OUT"]
+    processList = ["D:\\CarPark\\MG"]
+
+    mg_tasks = []
+    count_tasks = []
+    for folder in processList:
+        vdoList = get_video_files(directory=folder)
+        camName = "cam_" + folder.split('\\')[2].replace('ZONE ', "").lower()
+        resultFolder = folder.split('\\')[:-1]
+        resultFolder[0] += '\\'
+        resultFolder.append(camName)
+        resultFolder = os.path.join(*resultFolder)
+        ensure_path_exists(resultFolder)
+
+        for fName in vdoList:
+            # print(fName)
+            # if "Camera2_VR-20241025-111430" in fName:
+                if "mg" in camName:
+                    save_dir = Path(f"D:\\CarPark\\{camName}")
+                    save_dir.mkdir(parents=True, exist_ok=True)
+
+                    # Path to your video file and output file
+                    input_video_path = fName  # change this to your input video path
+                    output_video_path = str(save_dir / f"{Path(fName).stem}.mp4")
+                    debug_video_path = str(save_dir / f"debug_{Path(fName).stem}.mp4")
+
+                    mg_tasks.append((input_video_path, output_video_path, {"debug_video_path": debug_video_path, "view_img": view_img,
+                                                                          "batch_size": batch_size}))
+                else:
+                    output_path = os.path.join(resultFolder, f"{Path(fName).stem}_counts.json")
+                    count_tasks.append((fName, output_path, {"camera_name": camName, "view_img": view_img, "frame_stride": frame_stride,
+                                                         "save_tracks": save_tracks}))
+
+    if mg_tasks:
+        BatchRunner(count_mg_video, workers, memory_per_worker_gb, gpu_memory_per_worker_gb).run(mg_tasks, report_path="D:\\CarPark\\batch_summary_mg.json")
+    if count_tasks:
+        BatchRunner(count_video, workers, memory_per_worker_gb, gpu_memory_per_worker_gb).run(count_tasks, report_path="D:\\CarPark\\batch_summary.json")
@@ -19,6 +19,8 @@ def run_camera_processes():
     processes = []
     for camera in cameras:
         addon = ' --view-img'
+        if camera == cameras[0]:
+            addon += ' --export-history'  # One process keeps the legacy history.txt up to date
         # if 'lab-out' in camera:
         #     addon = ''
         command = f"python .\main_rtsp.py --camera {camera}{addon}"
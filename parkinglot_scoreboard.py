@@ -2,12 +2,15 @@ import logging
 import time
 from datetime import datetime
 from cParkingLotClient import ParkingLotClient
-from cModbusLED import ModbusClient, ModbusLED
-from cDeviceStatusUpdater import DeviceStatusUpdater
+from cLEDWorker import LEDHostWorker
+from cDeviceStatusUpdater import DeviceStatusUpdater, DeviceStatusReporter
 import os
 import inspect
 import requests
 import threading
+import json
+from dotenv import load_dotenv
+from cMQTTClient import MQTTClient, SLOTS_TOPIC
 # Setup logging
 log_directory = "C:/car_parking_logs"
 os.makedirs(log_directory, exist_ok=True)  # Ensure the log directory exists
@@ -55,15 +58,36 @@ def log_with_context(message, level=logging.INFO):
 class ParkingLotLEDApp:
     """Main application class to run Parking Lot client operations and display on LED."""
     server_url = "http://localhost:5000"  # Replace with actual server URL
-    updater = DeviceStatusUpdater(server_url)
 
-    def __init__(self, base_url, modbus_hosts=None, modbus_port=502):
+    def __init__(self, base_url, modbus_hosts=None, modbus_port=502, full_refresh_interval=60.0, modbus_timeouts=None, status_heartbeat=60.0,
+                 mqtt_client=None, poll_interval=1.5, fallback_poll_interval=30.0, tick=1.0):
         if modbus_hosts is None:
             modbus_hosts = ["192.168.1.61", "192.168.1.71", "192.168.1.72"]  # Default IPs
         self.modbus_hosts = modbus_hosts
         self.modbus_port = modbus_port
+        self.modbus_timeouts = modbus_timeouts or {}  # Per-host Modbus timeout in seconds, default 2
+        # Displays only get registers that changed; everything is rewritten periodically
+        # in case a sign power-cycled and lost its contents
+        self.full_refresh_interval = full_refresh_interval
+        self.last_full_refresh = 0.0
         self.parking_lot_client = ParkingLotClient(base_url)
+        # Device statuses are sent only when they change, plus a heartbeat, in one batch request
+        self.status_reporter = DeviceStatusReporter(DeviceStatusUpdater(self.server_url), heartbeat_interval=status_heartbeat)
         log_with_context(f"Initialized ParkingLotLEDApp with base URL: {base_url}")
+
+        # Slot updates are pushed over MQTT; polling the server remains as a slow fallback
+        # (or the only source, at poll_interval, when no broker is connected)
+        self.poll_interval = poll_interval
+        self.fallback_poll_interval = fallback_poll_interval
+        # Longest wait per loop, so brightness changes and full refreshes stay on time
+        self.tick = tick
+        self.last_slots_time = 0.0
+        self.pushed_slots = None
+        self.slots_lock = threading.Lock()
+        self.slots_event = threading.Event()
+        self.mqtt_client = mqtt_client
+        if self.mqtt_client is not None:
+            self.mqtt_client.subscribe(SLOTS_TOPIC, self.on_slots_message)
         self.init_modbus()
         
         # Initialize the thread for monitoring led status
@@ -73,106 +97,83 @@ class ParkingLotLEDApp:
         
       
     def init_modbus(self):
-        self.modbus_clients = []
-        self.led_displays = []
+        self.led_workers = []
         
-        # Initialize Modbus clients and LED displays for each host
+        # Each LED host gets its own connection and worker thread, so updates to the signs run
+        # in parallel and a slow or dead sign does not hold up the others
         for host in self.modbus_hosts:
             try:
-                modbus_client = self.create_modbus_client(host)
-
-                self.modbus_clients.append(modbus_client)
-                self.led_displays.append(ModbusLED(modbus_client))
+                # A host may carry its own port, e.g. "127.0.0.1:15020" for a simulated sign
+                address, _, port = host.partition(":")
+                worker = LEDHostWorker(address, port=int(port or self.modbus_port), timeout=self.modbus_timeouts.get(host, 2))
+                self.led_workers.append(worker.start())
             except Exception as e:
-                log_with_context(f"Error connecting to Modbus client at {host}: {e}", logging.ERROR)
+                log_with_context(f"Error creating Modbus worker for {host}: {e}", logging.ERROR)
                 continue
             
-    def create_modbus_client(self, host):
-        client = ModbusClient(host=host, port=self.modbus_port)
-        if not client.connect():
-            log_with_context(f"Failed to connect to {host}, retrying in 5 seconds...", logging.WARNING)
-            time.sleep(5)
-            if not client.connect():
-                log_with_context(f"Still unable to connect to {host}, will skip this client.", logging.ERROR)
-        return client
-
-    def reconnect_modbus_client(self, host, max_attempts=5, base_delay=2):
-        """Reconnect Modbus client with proper cleanup and retries."""
-        log_with_context(f"Reconnecting to {host}...", logging.WARNING)
-
-        # Ensure we properly close and remove the old connection
-        if host in self.modbus_clients:
-            try:
-                self.modbus_clients[host].close()
-                log_with_context(f"Closed previous connection to {host}.", logging.INFO)
-            except Exception as e:
-                log_with_context(f"Error closing old connection to {host}: {e}", logging.WARNING)
-
-            del self.modbus_clients[host]
-            self.led_displays.pop(host, None)  # Avoid KeyError if not present
-
-        # Attempt to reconnect with exponential backoff
-        for attempt in range(1, max_attempts + 1):
-            new_client = self.connect_modbus_client(host)
-
-            if new_client:
-                log_with_context(f"Reconnected to {host} successfully on attempt {attempt}.", logging.INFO)
-                self.modbus_clients[host] = new_client  # Store the new client
-                return new_client
-
-            delay = base_delay * (2 ** (attempt - 1))  # Exponential backoff
-            log_with_context(f"Reconnect attempt {attempt}/{max_attempts} failed for {host}. Retrying in {delay} seconds...", logging.WARNING)
-            time.sleep(delay)
-
-        log_with_context(f"Failed to reconnect to {host} after {max_attempts} attempts.", logging.ERROR)
-        return None
-    
+    def on_slots_message(self, topic, payload):
+        """MQTT callback with the latest available slots published by the camera processes."""
+        try:
+            slots = json.loads(payload)
+        except ValueError as e:
+            log_with_context(f"Invalid slots message on {topic}: {e}", logging.WARNING)
+            return
+        with self.slots_lock:
+            self.pushed_slots = slots
+        self.slots_event.set()
+
+    def next_available_slots(self):
+        """
+        Wait up to one tick for pushed slots, polling the server when nothing arrived for the poll interval.
+        :return: dict of available slots, or None when there is nothing new in this tick
+        """
+        interval = self.poll_interval
+        if self.mqtt_client is not None and self.mqtt_client.connected:
+            interval = self.fallback_poll_interval
+        remaining = interval - (time.time() - self.last_slots_time)
+        if self.slots_event.wait(max(0.0, min(self.tick, remaining))):
+            self.slots_event.clear()
+            self.last_slots_time = time.time()
+            with self.slots_lock:
+                return self.pushed_slots
+        if time.time() - self.last_slots_time < interval:
+            return None
+        self.last_slots_time = time.time()
+        available_slots = self.parking_lot_client.get_available_slots()
+        if not available_slots:
+            log_with_context("Failed to get available slots.", logging.WARNING)
+        return available_slots
 
     def update_device_status(self,host,status):
-        """Check the connection status of all Modbus devices and update the server."""
+        """Report the connection status of a Modbus device; the reporter sends only changes."""
         device_map = {
             "192.168.1.61": "led1",
             "192.168.1.71": "led2",
             "192.168.1.72": "led3"
         }
-        device = device_map.get(host, None)
-        try:
-            # Send current status to server
-            response = self.updater.send_status(device, status)
-            if "error" in response:
-                log_with_context(f"Failed to update status for {device} ({host}): {response['error']}", logging.ERROR)
-        except Exception as e:
-            log_with_context(f"Error updating device status for {device}: {e}", logging.ERROR)                       
-
-
-
+        device = device_map.get(host, host)
+        self.status_reporter.report(device, status)
+
+    def report_worker_status(self):
+        """Report every LED worker's connection state, once it has tried to connect."""
+        for worker in self.led_workers:
+            # Before the first attempt the worker is neither online nor offline yet
+            if worker.connection.state == "disconnected":
+                continue
+            self.update_device_status(worker.host, "online" if worker.connected else "offline")
 
     def update_brightness(self):
         global last_checked_time
         current_time = datetime.now().strftime('%H:%M')
 
         if current_time in brightness_schedule and last_checked_time != current_time:
-            for led in self.led_displays:
-                led_ip = led.client.host
+            for worker in self.led_workers:
+                led_ip = worker.host
                 brightness = brightness_schedule[current_time].get(led_ip, brightness_schedule[current_time].get("default", 0))
 
-                try:
-                    if not led.is_connected:  # Check connection
-                        log_with_context(f"Reconnecting to {led_ip}", logging.WARNING)
-                        new_client = self.create_modbus_client(led_ip)
-                        if new_client:
-                            led.client = new_client
-                            log_with_context(f"Reconnected to {led_ip}")
-                        else:
-                            log_with_context(f"Failed to reconnect to {led_ip}. Skipping brightness update.", logging.ERROR)
-                            continue
-
-                    led.set_brightness(brightness)
-                    time.sleep(0.2)
-                    log_with_context(f"Set brightness {brightness} for LED at {led_ip}")
-
-                except Exception as e:
-                    log_with_context(f"Error updating brightness for {led_ip}: {e}", logging.ERROR)
+                # Applied by the sign's worker as soon as it is connected
+                worker.set_brightness(brightness)
+                log_with_context(f"Queued brightness {brightness} for LED at {led_ip}")
 
             last_checked_time = current_time
 
@@ -186,54 +187,34 @@ class ParkingLotLEDApp:
         try:
             while True:
                 try:
-                    time.sleep(0.5)
                     self.update_brightness()
 
-                    available_slots = self.parking_lot_client.get_available_slots()
+                    if time.time() - self.last_full_refresh >= self.full_refresh_interval:
+                        for worker in self.led_workers:
+                            worker.refresh()
+                        self.last_full_refresh = time.time()
+
+                    available_slots = self.next_available_slots()
+                    self.report_worker_status()
                     if available_slots:
                         log_with_context(f"Available Slots: {available_slots}")
 
+                        display = {}
                         for gate, slots in available_slots.items():
                             if 'mg' in gate:
                                 continue
                             gate = gate.replace("current_", "")
                             if slots <= 5:
                                 slots = 'Full'
+                            display[gate.capitalize()] = slots
 
-                            # Write to each LED display
-                            for i, led in enumerate(self.led_displays):
-                                try:
-                                    led_ip = led.client.host
-                                    if led.is_connected():
-                                        self.update_device_status(led_ip,"online")
-                                        led.write(gate.capitalize(), slots)
-                                        time.sleep(0.2)
-                                    else :
-                                        self.update_device_status(led_ip,"offline")
-                                        log_with_context(f"Reconnecting to {led_ip}", logging.WARNING)
-                                        new_client = self.create_modbus_client(led_ip)
-                                        if new_client:
-                                            led.client = new_client
-                                            log_with_context(f"Reconnected to {led_ip}")
-                                    # else:
-                                    #     log_with_context(f"LED at {self.modbus_hosts[i]} disconnected, reconnecting...", logging.WARNING)
-                                    #     new_client = self.reconnect_modbus_client(self.modbus_hosts[i])
-                                    #     if new_client:
-                                    #         self.modbus_clients[i] = new_client
-                                    #         led.client = new_client
-                                    #         led.write(gate.capitalize(), slots)
-                                    #     else:
-                                    #         log_with_context(f"Failed to reconnect LED at {self.modbus_hosts[i]}", logging.ERROR)
-
-                                except Exception as e:
-                                    log_with_context(f"Error writing to LED display: {e}", logging.ERROR)
-
-                    else:
-                        log_with_context("Failed to get available slots.", logging.WARNING)
+                        # Hand the values to every LED worker; writes happen on the workers' threads
+                        for worker in self.led_workers:
+                            worker.update(display)
 
                     retry_count = 0
 
-                except requests.exceptions.ConnectionError as e:
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
                     retry_count += 1
                     log_with_context(f"Connection error: {e}. Retrying in {retry_delay} seconds (Attempt {retry_count}/{max_retries})", logging.ERROR)
                     if retry_count >= max_retries:
@@ -245,25 +226,33 @@ class ParkingLotLEDApp:
                     log_with_context(f"Unexpected error: {e}", logging.ERROR)
                     break
 
-                time.sleep(1.0)
-
         except KeyboardInterrupt:
             log_with_context("\nExiting loop.")
 
 
     def close(self):
-        for client in self.modbus_clients:
+        self.status_reporter.stop()
+        for worker in self.led_workers:
             try:
-                client.close()
-                log_with_context(f"Closed Modbus client: {client.host}")
+                worker.stop()
+                log_with_context(f"Closed Modbus client: {worker.host}")
             except Exception as e:
                 log_with_context(f"Error closing Modbus client: {e}", logging.ERROR)
 
 
 
 if __name__ == "__main__":
-    base_url = "http://127.0.0.1:5000"  # Replace with your actual server URL
-    app = ParkingLotLEDApp(base_url)
+    load_dotenv()
+    # Read the counts from the local slot service when one runs, otherwise from the server
+    base_url = os.getenv('SLOT_SERVICE_URL', "http://127.0.0.1:5000")
+
+    mqtt_client = None
+    if os.getenv('MQTT_HOST'):
+        mqtt_client = MQTTClient(broker_address=os.getenv('MQTT_HOST'), port=os.getenv('MQTT_PORT', 1883),
+                                 username=os.getenv('MQTT_USER'), password=os.getenv('MQTT_PASS'))
+        mqtt_client.connect()
+
+    app = ParkingLotLEDApp(base_url, mqtt_client=mqtt_client)
     log_with_context("Starting ParkingLotLEDApp")
     app.run()
     app.close()
@@ -0,0 +1,76 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from cObjectCounter import cObjectCounter
+from cObjectCounterMG import cObjectCounterMG
+from cTrackCache import TrackCache
+
+
+def parse_points(text):
+    """Parse "x1,y1,x2,y2[,x3,y3,...]" into [(x1, y1), (x2, y2), ...]."""
+    values = [int(float(v)) for v in text.split(",")]
+    if len(values) < 4 or len(values) % 2:
+        raise argparse.ArgumentTypeError(f"expected x1,y1,x2,y2[,...], got {text!r}")
+    return list(zip(values[0::2], values[1::2]))
+
+
+def recount(cache, reg_pts=None, algorithm=None):
+    """
+    Replay the cached tracks through the camera's counter.
+    :param cache: TrackCache
+    :param reg_pts: counting line (2 points) or region; default: the one used when recording
+    :param algorithm: track point ("centroid", "buttom-right", ...); default: the recorded one
+    :return: dict with in/out counts, counts per class and the crossing events
+    """
+    reg_pts = reg_pts or [tuple(p) for p in cache.meta["reg_pts"]]
+    algorithm = algorithm or cache.meta.get("algorithm", "centroid")
+    counter_class = cObjectCounterMG if cache.meta.get("camera") == "cam_mg" else cObjectCounter
+    counter = counter_class(names=cache.names, view_img=False, reg_pts=reg_pts, draw_tracks=False,
+                            view_in_counts=False, view_out_counts=False)
+
+    # The counters draw on the frame; the pixels themselves are not used for counting
+    width, height = cache.meta["frame_size"]
+    blank = np.zeros((height, width, 3), dtype=np.uint8)
+    events = []
+    for frame, ts, tracks in cache.results():
+        counter.start_counting(blank, tracks, algorithm)
+        if counter.in_counts_update:
+            events.append({"frame": frame, "ts": ts, "direction": "IN"})
+        if counter.out_counts_update:
+            events.append({"frame": frame, "ts": ts, "direction": "OUT"})
+    return {"reg_pts": reg_pts, "algorithm": algorithm, "in_counts": counter.in_counts, "out_counts": counter.out_counts,
+            "class_wise_count": counter.class_wise_count, "events": events}
+
+
+if __name__ == "__main__":
+    # Try other counting lines on a recording without running the model again:
+    #   python recount_tracks.py D:\CarPark\cam_a\video_tracks.npz --line 600,100,700,500 --line 620,100,720,500
+    parser = argparse.ArgumentParser(description="Re-count vehicles from a track file written by VehicleCounter.")
+    parser.add_argument('cache', help="Track cache (.npz) as passed to VehicleCounter; its _partNNN segments are read")
+    parser.add_argument('--line', type=parse_points, action='append',
+                        help="Counting line x1,y1,x2,y2 in frame pixels (repeatable; default: the recorded line)")
+    parser.add_argument('--algorithm', choices=["centroid", "buttom-right", "buttom-center", "center-right"],
+                        help="Track point tested against the line (default: the recorded one)")
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    start = time.time()
+    cache = TrackCache(args.cache)
+    print(f"{args.cache}: {cache.meta.get('camera')}, {cache.segments} segments, {len(cache)} frames, {len(cache.frame)} boxes, "
+          f"frame size {cache.meta['frame_size']}")
+
+    results = []
+    for reg_pts in args.line or [None]:
+        t_line = time.time()
+        result = recount(cache, reg_pts, args.algorithm)
+        results.append(result)
+        print(f"{result['reg_pts']} ({result['algorithm']}): IN {result['in_counts']} OUT {result['out_counts']} "
+              f"{result['class_wise_count']} in {time.time() - t_line:.1f} s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"cache": args.cache, "results": results}, f, indent=2)
+    print(f"Done in {time.time() - start:.1f} s")
@@ -1,13 +1,52 @@
 import cv2
 import os
-
-def reduce_frame_rate_and_resize(input_video_path, output_video_path, target_fps=10, target_width=640):
+import shutil
+import subprocess
+import time
+import argparse
+from cBatchRunner import BatchRunner
+
+def open_h264_writer(output_video_path, fps, size):
+    """H.264 (avc1) when the OpenCV build can encode it, otherwise MPEG-4 (mp4v)."""
+    for codec in ("avc1", "mp4v"):
+        out = cv2.VideoWriter(output_video_path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        if out.isOpened():
+            return out, codec
+        out.release()
+    return None, None
+
+def reduce_with_ffmpeg(input_video_path, output_video_path, target_fps, target_width, duration=0.0, progress_interval=10.0):
+    """Resample and scale with ffmpeg's fps/scale filters and encode H.264; frames never pass through Python."""
+    cmd = ["ffmpeg", "-y", "-nostdin", "-loglevel", "error", "-progress", "pipe:1", "-i", input_video_path,
+           "-vf", f"fps={target_fps},scale={target_width}:-2", "-c:v", "libx264", "-preset", "veryfast", "-crf", "28",
+           "-pix_fmt", "yuv420p", "-an", output_video_path]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    last_report = time.time()
+    for line in proc.stdout:
+        # -progress writes key=value lines; out_time_us is the position in the output
+        if line.startswith("out_time_us=") and time.time() - last_report >= progress_interval:
+            last_report = time.time()
+            position = int(line.split("=", 1)[1]) / 1e6 if line.strip()[-1].isdigit() else 0.0
+            percent = f" ({100.0 * position / duration:.0f}%)" if duration else ""
+            print(f"Processing {os.path.basename(input_video_path)}: {position:.0f} s{percent}")
+    if proc.wait() != 0:
+        print(f"Error: ffmpeg failed for {input_video_path} (exit code {proc.returncode})")
+        return False
+    return True
+
+def reduce_frame_rate_and_resize(input_video_path, output_video_path, target_fps=10, target_width=640, use_ffmpeg=None, progress_interval=10.0):
+    """
+    Resample a video to target_fps by timestamp and scale it to target_width, encoded as H.264.
+    :param use_ffmpeg: bool, transcode with the ffmpeg binary (default: when it is on PATH)
+    :param progress_interval: float, seconds between progress lines
+    :return: bool, False when the video could not be processed
+    """
     # Open the input video file
     cap = cv2.VideoCapture(input_video_path)
 
     if not cap.isOpened():
         print(f"Error: Could not open video file {input_video_path}")
-        return
+        return False
 
     # Get the original video's properties
     original_fps = cap.get(cv2.CAP_PROP_FPS)
@@ -21,55 +60,108 @@ def reduce_frame_rate_and_resize(input_video_path, output_video_path, target_fps
     if original_width == 0 or original_height == 0:
         print("Error: Could not retrieve video dimensions.")
         cap.release()
-        return
+        return False
 
-    # Calculate the new height while maintaining the aspect ratio
-    target_height = int(original_height * (target_width / original_width))
+    # Never raise the frame rate: a target above the source keeps every frame
+    if original_fps <= 0:
+        original_fps = 30.0
+    output_fps = min(float(target_fps), original_fps)
 
-    # Define the codec and create a VideoWriter object
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video_path, fourcc, target_fps, (target_width, target_height))
+    if use_ffmpeg is None:
+        use_ffmpeg = shutil.which("ffmpeg") is not None
+    if use_ffmpeg:
+        cap.release()
+        ok = reduce_with_ffmpeg(input_video_path, output_video_path, output_fps, target_width,
+                                total_frames / original_fps, progress_interval)
+        if ok:
+            print(f"Processing complete for {input_video_path}.")
+        return ok
+
+    # Calculate the new height while maintaining the aspect ratio (even, as H.264 requires)
+    target_height = int(original_height * (target_width / original_width)) // 2 * 2
+
+    out, codec = open_h264_writer(output_video_path, output_fps, (target_width, target_height))
+    if out is None:
+        print(f"Error: Could not open a video writer for {output_video_path}")
+        cap.release()
+        return False
 
+    # Keep the first frame at or after each output time step. Frames in between are only
+    # grabbed, which skips their conversion to an image.
     frame_count = 0
-    processed_frames = 0
-    skip_frames = int(original_fps / target_fps) - 1
-
-    while cap.isOpened():
-        ret, frame = cap.read()
+    written = 0
+    frame_interval = 1.0 / output_fps
+    next_time = 0.0
+    last_report = time.time()
+    while True:
+        if not cap.grab():
+            break
+        timestamp = frame_count / original_fps
+        frame_count += 1
+        if timestamp + 1e-6 < next_time:
+            continue
+        ret, frame = cap.retrieve()
         if not ret:
             break
+        while next_time <= timestamp + 1e-6:
+            next_time += frame_interval
 
-        if frame_count % (skip_frames + 1) == 0:
-            # Resize the frame
-            resized_frame = cv2.resize(frame, (target_width, target_height))
+        # Resize the frame and write it to the output video
+        out.write(cv2.resize(frame, (target_width, target_height), interpolation=cv2.INTER_AREA))
+        written += 1
 
-            # Write the frame to the output video
-            out.write(resized_frame)
-
-            # processed_frames += 1
-            print(f"Processing: {frame_count}/{total_frames}")
-
-        frame_count += 1
+        if time.time() - last_report >= progress_interval:
+            last_report = time.time()
+            print(f"Processing {os.path.basename(input_video_path)}: {frame_count}/{total_frames}")
 
     # Release everything when the job is finished
     cap.release()
     out.release()
-    cv2.destroyAllWindows()
-    print(f"Processing complete for {input_video_path}.")
-
-def process_all_videos_in_folder(input_folder, output_folder, target_fps=10, target_width=640):
-    # Ensure the output folder exists
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-
-    # Iterate over all files in the input folder
-    for filename in os.listdir(input_folder):
-        if filename.endswith(".MP4") or filename.endswith(".mp4") or filename.endswith(".avi") or filename.endswith(".mov"):
-            input_video_path = os.path.join(input_folder, filename)
-            output_video_path = os.path.join(output_folder, f"reduce_{filename}")
-            reduce_frame_rate_and_resize(input_video_path, output_video_path, target_fps, target_width)
+    print(f"Processing complete for {input_video_path}: {written} frames at {output_fps:g} FPS ({codec}).")
+    return True
+
+def process_all_videos_in_folder(input_folder, output_folder, target_fps=10, target_width=640, workers=None, recursive=False, use_ffmpeg=None):
+    """
+    Transcode every video in a folder in parallel. Files finished by an earlier run are skipped.
+    :param workers: int, number of processes (default: one per core)
+    :param recursive: bool, also process subfolders, mirroring them under output_folder
+    :param use_ffmpeg: bool, transcode with the ffmpeg binary (default: when it is on PATH)
+    :return: dict, BatchRunner summary
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    tasks = []
+    for root, dirs, files in os.walk(input_folder):
+        if not recursive:
+            dirs.clear()
+        # Do not pick up our own output when it lives inside the input folder
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != os.path.abspath(output_folder)]
+        target_folder = os.path.join(output_folder, os.path.relpath(root, input_folder))
+        for filename in sorted(files):
+            if filename.endswith(".MP4") or filename.endswith(".mp4") or filename.endswith(".avi") or filename.endswith(".mov"):
+                os.makedirs(target_folder, exist_ok=True)
+                input_video_path = os.path.join(root, filename)
+                output_video_path = os.path.join(target_folder, f"reduce_{filename}")
+                tasks.append((input_video_path, output_video_path, {"target_fps": target_fps, "target_width": target_width,
+                                                                       "use_ffmpeg": use_ffmpeg}))
+
+    runner = BatchRunner(reduce_frame_rate_and_resize, workers=workers)
+    return runner.run(tasks, report_path=os.path.join(output_folder, "reduce_summary.json"))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reduce frame rate and size of videos.")
+    parser.add_argument('--input-folder', type=str, help="Transcode every video in this folder")
+    parser.add_argument('--output-folder', type=str, help="Where the reduced videos are written")
+    parser.add_argument('--recursive', action='store_true', help="Include subfolders")
+    parser.add_argument('--workers', type=int, help="Number of parallel processes (default: one per core)")
+    parser.add_argument('--fps', type=float, default=10, help="Target frame rate")
+    parser.add_argument('--width', type=int, default=640, help="Target width")
+    parser.add_argument('--no-ffmpeg', action='store_true', help="Transcode with OpenCV even when ffmpeg is installed")
+    args = parser.parse_args()
+    if args.input_folder:
+        process_all_videos_in_folder(args.input_folder, args.output_folder, args.fps, args.width, args.workers, args.recursive,
+                                      False if args.no_ffmpeg else None)
+        raise SystemExit(0)
+
     # input_folder = 'C:\\Users\\surachair\\Downloads\\Filemail.com - TOP-MarineVideo2'
     # output_folder = 'C:\\Users\\surachair\\Downloads\\Filemail.com - TOP-MarineVideo2\\Processed'
     # process_all_videos_in_folder(input_folder, output_folder)
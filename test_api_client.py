@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cAPIClient import APIClient
+
+
+class EventServer(ThreadingHTTPServer):
+    """Local stand-in for the Flask server: records every POST and answers /event and /events."""
+
+    def __init__(self, batch_status=200, fail_single_after=None):
+        super().__init__(("127.0.0.1", 0), EventHandler)
+        self.batch_status = batch_status
+        self.fail_single_after = fail_single_after
+        self.requests = []  # (path, body)
+        self.singles = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class EventHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self.server.requests.append((self.path, body))
+        if self.path == "/events":
+            status = self.server.batch_status
+        else:
+            self.server.singles += 1
+            failing = self.server.fail_single_after is not None and self.server.singles > self.server.fail_single_after
+            status = 500 if failing else 200
+        data = json.dumps({"status": "success"} if status == 200 else {"status": "error"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(**kwargs):
+        server = EventServer(**kwargs)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+EVENTS = [
+    {"gate": "a", "event": "in", "camera": "camera1", "event_id": "e1", "image": "http://host/images/e1.jpg"},
+    {"gate": "b", "event": "out", "camera": "camera2", "event_id": "e2"},
+    {"gate": "lab", "event": "in", "camera": "camera3", "event_id": "e3"},
+]
+
+
+def test_send_events_in_one_batch(start_server):
+    server = start_server()
+    delivered = []
+    client = APIClient(server.base_url, on_delivered=delivered.extend)
+    assert client.send_events(EVENTS) == 3
+    assert server.requests == [("/events", {"events": EVENTS})]
+    assert delivered == EVENTS
+
+
+def test_single_event_fallback_without_batch_endpoint(start_server):
+    server = start_server(batch_status=404)
+    client = APIClient(server.base_url)
+    assert client.send_events(EVENTS[:2]) == 2
+    assert client.batch_supported is False
+    assert [path for path, _ in server.requests] == ["/events", "/event", "/event", "/event"]
+    # The image reference goes out as the server's separate save_image event
+    assert server.requests[1][1] == {"gate": "a", "event": "in", "camera": "camera1", "event_id": "e1"}
+    assert server.requests[2][1] == {"gate": "a", "event": "save_image", "camera": "http://host/images/e1.jpg",
+                                     "event_id": "e1-image"}
+
+    # Later batches skip the batch endpoint
+    server.requests.clear()
+    assert client.send_events(EVENTS[2:]) == 1
+    assert [path for path, _ in server.requests] == ["/event"]
+
+
+def test_single_event_fallback_partial_delivery(start_server):
+    server = start_server(batch_status=405, fail_single_after=3)
+    delivered = []
+    client = APIClient(server.base_url, on_delivered=delivered.extend)
+    # e1 needs two requests (event and image), e2 one, e3 fails
+    assert client.send_events(EVENTS) == 2
+    assert delivered == EVENTS[:2]
+
+
+def test_batch_server_error_delivers_nothing(start_server):
+    server = start_server(batch_status=500)
+    delivered = []
+    client = APIClient(server.base_url, on_delivered=delivered.extend)
+    assert client.send_events(EVENTS) == 0
+    # A server error is retried as a batch later, not split into single events
+    assert client.batch_supported is True
+    assert [path for path, _ in server.requests] == ["/events"]
+    assert delivered == []
+
+
+def test_enqueue_event_through_outbox(start_server, tmp_path):
+    server = start_server()
+    client = APIClient(server.base_url, outbox_path=str(tmp_path / "outbox.db"), linger=0.2)
+    try:
+        client.enqueue_event("a", "in", "camera1")
+        client.enqueue_event("b", "out", "camera1", image="http://host/images/x.jpg")
+        deadline = time.time() + 5.0
+        while len(client.outbox) and time.time() < deadline:
+            time.sleep(0.05)
+        assert len(client.outbox) == 0
+        # Both events were coalesced into one request within the linger window
+        (path, body), = server.requests
+        assert path == "/events"
+        assert [event["gate"] for event in body["events"]] == ["a", "b"]
+        assert all("event_id" in event for event in body["events"])
+    finally:
+        client.close()
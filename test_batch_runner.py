@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from cBatchRunner import BatchRunner, run_task
+
+
+def copy_job(input_path, output_path, suffix=""):
+    """Module-level so the worker processes can unpickle it."""
+    if "bad" in os.path.basename(input_path):
+        return False
+    with open(input_path, "r", encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as dst:
+        dst.write(src.read() + suffix)
+
+
+def crash_job(input_path, output_path):
+    raise RuntimeError("decoder error")
+
+
+@pytest.fixture
+def tasks(tmp_path):
+    """(input_path, output_path, kwargs) for two good recordings and one the job rejects."""
+    tasks = []
+    for name in ("cam_a", "cam_b", "bad"):
+        input_path = tmp_path / f"{name}.mp4"
+        input_path.write_text(name)
+        tasks.append((str(input_path), str(tmp_path / f"{name}.out"), {"suffix": "!"}))
+    return tasks
+
+
+def test_run_task_writes_marker(tasks):
+    input_path, output_path, kwargs = tasks[0]
+    marker_path = BatchRunner.marker_path(output_path)
+    seconds, error = run_task(copy_job, input_path, output_path, marker_path, kwargs)
+    assert error is None
+    assert open(output_path, encoding="utf-8").read() == "cam_a!"
+    with open(marker_path, encoding="utf-8") as f:
+        marker = json.load(f)
+    assert marker["input"] == input_path
+    assert marker["input_size"] == os.path.getsize(input_path)
+    assert not os.path.exists(marker_path + ".tmp")
+
+
+def test_run_task_failure_leaves_no_marker(tasks):
+    input_path, output_path, kwargs = tasks[2]
+    marker_path = BatchRunner.marker_path(output_path)
+    assert run_task(copy_job, input_path, output_path, marker_path, kwargs)[1] == "job reported failure"
+    assert not os.path.exists(marker_path)
+
+    seconds, error = run_task(crash_job, input_path, output_path, marker_path, {})
+    assert "RuntimeError: decoder error" in error
+    assert not os.path.exists(marker_path)
+
+
+def test_is_done_checks_input_size(tasks):
+    runner = BatchRunner(copy_job, workers=1)
+    input_path, output_path, kwargs = tasks[1]
+    assert not runner.is_done(input_path, output_path)
+    run_task(copy_job, input_path, output_path, runner.marker_path(output_path), kwargs)
+    assert runner.is_done(input_path, output_path)
+
+    # A recording that was still growing when it was processed is redone
+    with open(input_path, "a", encoding="utf-8") as f:
+        f.write("more frames")
+    assert not runner.is_done(input_path, output_path)
+
+    with open(runner.marker_path(output_path), "w", encoding="utf-8") as f:
+        f.write("{truncated")
+    assert not runner.is_done(input_path, output_path)
+
+
+def test_run_skips_done_tasks_and_reports_failures(tasks, tmp_path):
+    report_path = str(tmp_path / "report.json")
+    runner = BatchRunner(copy_job, workers=2)
+
+    summary = runner.run(tasks, report_path)
+    assert (summary["total"], summary["skipped"], summary["done"]) == (3, 0, 2)
+    assert [failure["input"] for failure in summary["failed"]] == [tasks[2][0]]
+    with open(report_path, encoding="utf-8") as f:
+        assert json.load(f)["done"] == 2
+
+    # A rerun only retries the failed file
+    summary = runner.run(tasks)
+    assert (summary["skipped"], summary["done"], len(summary["failed"])) == (2, 0, 1)
@@ -0,0 +1,104 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from cEventHistory import EventHistory
+
+LEGACY = ["20250307_101502_zone_b_out\n", "20250307_101500_zone_a_in\n", "not an event\n", "20250306_230000_zone_lab_in\n"]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "history.db")
+
+
+@pytest.fixture
+def legacy_path(tmp_path):
+    path = tmp_path / "history.txt"
+    path.write_text("".join(LEGACY))
+    return str(path)
+
+
+@pytest.fixture
+def history(db_path):
+    history = EventHistory(db_path, legacy_path=None)
+    yield history
+    history.close()
+
+
+def test_append_and_query_filters(history):
+    history.append("a", "in", "cam_main", ts=100.0)
+    history.append("b", "in", "cam_b-in", ts=200.0)
+    history.append("a", "out", "cam_main", ts=300.0)
+
+    assert [e["ts"] for e in history.query()] == [300.0, 200.0, 100.0]
+    assert [e["direction"] for e in history.query(zone="a")] == ["out", "in"]
+    assert [e["zone"] for e in history.query(camera="cam_b-in")] == ["b"]
+    assert [e["ts"] for e in history.query(start=200.0, end=300.0)] == [200.0]
+    assert [e["ts"] for e in history.query(start=datetime.fromtimestamp(150.0), newest_first=False)] == [200.0, 300.0]
+    assert [e["ts"] for e in history.latest(2)] == [300.0, 200.0]
+
+
+def test_iter_latest_pages_through_ties(history):
+    ids = [history.append("a", "in", ts=float(i // 3)) for i in range(10)]
+    history.append("b", "in", ts=50.0)
+    # Chunk boundaries fall between rows with the same timestamp: newest first, none skipped or repeated
+    events = list(history.iter_latest(zone="a", chunk_size=4))
+    assert [e["id"] for e in events] == [e["id"] for e in history.query(zone="a")]
+    assert sorted(e["id"] for e in events) == ids
+
+
+def test_import_legacy_into_empty_database(db_path, legacy_path):
+    history = EventHistory(db_path, legacy_path=legacy_path)
+    events = history.query()
+    assert [(e["zone"], e["direction"]) for e in events] == [("b", "out"), ("a", "in"), ("lab", "in")]
+    assert events[0]["name"] == "20250307_101502_zone_b_out"
+    assert events[0]["ts"] == datetime(2025, 3, 7, 10, 15, 2).timestamp()
+    history.close()
+
+    # Reopening (or another process starting) does not import the file again
+    history = EventHistory(db_path, legacy_path=legacy_path)
+    assert len(history.query()) == 3
+    assert history.import_legacy(legacy_path, only_if_empty=True) == 0
+    history.close()
+
+
+def test_export_keeps_legacy_lines(db_path, legacy_path):
+    history = EventHistory(db_path, legacy_path=legacy_path, legacy_export=True)
+    history.append("a", "out", "cam_main", ts=time.mktime((2025, 3, 8, 8, 0, 0, 0, 0, -1)))
+    history.close()
+
+    with open(legacy_path) as f:
+        lines = f.readlines()
+    assert lines[0] == "20250308_080000_zone_a_out\n"
+    assert lines[1:] == [line for line in LEGACY if "zone" in line]
+
+
+def test_export_limited_to_latest_events(history, tmp_path):
+    for i in range(5):
+        history.append("a", "in", name=f"event{i}", ts=float(i))
+    export_path = str(tmp_path / "export" / "history.txt")
+    history.export_legacy(export_path, limit=2)
+    with open(export_path) as f:
+        assert f.read() == "event4\nevent3\n"
+
+
+def test_export_picks_up_other_processes(db_path, tmp_path):
+    legacy_path = str(tmp_path / "export.txt")
+    exporter = EventHistory(db_path, legacy_path=legacy_path, legacy_export=True, legacy_interval=0.05)
+    camera = EventHistory(db_path, legacy_path=legacy_path)
+    camera.append("b", "in", name="from_other_camera")
+    deadline = time.time() + 5.0
+    while time.time() < deadline:
+        try:
+            with open(legacy_path) as f:
+                if f.read() == "from_other_camera\n":
+                    break
+        except FileNotFoundError:
+            pass
+        time.sleep(0.05)
+    else:
+        raise AssertionError("history.txt was not exported")
+    camera.close()
+    exporter.close()
@@ -0,0 +1,123 @@
+import time
+
+import pytest
+
+from cDatabase import open_database
+from cEventOutbox import EventOutbox, OutboxFlusher
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = EventOutbox(str(tmp_path / "outbox.db"))
+    yield outbox
+    outbox.close()
+
+
+def put_events(outbox, n):
+    for i in range(n):
+        outbox.put({"gate": "a", "event": "in", "camera": "camera1", "event_id": f"e{i}"})
+
+
+def attempts(outbox):
+    return dict(outbox.conn.execute("SELECT event_id, attempts FROM outbox").fetchall())
+
+
+def test_put_keeps_one_row_per_event_id(outbox):
+    first = outbox.put({"gate": "a", "event": "in", "event_id": "dup"})
+    second = outbox.put({"gate": "a", "event": "out", "event_id": "dup"})
+    assert first == second == "dup"
+    assert len(outbox) == 1
+    # The first payload wins; a redelivered put does not overwrite it
+    assert outbox.peek()[0][1]["event"] == "in"
+
+
+def test_put_assigns_event_id_and_timestamp(outbox):
+    event_id = outbox.put({"gate": "b", "event": "out"})
+    (_, payload), = outbox.peek()
+    assert payload["event_id"] == event_id
+    assert "timestamp" in payload
+
+
+def test_peek_returns_oldest_first(outbox):
+    put_events(outbox, 5)
+    assert [payload["event_id"] for _, payload in outbox.peek(3)] == ["e0", "e1", "e2"]
+
+
+def test_flush_once_on_empty_outbox(outbox):
+    calls = []
+    flusher = OutboxFlusher(outbox, lambda batch: calls.append(batch) or len(batch))
+    assert flusher.flush_once() == 0
+    assert calls == []
+    assert outbox.oldest_age() is None
+
+
+def test_flush_once_delivers_full_batch(outbox):
+    put_events(outbox, 3)
+    sent = []
+    flusher = OutboxFlusher(outbox, lambda batch: sent.extend(batch) or len(batch), batch_size=2)
+    assert flusher.flush_once() == 2
+    assert flusher.flush_once() == 1
+    assert flusher.flush_once() == 0
+    assert [payload["event_id"] for payload in sent] == ["e0", "e1", "e2"]
+    assert len(outbox) == 0
+
+
+def test_flush_once_partial_batch(outbox):
+    put_events(outbox, 4)
+    flusher = OutboxFlusher(outbox, lambda batch: 2)
+    assert flusher.flush_once() == -1
+    # The delivered prefix is acknowledged, the first undelivered event is charged an attempt
+    # and the rest stay untouched, in order
+    assert [payload["event_id"] for _, payload in outbox.peek()] == ["e2", "e3"]
+    assert attempts(outbox) == {"e2": 1, "e3": 0}
+
+
+def test_flush_once_send_exception_keeps_batch(outbox):
+    put_events(outbox, 2)
+
+    def send_batch(batch):
+        raise ConnectionError("server down")
+
+    flusher = OutboxFlusher(outbox, send_batch)
+    assert flusher.flush_once() == -1
+    assert len(outbox) == 2
+    assert attempts(outbox) == {"e0": 1, "e1": 0}
+
+    # Redelivery after the outage sends the same events again, oldest first
+    sent = []
+    flusher.send_batch = lambda batch: sent.extend(batch) or len(batch)
+    assert flusher.flush_once() == 2
+    assert [payload["event_id"] for payload in sent] == ["e0", "e1"]
+    assert len(outbox) == 0
+
+
+def test_outbox_survives_reopen(outbox):
+    put_events(outbox, 2)
+    outbox.close()
+    reopened = EventOutbox(outbox.db_path)
+    assert [payload["event_id"] for _, payload in reopened.peek()] == ["e0", "e1"]
+    reopened.close()
+
+
+def test_open_database_creates_directory_in_wal_mode(tmp_path):
+    conn = open_database(str(tmp_path / "outbox" / "cam.db"), EventOutbox.SCHEMA)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 30000
+    assert conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0] == 0
+    conn.close()
+
+
+def test_wait_for_batch_lingers_on_partial_batch(outbox):
+    flusher = OutboxFlusher(outbox, lambda batch: len(batch), batch_size=3, linger=0.2)
+    assert flusher.wait_for_batch() is False  # Empty: nothing to linger on
+
+    outbox.put({"gate": "a", "event": "in", "event_id": "e0"})
+    start = time.time()
+    assert flusher.wait_for_batch() is True
+    assert time.time() - start >= 0.15
+
+    for i in range(1, 3):
+        outbox.put({"gate": "a", "event": "in", "event_id": f"e{i}"})
+    start = time.time()
+    assert flusher.wait_for_batch() is True  # A full batch goes out at once
+    assert time.time() - start < 0.1
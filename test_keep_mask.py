@@ -0,0 +1,38 @@
+from common_functions import build_keep_mask
+
+
+def test_no_polygons_keeps_whole_frame():
+    mask, roi = build_keep_mask((40, 60), [])
+    assert mask.shape == (40, 60)
+    assert (mask == 255).all()
+    assert roi == (0, 0, 60, 40)
+
+
+def test_overlapping_polygons_are_both_excluded():
+    # Two squares sharing the area 20..30 x 20..30; a single fillPoly call would leave it kept
+    first = [(10, 10), (30, 10), (30, 30), (10, 30)]
+    second = [(20, 20), (40, 20), (40, 40), (20, 40)]
+    mask, _ = build_keep_mask((50, 50), [first, second])
+    assert mask[25, 25] == 0
+    assert mask[15, 15] == 0
+    assert mask[35, 35] == 0
+    assert mask[45, 5] == 255
+
+
+def test_roi_bounds_the_kept_area():
+    # Black out the left half and the bottom rows
+    polygons = [[(0, 0), (49, 0), (49, 99), (0, 99)], [(0, 80), (99, 80), (99, 99), (0, 99)]]
+    mask, roi = build_keep_mask((100, 100, 3), polygons)
+    assert roi == (50, 0, 50, 80)
+    assert (mask[:80, 50:] == 255).all()
+
+
+def test_degenerate_polygons_are_ignored():
+    mask, roi = build_keep_mask((20, 20), [[(1, 1), (5, 5)]])
+    assert (mask == 255).all()
+
+
+def test_fully_excluded_frame_falls_back_to_whole_frame():
+    mask, roi = build_keep_mask((20, 30), [[(0, 0), (29, 0), (29, 19), (0, 19)]])
+    assert not mask.any()
+    assert roi == (0, 0, 30, 20)
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+from cLEDWorker import ConnectionManager
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_apply_clears_values_after_write(led_worker, modbus_client):
+    modbus_client.connect()
+    values = {'A': 12}
+    led_worker.apply(values)
+    assert values == {}
+    assert modbus_client.writes
+
+
+def test_apply_nothing_to_send(led_worker, modbus_client):
+    led_worker.apply({})
+    assert modbus_client.writes == []
+    assert led_worker.led.transactions == 0
+
+
+def test_apply_failed_write_raises_and_keeps_values(led_worker, modbus_client):
+    modbus_client.fail_writes = 1
+    values = {'A': 12}
+    with pytest.raises(ConnectionError):
+        led_worker.apply(values)
+    assert values == {'A': 12}
+
+
+def test_requeue_does_not_overwrite_newer_values(led_worker):
+    led_worker.update({'A': 5})
+    led_worker.requeue({'A': 3, 'B': 4}, 7)
+    led_worker.set_brightness(2)
+    led_worker.requeue({}, 7)
+    assert led_worker.take_pending() == ({'A': 5, 'B': 4}, 2)
+
+
+def test_run_requeues_failed_write_and_retries(led_worker, modbus_client):
+    led_worker.connection.base_backoff = 0.05
+    modbus_client.fail_writes = 1
+    led_worker.start()
+    led_worker.update({'A': 12})
+    # The first attempt fails and backs off; the retry reconnects, resyncs and rewrites A
+    assert wait_until(lambda: 60 in modbus_client.registers)
+    assert led_worker.connection.failures == 0
+    assert led_worker.connection.last_error == "register write rejected by 127.0.0.1"
+    assert led_worker.connection.reconnects == 1
+    assert led_worker.pending == {}
+
+
+def test_refresh_rewrites_latest_values_without_new_updates(led_worker, modbus_client):
+    modbus_client.connect()
+    led_worker.update({'A': 12, 'B': 'Full'})
+    values, _ = led_worker.take_pending()
+    led_worker.apply(values)
+
+    # The sign was power-cycled; the counts did not change, so no update() arrives
+    modbus_client.registers.clear()
+    modbus_client.writes.clear()
+    led_worker.refresh()
+    values, _ = led_worker.take_pending()
+    assert values == {'A': 12, 'B': 'Full'}
+    led_worker.apply(values)
+    assert {60, 70, 213, 216} <= {start for start, _ in modbus_client.writes}
+
+
+def test_reconnect_requeues_latest_values(led_worker, modbus_client):
+    led_worker.update({'A': 12})
+    assert led_worker.ensure_connected()
+    led_worker.apply(led_worker.take_pending()[0])
+
+    modbus_client.close()
+    assert led_worker.ensure_connected()
+    assert led_worker.take_pending() == ({'A': 12}, None)
+
+
+def test_connection_backoff_doubles_up_to_max(modbus_client):
+    modbus_client.connect_error = "no route to host"
+    connection = ConnectionManager(modbus_client, base_backoff=1.0, max_backoff=5.0, breaker_threshold=10)
+    delays = []
+    for _ in range(5):
+        connection.next_attempt = 0.0  # Skip the wait
+        assert connection.connect() is False
+        delays.append(round(connection.delay()))
+    assert delays == [1, 2, 4, 5, 5]
+    assert connection.state == "backoff"
+    assert connection.last_error == "no route to host"
+
+
+def test_connection_waits_for_backoff(modbus_client):
+    connection = ConnectionManager(modbus_client, base_backoff=60.0)
+    connection.mark_failure("timeout")
+    assert not connection.ready()
+    assert connection.connect() is False
+    assert not modbus_client.client.connected  # No attempt was made during the backoff
+
+
+def test_connection_breaker_opens_and_recovers(modbus_client):
+    connection = ConnectionManager(modbus_client, breaker_threshold=3, breaker_cooldown=300.0)
+    for _ in range(3):
+        connection.mark_failure("timeout")
+    assert connection.state == "open"
+    assert 299 < connection.delay() <= 300
+
+    # One trial connection after the cooldown closes the breaker again
+    connection.next_attempt = 0.0
+    assert connection.connect() is True
+    assert connection.state == "online"
+    assert connection.failures == 0
+    assert connection.reconnects == 1
+    assert connection.health()["retry_in"] == 0.0
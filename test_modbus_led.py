@@ -0,0 +1,95 @@
+from cModbusLED import plan_blocks
+
+
+def test_plan_blocks_merges_adjacent_addresses():
+    assert plan_blocks([5, 3, 1, 2, 2]) == [(1, 3), (5, 1)]
+    assert plan_blocks([]) == []
+
+
+def test_plan_blocks_bridges_gaps_up_to_max_gap():
+    assert plan_blocks([1, 3], max_gap=1) == [(1, 3)]
+    assert plan_blocks([1, 4], max_gap=1) == [(1, 1), (4, 1)]
+    assert plan_blocks([60, 61, 70, 71], max_gap=20) == [(60, 12)]
+
+
+def test_plan_blocks_respects_max_count():
+    assert plan_blocks(range(10), max_count=4) == [(0, 4), (4, 4), (8, 2)]
+
+
+def test_plan_writes_bridges_known_gap(led):
+    led.shadow = {61: 7, 62: 8}
+    assert led.plan_writes({60: 1, 63: 4}) == [(60, [1, 7, 8, 4])]
+
+
+def test_plan_writes_splits_around_unknown_registers(led):
+    led.shadow = {61: 7}  # 62 was never read: it must not be overwritten
+    assert led.plan_writes({60: 1, 63: 4}) == [(60, [1]), (63, [4])]
+
+
+def test_write_many_sends_only_changes(led, modbus_client):
+    assert led.write_many({'A': 12})
+    assert modbus_client.registers[213] == 1 and modbus_client.registers[214] == 1
+    assert 'A' not in led.stale
+
+    modbus_client.writes.clear()
+    transactions = led.transactions
+    assert led.write_many({'A': 12})
+    assert modbus_client.writes == []
+    assert led.transactions == transactions
+
+    # 12 -> 13 changes only the register holding the last digit; font and color stay
+    assert led.write_many({'A': 13})
+    assert [(start, len(block)) for start, block in modbus_client.writes] == [(61, 1)]
+
+
+def test_write_many_failed_block_is_resent(led, modbus_client):
+    modbus_client.fail_at = {60}
+    assert led.write_many({'A': 12}) is False
+    assert 60 not in led.shadow and 61 not in led.shadow
+    assert 'A' in led.stale
+
+    modbus_client.fail_at = set()
+    modbus_client.writes.clear()
+    assert led.write_many({'A': 12})
+    # The group was left stale, so everything is written again, not just the failed block
+    assert sorted(start for start, _ in modbus_client.writes) == [60, 213]
+    assert 'A' not in led.stale
+
+
+def test_write_many_tracks_staleness_per_group(led, modbus_client):
+    modbus_client.fail_at = {70}  # B's digits
+    assert led.write_many({'A': 12, 'B': 34}) is False
+    assert led.stale == {'B', 'Lab'}
+
+    modbus_client.fail_at = set()
+    modbus_client.writes.clear()
+    assert led.write_many({'A': 12, 'B': 34})
+    assert all(70 <= start < 80 or start >= 216 for start, _ in modbus_client.writes)
+    assert led.stale == {'Lab'}
+
+
+def test_invalidate_all_marks_every_group_stale(led, modbus_client):
+    led.write_many({'A': 1, 'B': 2, 'Lab': 3})
+    assert led.stale == set()
+    led.invalidate()
+    modbus_client.writes.clear()
+    assert led.write_many({'A': 1})
+    assert modbus_client.writes
+    assert led.stale == {'B', 'Lab'}
+
+
+def test_invalidate_group_marks_it_stale(led, modbus_client):
+    led.write_many({'A': 1, 'B': 2})
+    led.invalidate('A')
+    assert led.stale == {'A', 'Lab'}
+    modbus_client.writes.clear()
+    assert led.write_many({'A': 1, 'B': 2})
+    assert sorted(start for start, _ in modbus_client.writes) == [60, 213]
+    assert 'A' not in led.stale
+
+
+def test_sync_reads_register_map_into_shadow(led, modbus_client):
+    modbus_client.registers.update({60: 5, 214: 9})
+    assert led.sync()
+    assert led.shadow[60] == 5 and led.shadow[214] == 9
+    assert 215 in led.shadow  # Read through the gap between A's color and B's font
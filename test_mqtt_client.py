@@ -0,0 +1,127 @@
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+import pytest
+
+from cMQTTClient import MQTTClient
+
+
+class FakePahoClient:
+    """Stands in for paho's client: records publishes and fails on demand."""
+
+    def __init__(self):
+        self.published = []
+        self.lock = threading.Lock()
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        if isinstance(payload, dict):
+            raise TypeError("payload must be a string, bytearray, int, float or None.")
+        with self.lock:
+            self.published.append((topic, payload))
+        return mqtt.MQTTMessageInfo(0)
+
+    def is_connected(self):
+        return True
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+@pytest.fixture
+def client():
+    client = MQTTClient("localhost", max_queue=3, coalesce_interval=0.2)
+    # No broker: next_message() and the sender see a connected client without a network loop
+    client.running = True
+    client.connected = True
+    return client
+
+
+def topics(client):
+    return [message[0] for message in client.queue]
+
+
+def next_message(client):
+    with client.condition:
+        return client.next_message()
+
+
+def test_full_queue_drops_oldest_normal_message(client):
+    for i in range(3):
+        assert client.publish(f"EVENT/{i}", "x")
+    assert client.publish("EVENT/3", "x")
+    assert topics(client) == ["EVENT/1", "EVENT/2", "EVENT/3"]
+    assert client.stats["dropped"] == 1
+
+
+def test_priority_messages_survive_overflow(client):
+    client.publish("ALARM/0", "x", priority=True)
+    client.publish("EVENT/1", "x")
+    client.publish("ALARM/2", "x", priority=True)
+    # Normal messages go first, even when the new message is a normal one too
+    assert client.publish("EVENT/3", "x")
+    assert topics(client) == ["ALARM/0", "ALARM/2", "EVENT/3"]
+    assert client.publish("ALARM/4", "x", priority=True)
+    assert topics(client) == ["ALARM/0", "ALARM/2", "ALARM/4"]
+
+    # A normal message cannot push out priority ones
+    assert client.publish("EVENT/5", "x") is False
+    # A priority message replaces the oldest one when nothing else is left
+    assert client.publish("ALARM/6", "x", priority=True)
+    assert topics(client) == ["ALARM/2", "ALARM/4", "ALARM/6"]
+
+
+def test_coalesced_telemetry_keeps_newest_per_topic(client):
+    for i in range(5):
+        client.publish("SYS/camera1", f"tick {i}", coalesce=True)
+    client.publish("SYS/camera2", "tick 0", coalesce=True)
+    assert len(client.queue) == 0
+    assert client.stats["dropped"] == 4
+    assert next_message(client)[:2] == ("SYS/camera1", "tick 4")
+    assert next_message(client)[:2] == ("SYS/camera2", "tick 0")
+
+
+def test_coalesced_telemetry_is_rate_limited(client):
+    client.publish("SYS/camera1", "tick 0", coalesce=True)
+    assert next_message(client)[1] == "tick 0"
+
+    client.publish("SYS/camera1", "tick 1", coalesce=True)
+    client.publish("EVENT/1", "x")
+    start = time.time()
+    # Queued messages are not held back by the telemetry interval...
+    assert next_message(client)[0] == "EVENT/1"
+    assert time.time() - start < 0.1
+    # ...but the next telemetry message waits for it
+    assert next_message(client)[1] == "tick 1"
+    assert time.time() - start >= 0.15
+
+
+def test_send_retries_only_without_connection(client):
+    # The real paho client is not connected: publish() returns MQTT_ERR_NO_CONN
+    assert client.send(("EVENT/1", "x", 0, False, False)) is True
+    assert (client.stats["failed"], client.stats["dropped"]) == (1, 0)
+
+    # A payload paho rejects fails the same way every time: dropped, not retried
+    assert client.send(("EVENT/1", {"gate": "a"}, 0, False, False)) is False
+    assert client.send(("EVENT/+", "x", 0, False, False)) is False
+    assert (client.stats["failed"], client.stats["dropped"]) == (3, 2)
+
+
+def test_sender_drops_bad_message_and_keeps_going(client):
+    client.client = FakePahoClient()
+    client.publish("EVENT/1", {"gate": "a"})
+    client.publish("EVENT/2", "ok")
+    sender = threading.Thread(target=client.run_sender, daemon=True)
+    sender.start()
+    deadline = time.time() + 5.0
+    while client.stats["sent"] < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    client.disconnect()
+    sender.join(timeout=5.0)
+
+    assert client.client.published == [("EVENT/2", "ok")]
+    assert client.metrics()["pending"] == 0
+    assert (client.stats["failed"], client.stats["dropped"]) == (1, 1)
@@ -0,0 +1,48 @@
+import pytest
+
+from cPipelineTelemetry import PipelineTelemetry
+
+
+@pytest.fixture
+def telemetry():
+    telemetry = PipelineTelemetry("camera1", interval=5.0)
+    telemetry.last = (100.0, dict(telemetry.counters))
+    return telemetry
+
+
+def test_record_waits_for_interval(telemetry):
+    telemetry.count("captured")
+    assert telemetry.record(0, 0, 0, now=104.9) is None
+    assert telemetry.record(0, 0, 0, now=105.0) is not None
+    # The interval starts over after each record
+    assert telemetry.record(0, 0, 0, now=109.0) is None
+
+
+def test_record_reports_rates_since_previous_record(telemetry):
+    for _ in range(50):
+        telemetry.count("captured")
+    for _ in range(20):
+        telemetry.count("processed")
+        telemetry.count("inference_s", 0.025)
+    telemetry.count("dropped", 3)
+    telemetry.count("reconnects")
+    record = telemetry.record(queue_depth=4, in_counts=7, out_counts=2, now=110.0)
+    assert record == {
+        "camera": "camera1",
+        "ts": 110.0,
+        "capture_fps": 5.0,
+        "processed_fps": 2.0,
+        "queue_depth": 4,
+        "dropped": 3,
+        "inference_ms": 25.0,
+        "in_counts": 7,
+        "out_counts": 2,
+        "reconnects": 1,
+    }
+
+    # Rates and drops are per interval; reconnects and counts are running totals
+    telemetry.count("captured", 10)
+    record = telemetry.record(queue_depth=0, in_counts=8, out_counts=2, now=120.0)
+    assert (record["capture_fps"], record["processed_fps"], record["dropped"]) == (1.0, 0.0, 0)
+    assert record["inference_ms"] is None  # Nothing processed in this interval
+    assert (record["reconnects"], record["in_counts"]) == (1, 8)
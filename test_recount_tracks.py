@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("ultralytics")  # The object counters draw with ultralytics' Annotator
+
+from cTrackCache import TrackCache, TrackCacheWriter
+from recount_tracks import parse_points, recount
+
+# Diagonal counting line; a point counts only inside the line's bounding box (the whole frame here)
+META = {"camera": "cam_a", "names": {2: "car", 7: "truck"}, "frame_size": [640, 480],
+        "reg_pts": [[0, 0], [640, 480]], "algorithm": "centroid"}
+
+
+class FakeTensor:
+    def __init__(self, array):
+        self.array = np.asarray(array, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+def car(x, track_id, y=240):
+    """One model.track result with a car centred on (x, y)."""
+    rows = [[x - 20, y - 20, x + 20, y + 20, track_id, 0.9, 2]]
+    return [SimpleNamespace(boxes=SimpleNamespace(data=FakeTensor(rows)))]
+
+
+def write_session(path, centres, track_id=1, start_ts=0.0):
+    writer = TrackCacheWriter(path, segment_frames=2, **META)
+    for i, x in enumerate(centres):
+        writer.add(car(x, track_id), ts=start_ts + i)
+    writer.close()
+
+
+def test_recount_counts_line_crossing(tmp_path):
+    path = str(tmp_path / "tracks.npz")
+    # Left of the diagonal at x < 320 (for y = 240), right of it after
+    write_session(path, [200, 260, 380, 440])
+    result = recount(TrackCache(path))
+    assert (result["in_counts"], result["out_counts"]) == (1, 0)
+    assert result["events"] == [{"frame": 2, "ts": 2.0, "direction": "IN"}]
+    assert result["class_wise_count"] == {"car": {"IN": 1, "OUT": 0}}
+
+    # The same tracks against a line they never reach
+    result = recount(TrackCache(path), reg_pts=parse_points("0,400,100,480"))
+    assert (result["in_counts"], result["out_counts"]) == (0, 0)
+
+
+def test_recount_opposite_direction(tmp_path):
+    path = str(tmp_path / "tracks.npz")
+    write_session(path, [440, 380, 260, 200])
+    result = recount(TrackCache(path))
+    assert (result["in_counts"], result["out_counts"]) == (0, 1)
+
+
+def test_recount_resumed_cache_has_no_phantom_crossing(tmp_path):
+    path = str(tmp_path / "tracks.npz")
+    # A car waits left of the line until the process restarts...
+    write_session(path, [200, 200, 200])
+    # ...and the restarted tracker calls the next car, right of the line, track 1 as well
+    write_session(path, [440, 460, 480], start_ts=100.0)
+    result = recount(TrackCache(path))
+    assert (result["in_counts"], result["out_counts"]) == (0, 0)
@@ -0,0 +1,56 @@
+import random
+import statistics
+
+from cRollingStats import RollingStats, RollingWindow
+
+
+def test_empty_window():
+    window = RollingWindow(10.0)
+    assert len(window) == 0
+    assert window.mean() is None
+    assert window.median() is None
+    assert window.mode() is None
+
+
+def test_samples_expire_after_window():
+    window = RollingWindow(10.0)
+    window.add(4, ts=0.0)
+    window.add(8, ts=5.0)
+    assert window.mean() == 6
+    window.add(2, ts=10.0)  # The sample at 0.0 is exactly one window old and drops out
+    assert len(window) == 2
+    assert window.mean() == 5
+    assert 4 not in window.histogram
+
+
+def test_median_matches_lower_median():
+    rng = random.Random(1)
+    window = RollingWindow(1000.0)
+    values = []
+    for i in range(200):
+        value = rng.randint(0, 20)
+        values.append(value)
+        window.add(value, ts=float(i))
+        assert window.median() == statistics.median_low(values)
+        assert window.mean() == statistics.mean(values)
+
+
+def test_mode_prefers_larger_value_on_ties():
+    window = RollingWindow(10.0)
+    for value in (3, 5, 3, 5, 1):
+        window.add(value, ts=0.0)
+    assert window.mode() == 5
+    window.add(3, ts=1.0)
+    assert window.mode() == 3
+
+
+def test_stats_keep_windows_independent():
+    stats = RollingStats(windows=(10.0, 60.0))
+    for second in range(60):
+        stats.add(1 if second < 50 else 3, ts=float(second))
+    summary = stats.summary()
+    assert summary[10.0]["n"] == 10
+    assert stats.mean(10.0) == 3
+    assert stats.median(60.0) == 1
+    assert stats.mode(60.0) == 1
+    assert summary[60.0]["n"] == 60
@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pytest
+
+from cSlotOccupancy import SlotOccupancy
+
+SLOTS = [("MG-01", [(10, 50), (40, 50), (40, 90), (10, 90)]),
+         ("MG-02", [(60, 50), (90, 50), (90, 90), (60, 90)])]
+CAR_ON_FIRST = [(5, 0, 45, 95)]  # Lower half (the footprint) covers MG-01
+
+
+@pytest.fixture
+def slot_map():
+    return SlotOccupancy(SLOTS, (100, 100), scale=1.0)
+
+
+def test_coverage_uses_box_footprint(slot_map):
+    coverage = slot_map.coverage(CAR_ON_FIRST)
+    assert coverage[0] == 1.0
+    assert coverage[1] == 0.0
+    # This box covers MG-02 with its upper half only; its footprint lies below the slot
+    assert slot_map.coverage([(55, 50, 95, 190)])[1] == 0.0
+    assert slot_map.coverage(np.zeros((0, 4))).tolist() == [0.0, 0.0]
+
+
+def test_overlapping_boxes_count_once(slot_map):
+    assert slot_map.coverage(CAR_ON_FIRST * 3)[0] == 1.0
+
+
+def test_slot_turns_occupied_after_on_frames(slot_map):
+    slot_map.on_frames, slot_map.off_frames = 3, 2
+    assert not slot_map.update(CAR_ON_FIRST)[0]
+    assert not slot_map.update(CAR_ON_FIRST)[0]
+    assert slot_map.update(CAR_ON_FIRST)[0]
+    assert slot_map.states() == {"MG-01": True, "MG-02": False}
+    assert (slot_map.occupied_count(), slot_map.free_count()) == (1, 1)
+
+
+def test_missed_detection_does_not_free_slot(slot_map):
+    slot_map.on_frames, slot_map.off_frames = 1, 2
+    slot_map.update(CAR_ON_FIRST)
+    assert slot_map.update([])[0]  # One empty frame...
+    slot_map.update(CAR_ON_FIRST)  # ...followed by a detection resets the streak
+    slot_map.update([])
+    assert slot_map.occupied[0]
+    slot_map.update([])
+    assert not slot_map.occupied[0]
+
+
+def test_interrupted_streak_starts_over(slot_map):
+    slot_map.on_frames = 3
+    slot_map.update(CAR_ON_FIRST)
+    slot_map.update(CAR_ON_FIRST)
+    slot_map.update([])
+    slot_map.update(CAR_ON_FIRST)
+    slot_map.update(CAR_ON_FIRST)
+    assert not slot_map.occupied[0]
+    slot_map.update(CAR_ON_FIRST)
+    assert slot_map.occupied[0]
+
+
+def test_from_file_scales_fractional_points(tmp_path):
+    path = tmp_path / "slots.json"
+    path.write_text(json.dumps({"slots": [{"name": "MG-01", "points": [[0.1, 0.5], [0.4, 0.5], [0.4, 0.9], [0.1, 0.9]]}]}))
+    slot_map = SlotOccupancy.from_file(str(path), (200, 100), scale=1.0)
+    assert slot_map.coverage([(10, 0, 90, 95)])[0] == 1.0
+    assert slot_map.coverage([(100, 0, 190, 95)])[0] == 0.0
@@ -0,0 +1,75 @@
+import pytest
+
+from cSlotService import SlotService, parse_capacities
+
+CAPACITIES = {"a": 2, "b": 5}
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = SlotService(CAPACITIES, db_path=str(tmp_path / "slots.db"))
+    yield service
+    service.close()
+
+
+def test_apply_counts_in_and_out(service):
+    assert service.apply("a", "in")
+    assert service.apply("b", "in")
+    assert service.apply("b", "in")
+    assert service.apply("b", "out")
+    assert service.available_slots() == {"current_a": 1, "current_b": 4}
+
+
+def test_duplicate_event_id_applied_once(service):
+    assert service.apply("b", "in", event_id="e1")
+    assert service.apply("b", "in", event_id="e1") is False
+    assert service.available_slots()["current_b"] == 4
+    service.close()
+
+    # The ids come back from the journal, so a redelivery after a restart is dropped too
+    restarted = SlotService(CAPACITIES, db_path=service.db_path)
+    assert restarted.apply("b", "in", event_id="e1") is False
+    assert restarted.available_slots()["current_b"] == 4
+    restarted.close()
+
+
+def test_occupancy_clamped_to_capacity(service):
+    assert service.apply("a", "out") is False
+    assert service.apply("a", "in")
+    assert service.apply("a", "in")
+    assert service.apply("a", "in") is False
+    assert service.available_slots()["current_a"] == 0
+    # Clamped events are still journaled
+    assert service.conn.execute("SELECT COUNT(*) FROM journal WHERE zone = 'a'").fetchone()[0] == 4
+
+
+def test_unknown_zone_and_event_are_ignored(service):
+    changes = []
+    service.subscribe(changes.append)
+    assert service.apply("mg", "in") is False
+    assert service.set_occupied("mg", 3) is False
+    assert service.apply("a", "get") is False
+    assert changes == []
+
+
+def test_restore_after_reopen_applies_new_capacity(service):
+    for _ in range(4):
+        service.apply("b", "in")
+    service.close()
+
+    restarted = SlotService({"a": 2, "b": 3}, db_path=service.db_path)
+    assert restarted.data()["current_b_occupied"] == 3
+    assert restarted.available_slots() == {"current_a": 2, "current_b": 0}
+    restarted.close()
+
+
+def test_set_occupied_notifies_subscribers(service):
+    changes = []
+    service.subscribe(changes.append)
+    assert service.set_occupied("b", 9)
+    assert changes == [{"current_a": 2, "current_b": 0}]
+
+
+def test_parse_capacities():
+    assert parse_capacities("a:120, b:80,,lab:60") == {"a": 120, "b": 80, "lab": 60}
+    assert parse_capacities("") == {}
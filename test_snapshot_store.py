@@ -0,0 +1,69 @@
+import os
+import time
+
+import numpy as np
+
+from cSnapshotStore import SnapshotStore
+from cSnapshotWriter import SnapshotWriter, write_atomic
+
+
+def add_file(store, zone, event, ts, size):
+    path, _ = store.path_for(zone, event, ts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_atomic(path, b"x" * size)
+    store.add(path, ts, zone, event, size)
+    return path
+
+
+def test_path_for_shards_by_date_and_zone(tmp_path):
+    store = SnapshotStore(str(tmp_path), thumbnail_width=None)
+    ts = time.mktime((2025, 3, 7, 14, 5, 9, 0, 0, -1))
+    path, thumb = store.path_for("a", "in", ts)
+    assert path == os.path.join(str(tmp_path), "2025", "03", "07", "zone_a", "20250307_140509_zone_a_in.jpg")
+    assert thumb == os.path.join(os.path.dirname(path), "thumbs", os.path.basename(path))
+    store.close()
+
+
+def test_save_writes_image_thumbnail_and_index(tmp_path):
+    store = SnapshotStore(str(tmp_path), thumbnail_width=16)
+    writer = SnapshotWriter()
+    img = np.zeros((48, 64, 3), dtype=np.uint8)
+    path = store.save(writer, img, "b", "out")
+    writer.close()
+
+    row, = store.recent()
+    assert row["path"] == path
+    assert row["size"] == os.path.getsize(path)
+    assert os.path.exists(row["thumb"])
+    store.close()
+
+
+def test_recent_filters_newest_first(tmp_path):
+    store = SnapshotStore(str(tmp_path), thumbnail_width=None)
+    now = time.time()
+    add_file(store, "a", "in", now - 30, 10)
+    add_file(store, "b", "in", now - 20, 10)
+    add_file(store, "a", "out", now - 10, 10)
+    assert [(row["zone"], row["event"]) for row in store.recent()] == [("a", "out"), ("b", "in"), ("a", "in")]
+    assert [row["event"] for row in store.recent(zone="a")] == ["out", "in"]
+    assert [row["zone"] for row in store.recent(event="in", n=1)] == ["b"]
+    store.close()
+
+
+def test_retention_by_age_and_size(tmp_path):
+    store = SnapshotStore(str(tmp_path), thumbnail_width=None)
+    now = time.time()
+    old = add_file(store, "a", "in", now - 3 * 86400, 100)
+    oldest_recent = add_file(store, "a", "in", now - 60, 100)
+    newest = add_file(store, "a", "out", now - 30, 100)
+
+    assert store.enforce_retention(max_age_days=2) == 1
+    assert not os.path.exists(old)
+    assert store.total_size() == 200
+
+    # Over the size limit the oldest snapshots go first, only as many as needed
+    assert store.enforce_retention(max_bytes=150, chunk_size=1) == 1
+    assert not os.path.exists(oldest_recent)
+    assert os.path.exists(newest)
+    assert [row["path"] for row in store.recent()] == [newest]
+    store.close()
@@ -0,0 +1,128 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from cTrackCache import TrackCache, TrackCacheWriter, max_track_id, segment_paths
+
+META = {"camera": "cam_a", "names": {2: "car", 7: "truck"}, "frame_size": [640, 480],
+        "reg_pts": [[0, 0], [640, 480]], "algorithm": "centroid"}
+
+
+class FakeTensor:
+    def __init__(self, array):
+        self.array = np.asarray(array, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+def tracks(rows):
+    """One model.track result; rows are x1, y1, x2, y2, [id,] conf, cls, or None for no boxes."""
+    boxes = None if rows is None else SimpleNamespace(data=FakeTensor(np.reshape(rows, (len(rows), -1))))
+    return [SimpleNamespace(boxes=boxes)]
+
+
+def write_frames(writer, n, start=0):
+    for i in range(start, start + n):
+        writer.add(tracks([[i, 10, i + 20, 40, i % 3 + 1, 0.9, 2]]), ts=float(i))
+
+
+def test_segments_round_trip(tmp_path):
+    path = str(tmp_path / "video_tracks.npz")
+    writer = TrackCacheWriter(path, segment_frames=4, **META)
+    write_frames(writer, 10)
+    writer.close()
+    assert [os.path.basename(p) for p in segment_paths(path)] == [
+        "video_tracks_part000.npz", "video_tracks_part001.npz", "video_tracks_part002.npz"]
+
+    cache = TrackCache(path)
+    assert (cache.segments, len(cache)) == (3, 10)
+    assert cache.names == {2: "car", 7: "truck"}
+    frames = list(cache.results())
+    assert [frame for frame, _, _ in frames] == list(range(10))
+    frame, ts, (result,) = frames[7]
+    assert ts == 7.0
+    assert result.boxes.xyxy.tolist() == [[7, 10, 27, 40]]
+    assert result.boxes.id.int().tolist() == [2]
+    assert result.boxes.cls.tolist() == [2.0]
+
+
+def test_empty_and_untracked_frames(tmp_path):
+    path = str(tmp_path / "tracks.npz")
+    writer = TrackCacheWriter(path, **META)
+    writer.add(tracks(None), ts=0.0)
+    writer.add(tracks([[1, 2, 3, 4, 0.5, 7]]), ts=1.0)  # Detection without a track id
+    writer.add(tracks([[1, 2, 3, 4, 5, 0.5, 7], [5, 6, 7, 8, 6, 0.8, 2]]), ts=2.0)
+    writer.close()
+
+    (_, ts0, (empty,)), (_, _, (untracked,)), (_, _, (tracked,)) = TrackCache(path).results()
+    assert ts0 is None and len(empty.boxes) == 0 and empty.boxes.id is None
+    assert len(untracked.boxes) == 1 and untracked.boxes.id is None
+    assert tracked.boxes.id.tolist() == [5.0, 6.0]
+
+
+def test_resume_continues_after_last_segment(tmp_path):
+    path = str(tmp_path / "tracks.npz")
+    writer = TrackCacheWriter(path, segment_frames=3, **META)
+    write_frames(writer, 4)
+    writer.close()
+
+    writer = TrackCacheWriter(path, segment_frames=3, **META)
+    assert (writer.part, writer.frames) == (2, 4)
+    write_frames(writer, 2, start=4)
+    writer.close()
+
+    cache = TrackCache(path)
+    assert (cache.segments, len(cache)) == (3, 6)
+    assert [ts for _, ts, _ in cache.results()] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_no_resume_removes_old_segments(tmp_path):
+    path = str(tmp_path / "tracks.npz")
+    writer = TrackCacheWriter(path, segment_frames=2, **META)
+    write_frames(writer, 5)
+    writer.close()
+
+    writer = TrackCacheWriter(path, segment_frames=2, resume=False, **META)
+    assert segment_paths(path) == []
+    write_frames(writer, 1)
+    writer.close()
+    assert len(TrackCache(path)) == 1
+
+
+def test_close_without_new_frames_writes_nothing(tmp_path):
+    path = str(tmp_path / "tracks.npz")
+    writer = TrackCacheWriter(path, segment_frames=2, **META)
+    write_frames(writer, 2)  # Flushed by add()
+    writer.close()
+    assert len(segment_paths(path)) == 1
+    assert not [name for name in os.listdir(tmp_path) if ".tmp" in name]
+
+
+
+def test_resume_shifts_track_ids_past_stored_ones(tmp_path):
+    path = str(tmp_path / "tracks.npz")
+    writer = TrackCacheWriter(path, segment_frames=2, **META)
+    write_frames(writer, 3)  # Track ids 1, 2, 3
+    writer.close()
+
+    # After a restart the tracker numbers its tracks from 1 again
+    writer = TrackCacheWriter(path, segment_frames=2, **META)
+    writer.add(tracks([[1, 2, 3, 4, 1, 0.5, 2], [5, 6, 7, 8, 2, 0.8, 2]]), ts=3.0)
+    writer.add(tracks([[1, 2, 3, 4, 0.5, 2]]), ts=4.0)  # A box without a track id stays without one
+    writer.close()
+    assert writer.max_track_id == 6
+
+    ids = [result.boxes.id for _, _, (result,) in TrackCache(path).results()]
+    assert [frame_ids.tolist() for frame_ids in ids[:4]] == [[1.0], [2.0], [3.0], [5.0, 6.0]]
+    assert ids[4] is None
+
+    # The largest id is carried in the segment metadata, so the next restart continues after it
+    writer = TrackCacheWriter(path, segment_frames=2, **META)
+    assert writer.id_offset == 7
+    # Segments written without it are scanned instead
+    assert max_track_id(segment_paths(path)) == 6